@@ -36,11 +36,41 @@ class Settings(BaseSettings):
 
     alpaca_data_url: str = "https://data.alpaca.markets"
     alpaca_feed: str = "iex"  # iex (free) | sip
+    alpaca_stream_url: str = "wss://stream.data.alpaca.markets/v2"
+    quote_stream_enabled: bool = True  # False → REST polling only
+    alpaca_max_concurrency: int = 8
+    alpaca_rate_limit_per_min: int = 200  # free plan budget, both gates together
+    alpaca_poll_rate_limit_per_min: int = 80  # share of it reserved for streams and background refreshes
 
     # ── Hoodlink ──────────────────────────────────────────────────────────────
     hoodlink_url: str = "http://127.0.0.1:7878"
     hoodlink_api_key: str = "changeme"
 
+    # ── Outbound HTTP ─────────────────────────────────────────────────────────
+    http_max_connections: int = 50
+    http_max_keepalive: int = 20
+    http_keepalive_expiry: float = 30.0
+    http2: bool = False  # requires the optional "h2" package
+
+    # ── Caches ────────────────────────────────────────────────────────────────
+    chain_cache_ttl_sec: float = 5.0
+    chain_fetch_concurrency: int = 4  # expirations fetched in parallel per request
+    history_batch_concurrency: int = 4  # symbols fetched in parallel by the per-symbol get_history_batch fallback
+    bar_cache_max_mb: int = 256  # closed-bar cache budget, LRU across symbol/timeframe series
+    bar_store_path: str = "bars.db"  # on-disk closed-bar store; empty disables it
+    bar_store_flush_sec: float = 2.0  # write-behind interval
+    bar_store_intraday_retention_days: int = 730  # 0 keeps intraday bars forever
+    bar_store_compact_hours: float = 24.0
+    screener_ttl_sec: float = 15.0  # rows older than this are refreshed in the background (and served meanwhile)
+    screener_idle_sec: float = 600.0  # stop refreshing symbols nobody has asked for in this long
+
+    # ── WebSocket fan-out ─────────────────────────────────────────────────────
+    ws_queue_max: int = 64  # per-client outbound messages before conflation
+    ws_send_timeout_sec: float = 5.0
+    ws_max_lag_sec: float = 10.0  # disconnect clients whose oldest pending message is older
+    exposure_stream_interval_sec: float = 5.0
+    orderflow_poll_interval_sec: float = 3.0  # trade fetches per orderflow topic; mid comes from the quote stream
+
     # ── App ───────────────────────────────────────────────────────────────────
     app_host: str = "0.0.0.0"
     app_port: int = 8000
@@ -1,8 +1,17 @@
 """
 SQLite database for CrystalBall settings.
-Stores provider credentials and app configuration.
+Stores provider credentials, app configuration and the symbol catalog.
+
+One long-lived connection (WAL, so reads never wait on the writer) serves
+every query; reusing it also reuses sqlite3's per-connection prepared
+statement cache, since each query here is a fixed SQL string. Settings and
+providers are small and read on hot paths (provider resolution,
+``/api/status``, AI routing), so both tables are mirrored in memory:
+settings write-through, providers reloaded after any write. The process
+is the only writer, so the mirrors can't go stale underneath it.
 """
 from __future__ import annotations
+import asyncio
 import aiosqlite
 import json
 import uuid
@@ -10,43 +19,97 @@ import os
 
 DB_PATH = os.environ.get("DB_PATH", "crystalball.db")
 
+_conn: aiosqlite.Connection | None = None
+_conn_lock = asyncio.Lock()
+# Writes hold this from first statement to commit, so one caller's commit
+# never lands in the middle of another's transaction on the shared connection.
+_write_lock = asyncio.Lock()
+_settings: dict[str, str] | None = None
+_providers: dict[str, dict] | None = None  # id -> row, in created_at order
+_providers_gen = 0  # bumped on writes so a load racing a write is discarded
+
+
+async def _db() -> aiosqlite.Connection:
+    global _conn
+    if _conn is None:
+        async with _conn_lock:
+            if _conn is None:
+                conn = await aiosqlite.connect(DB_PATH, cached_statements=256)
+                await conn.execute("PRAGMA journal_mode = WAL")
+                await conn.execute("PRAGMA synchronous = NORMAL")
+                await conn.execute("PRAGMA busy_timeout = 5000")
+                _conn = conn
+    return _conn
+
 
 async def init_db():
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS settings (
-                key   TEXT PRIMARY KEY,
-                value TEXT NOT NULL
-            )
-        """)
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS providers (
-                id         TEXT PRIMARY KEY,
-                type       TEXT NOT NULL,
-                name       TEXT NOT NULL,
-                config     TEXT NOT NULL DEFAULT '{}',
-                created_at TEXT DEFAULT (datetime('now'))
-            )
-        """)
-        await db.commit()
+    db = await _db()
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS settings (
+            key   TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    """)
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS providers (
+            id         TEXT PRIMARY KEY,
+            type       TEXT NOT NULL,
+            name       TEXT NOT NULL,
+            config     TEXT NOT NULL DEFAULT '{}',
+            created_at TEXT DEFAULT (datetime('now'))
+        )
+    """)
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS assets (
+            symbol     TEXT PRIMARY KEY,
+            name       TEXT NOT NULL DEFAULT '',
+            exchange   TEXT NOT NULL DEFAULT '',
+            sector     TEXT,
+            market_cap REAL
+        )
+    """)
+    await db.commit()
+
+
+async def close_db():
+    global _conn, _settings, _providers
+    if _conn is not None:
+        await _conn.close()
+        _conn = None
+    _settings = _providers = None
 
 
 # ── Generic key/value ─────────────────────────────────────────
 
+async def _load_settings() -> dict[str, str]:
+    global _settings
+    if _settings is None:
+        db = await _db()
+        async with db.execute("SELECT key, value FROM settings") as cur:
+            rows = await cur.fetchall()
+        if _settings is None:
+            _settings = {k: v for k, v in rows}
+    return _settings
+
+
 async def get_setting(key: str) -> str | None:
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute("SELECT value FROM settings WHERE key = ?", (key,)) as cur:
-            row = await cur.fetchone()
-            return row[0] if row else None
+    return (await _load_settings()).get(key)
 
 
 async def set_setting(key: str, value: str):
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
-            (key, value)
-        )
-        await db.commit()
+    settings = await _load_settings()
+    db = await _db()
+    async with _write_lock:
+        try:
+            await db.execute(
+                "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                (key, value)
+            )
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        settings[key] = value
 
 
 # ── Active provider per role ──────────────────────────────────
@@ -72,55 +135,82 @@ async def get_active_provider() -> str | None:
 
 async def set_active_provider(provider_type: str):
     """Set active data provider by type (legacy: selects first matching)."""
-    all_p = await get_all_providers()
-    match = next((p for p in all_p if p["type"] == provider_type), None)
+    match = next((p for p in (await _load_providers()).values() if p["type"] == provider_type), None)
     if match:
         await set_active_provider_id("data", match["id"])
 
 
 # ── Provider CRUD ─────────────────────────────────────────────
 
-async def get_all_providers() -> list[dict]:
-    async with aiosqlite.connect(DB_PATH) as db:
+async def _load_providers() -> dict[str, dict]:
+    global _providers
+    if _providers is None:
+        gen = _providers_gen
+        db = await _db()
         async with db.execute(
             "SELECT id, type, name, config, created_at FROM providers ORDER BY created_at"
         ) as cur:
             rows = await cur.fetchall()
-            return [
-                {"id": r[0], "type": r[1], "name": r[2],
-                 **json.loads(r[3]), "created_at": r[4]}
-                for r in rows
-            ]
+        loaded = {
+            r[0]: {"id": r[0], "type": r[1], "name": r[2], **json.loads(r[3]), "created_at": r[4]}
+            for r in rows
+        }
+        if gen != _providers_gen:
+            return loaded  # a write landed meanwhile; don't cache what may predate it
+        _providers = loaded
+    return _providers
+
+
+def _invalidate_providers():
+    global _providers, _providers_gen
+    _providers = None
+    _providers_gen += 1
+
+
+async def get_all_providers() -> list[dict]:
+    return [dict(p) for p in (await _load_providers()).values()]
 
 
 async def get_provider(provider_id: str) -> dict | None:
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute(
-            "SELECT id, type, name, config FROM providers WHERE id = ?", (provider_id,)
-        ) as cur:
-            row = await cur.fetchone()
-            if not row:
-                return None
-            return {"id": row[0], "type": row[1], "name": row[2], **json.loads(row[3])}
+    p = (await _load_providers()).get(provider_id)
+    if not p:
+        return None
+    return {k: v for k, v in p.items() if k != "created_at"}
 
 
 async def save_provider(provider_id: str | None, type_: str, name: str, config: dict) -> str:
     pid = provider_id or str(uuid.uuid4())
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            """INSERT INTO providers (id, type, name, config)
-               VALUES (?, ?, ?, ?)
-               ON CONFLICT(id) DO UPDATE SET type=excluded.type, name=excluded.name, config=excluded.config""",
-            (pid, type_, name, json.dumps(config))
-        )
-        await db.commit()
+    db = await _db()
+    async with _write_lock:
+        try:
+            await db.execute(
+                """INSERT INTO providers (id, type, name, config)
+                   VALUES (?, ?, ?, ?)
+                   ON CONFLICT(id) DO UPDATE SET type=excluded.type, name=excluded.name, config=excluded.config""",
+                (pid, type_, name, json.dumps(config))
+            )
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        finally:
+            # Also after a rollback: a load in between may have read the
+            # uncommitted row over the shared connection.
+            _invalidate_providers()
     return pid
 
 
 async def delete_provider(provider_id: str):
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("DELETE FROM providers WHERE id = ?", (provider_id,))
-        await db.commit()
+    db = await _db()
+    async with _write_lock:
+        try:
+            await db.execute("DELETE FROM providers WHERE id = ?", (provider_id,))
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        finally:
+            _invalidate_providers()
 
 
 # ── Config helpers (used by deps.py) ─────────────────────────
@@ -142,16 +232,14 @@ async def get_active_provider_config(role: str = "data") -> tuple[str, dict]:
 
 async def get_provider_config(provider_type: str) -> dict:
     """Return config of first provider matching type."""
-    all_p = await get_all_providers()
-    p = next((x for x in all_p if x["type"] == provider_type), None)
+    p = next((x for x in (await _load_providers()).values() if x["type"] == provider_type), None)
     if not p:
         return {}
     return {k: v for k, v in p.items() if k not in ("id", "type", "name", "created_at")}
 
 
 async def set_provider_config(provider_type: str, config: dict):
-    all_p = await get_all_providers()
-    existing = next((x for x in all_p if x["type"] == provider_type), None)
+    existing = next((x for x in (await _load_providers()).values() if x["type"] == provider_type), None)
     if existing:
         pid = existing["id"]
         name = existing["name"]
@@ -159,3 +247,32 @@ async def set_provider_config(provider_type: str, config: dict):
         pid = None
         name = provider_type.capitalize()
     await save_provider(pid, provider_type, name, config)
+
+
+# ── Symbol catalog ────────────────────────────────────────────
+
+async def get_assets() -> list[dict]:
+    db = await _db()
+    async with db.execute("SELECT symbol, name, exchange, sector, market_cap FROM assets") as cur:
+        rows = await cur.fetchall()
+    return [
+        {"symbol": r[0], "name": r[1], "exchange": r[2], "sector": r[3], "market_cap": r[4]}
+        for r in rows
+    ]
+
+
+async def replace_assets(assets: list[dict]):
+    """Swap in a freshly loaded asset list in one transaction."""
+    db = await _db()
+    async with _write_lock:
+        try:
+            await db.execute("DELETE FROM assets")
+            await db.executemany(
+                "INSERT OR REPLACE INTO assets (symbol, name, exchange, sector, market_cap) VALUES (?, ?, ?, ?, ?)",
+                [(a["symbol"], a.get("name") or "", a.get("exchange") or "", a.get("sector"), a.get("market_cap"))
+                 for a in assets],
+            )
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
@@ -0,0 +1,120 @@
+"""
+Wire encodings for REST and WebSocket payloads.
+
+JSON is produced with orjson when it is installed (stdlib ``json``
+otherwise). MessagePack is opt-in and needs the ``msgpack`` extra:
+
+  * REST: send ``Accept: application/msgpack``. ``FastResponse`` is the
+    app's default response class and picks the encoding per request.
+  * WebSocket: offer the ``msgpack`` subprotocol; frames are then sent as
+    binary MessagePack and client messages may be either encoding.
+
+Routes that return large bodies (history, chains) should return
+``FastResponse(payload)`` directly. That skips FastAPI's
+``jsonable_encoder`` pass, which costs more than the encoding itself.
+"""
+from __future__ import annotations
+
+import json
+from contextvars import ContextVar
+from typing import Any
+
+import numpy as np
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional encoding
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+MSGPACK_SUBPROTOCOL = "msgpack"
+
+_wants_msgpack: ContextVar[bool] = ContextVar("wants_msgpack", default=False)
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """Compact UTF-8 JSON. NaN becomes null under orjson."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def loads(data: str | bytes) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def packb(obj: Any) -> bytes:
+    if msgpack is None:
+        raise RuntimeError("msgpack is not installed")
+    return msgpack.packb(obj, default=_default, use_bin_type=True)
+
+
+def unpackb(data: bytes) -> Any:
+    if msgpack is None:
+        raise RuntimeError("msgpack is not installed")
+    return msgpack.unpackb(data, raw=False)
+
+
+def msgpack_available() -> bool:
+    return msgpack is not None
+
+
+def accepts_msgpack(accept: str | None) -> bool:
+    if msgpack is None or not accept:
+        return False
+    return any(t.split(";")[0].strip() in MSGPACK_MEDIA_TYPES for t in accept.lower().split(","))
+
+
+def websocket_subprotocol(offered: list[str]) -> str | None:
+    """Subprotocol to accept from the client's offer, if any."""
+    return MSGPACK_SUBPROTOCOL if msgpack is not None and MSGPACK_SUBPROTOCOL in offered else None
+
+
+class FastResponse(JSONResponse):
+    """orjson by default, MessagePack when the request's Accept asks for it."""
+
+    def render(self, content: Any) -> bytes:
+        if _wants_msgpack.get():
+            self.media_type = MSGPACK_MEDIA_TYPES[0]
+            return packb(content)
+        return dumps(content)
+
+
+class NegotiationMiddleware:
+    """Records the request's Accept preference for ``FastResponse``."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = next((v.decode("latin-1") for k, v in scope["headers"] if k == b"accept"), None)
+        token = _wants_msgpack.set(accepts_msgpack(accept))
+
+        async def send_vary(message: Message):
+            if message["type"] == "http.response.start" and msgpack is not None:
+                message.setdefault("headers", [])
+                message["headers"] = [*message["headers"], (b"vary", b"Accept")]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_vary)
+        finally:
+            _wants_msgpack.reset(token)
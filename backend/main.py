@@ -3,7 +3,10 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from config import get_settings
 from routes import market, analytics, orders, account, reports, ws, settings as settings_router, news, providers as providers_router, ai, screener
-from db import init_db
+from db import init_db, close_db
+from encoding import FastResponse, NegotiationMiddleware
+from routes.deps import close_provider, get_provider
+from services import bar_store, screener_cache, screener_metrics, symbol_catalog
 
 settings = get_settings()
 
@@ -11,8 +14,12 @@ app = FastAPI(
     title="CrystalBall API",
     description="Open-source quantitative trading platform backend",
     version="0.1.0",
+    default_response_class=FastResponse,
 )
 
+# Per-request JSON/MessagePack choice for FastResponse (Accept header)
+app.add_middleware(NegotiationMiddleware)
+
 # CORS: allow localhost, 127.x, and all RFC-1918 LAN addresses
 app.add_middleware(
     CORSMiddleware,
@@ -32,6 +39,18 @@ app.add_middleware(
 @app.on_event("startup")
 async def startup():
     await init_db()
+    bar_store.start()
+    screener_cache.start(get_provider)
+    symbol_catalog.start(get_provider)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await screener_cache.stop()
+    await symbol_catalog.stop()
+    await close_provider()
+    await bar_store.stop()
+    await close_db()
 
 # REST routes
 app.include_router(market.router, prefix="/api")
@@ -55,3 +74,29 @@ async def status():
     from db import get_active_provider
     provider = await get_active_provider() or settings.provider
     return {"status": "ok", "provider": provider, "version": "0.1.0"}
+
+
+@app.get("/api/status/caches")
+async def cache_status():
+    from services import chain_cache, history_cache, history_planner
+    return {
+        "chains": chain_cache.stats(),
+        "bars": history_cache.stats(),
+        "bar_store": await bar_store.stats(),
+        "history_fetch": history_planner.stats(),
+        "screener": screener_cache.stats(),
+        "screener_bars": screener_metrics.stats(),
+        "symbols": symbol_catalog.stats(),
+    }
+
+
+@app.get("/api/status/streams")
+async def stream_status():
+    from services.broadcast import hub
+    return hub.stats()
+
+
+@app.get("/api/status/providers")
+async def provider_status():
+    from providers import registry
+    return registry.stats()
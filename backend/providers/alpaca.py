@@ -1,9 +1,14 @@
 """Alpaca Markets provider (paper + live trading, market data)."""
 from __future__ import annotations
 from typing import Any
+import asyncio
+import hashlib
 from datetime import date, datetime, timedelta, timezone
 import httpx
-from .base import BaseProvider
+import numpy as np
+from .base import BaseProvider, OptionChain, OPTION_TYPE_FLAGS
+from .alpaca_stream import AlpacaQuoteStream
+from .http import RequestGate, is_polling, new_client
 from config import get_settings
 
 
@@ -24,44 +29,144 @@ class AlpacaProvider(BaseProvider):
         self._trade_url = cfg.get("trade_url") or trade_base
         self._data_url  = data_url
         self._feed      = cfg.get("feed") or s.alpaca_feed
+        self._stream_url = cfg.get("stream_url") or s.alpaca_stream_url
+        self._stream: AlpacaQuoteStream | None = None
+        self._client    = new_client(timeout=10.0, headers=self._headers)
+        poll_budget     = min(s.alpaca_poll_rate_limit_per_min, s.alpaca_rate_limit_per_min - 1)
+        self._gate      = RequestGate(s.alpaca_max_concurrency, s.alpaca_rate_limit_per_min - poll_budget)
+        self._poll_gate = RequestGate(s.alpaca_max_concurrency, poll_budget)
+
+    @property
+    def source_key(self) -> str:
+        key_id = hashlib.sha1(self._headers["APCA-API-KEY-ID"].encode()).hexdigest()[:12]
+        return f"alpaca:{self._data_url}:{key_id}"
+
+    async def aclose(self) -> None:
+        if self._stream is not None:
+            await self._stream.aclose()
+        await self._client.aclose()
+
+    def adopt(self, old: BaseProvider) -> None:
+        if not isinstance(old, AlpacaProvider) or old._headers != self._headers:
+            return
+        # Same credentials: keep the open connections and the rate budget.
+        self._client, old._client = old._client, self._client
+        self._gate, self._poll_gate = old._gate, old._poll_gate
+        if (old._stream_url, old._feed) == (self._stream_url, self._feed):
+            self._stream, old._stream = old._stream, None
+
+    def quote_stream(self) -> AlpacaQuoteStream | None:
+        if not get_settings().quote_stream_enabled:
+            return None
+        if self._stream is None:
+            self._stream = AlpacaQuoteStream(
+                f"{self._stream_url.rstrip('/')}/{self._feed}",
+                self._headers["APCA-API-KEY-ID"],
+                self._headers["APCA-API-SECRET-KEY"],
+            )
+        return self._stream
+
+    async def _get(self, url: str, **kwargs) -> httpx.Response:
+        """GET through the provider's gate so fan-outs respect the rate limit."""
+        async with (self._poll_gate if is_polling() else self._gate):
+            return await self._client.get(url, **kwargs)
 
     async def get_quote(self, symbol: str) -> dict[str, Any]:
-        async with httpx.AsyncClient() as c:
-            bid = ask = last = ts = None
+        bid = ask = last = ts = None
+
+        # Latest quote and latest trade are independent; fetch both at once.
+        qr, tr = await asyncio.gather(
+            self._get(f"{self._data_url}/v2/stocks/{symbol}/quotes/latest"),
+            self._get(f"{self._data_url}/v2/stocks/{symbol}/trades/latest"),
+        )
+
+        # Best effort: latest quote
+        if qr.status_code == 200:
+            q = qr.json().get("quote", {})
+            bid = q.get("bp")
+            ask = q.get("ap")
+            ts = q.get("t")
+
+        # Prefer latest trade as last price when available
+        if tr.status_code == 200:
+            t = tr.json().get("trade", {})
+            last = t.get("p")
+            ts = t.get("t") or ts
+
+        if last is None and bid is not None and ask is not None:
+            last = (float(bid) + float(ask)) / 2
+        if last is None:
+            last = ask or bid
+
+        return {
+            "symbol": symbol,
+            "bid_price": bid,
+            "ask_price": ask,
+            "last_price": last,
+            "timestamp": ts,
+        }
 
-            # Best effort: latest quote
-            qr = await c.get(
-                f"{self._data_url}/v2/stocks/{symbol}/quotes/latest",
-                headers=self._headers,
-            )
-            if qr.status_code == 200:
-                q = qr.json().get("quote", {})
-                bid = q.get("bp")
-                ask = q.get("ap")
-                ts = q.get("t")
-
-            # Prefer latest trade as last price when available
-            tr = await c.get(
-                f"{self._data_url}/v2/stocks/{symbol}/trades/latest",
-                headers=self._headers,
-            )
-            if tr.status_code == 200:
-                t = tr.json().get("trade", {})
-                last = t.get("p")
-                ts = t.get("t") or ts
-
-            if last is None and bid is not None and ask is not None:
-                last = (float(bid) + float(ask)) / 2
-            if last is None:
-                last = ask or bid
-
-            return {
-                "symbol": symbol,
-                "bid_price": bid,
-                "ask_price": ask,
-                "last_price": last,
-                "timestamp": ts,
+    async def get_snapshots(self, symbols: list[str]) -> dict[str, dict[str, Any]]:
+        r = await self._get(
+            f"{self._data_url}/v2/stocks/snapshots",
+            params={"symbols": ",".join(symbols), "feed": "sip"},
+        )
+        r.raise_for_status()
+        out: dict[str, dict[str, Any]] = {}
+        for sym, s in (r.json().get("snapshots") or {}).items():
+            if not s:
+                continue
+            trade = s.get("latestTrade") or {}
+            day = s.get("dailyBar") or {}
+            prev = s.get("prevDailyBar") or {}
+            minbar = s.get("minuteBar") or {}
+            price = float(trade.get("p") or day.get("c") or 0)
+            out[sym] = {
+                "price": price,
+                "day_open": float(day.get("o") or price),
+                "day_close": float(day.get("c") or price),
+                "day_volume": float(day.get("v") or 0),
+                "prev_close": float(prev.get("c") or 0),
+                "minute_volume": float(minbar.get("v") or 0),
             }
+        return out
+
+    async def get_history_batch(self, symbols: list[str], timeframe: str, start: str, end: str | None = None) -> dict[str, list[dict[str, Any]]]:
+        params: dict[str, Any] = {
+            "symbols": ",".join(symbols),
+            "timeframe": timeframe,
+            "start": start,
+            "limit": 10000,
+            "adjustment": "raw",
+            "feed": "sip",
+            "sort": "asc",
+        }
+        if end:
+            params["end"] = end
+        out: dict[str, list[dict[str, Any]]] = {}
+        while True:
+            r = await self._get(f"{self._data_url}/v2/stocks/bars", params=params)
+            r.raise_for_status()
+            body = r.json()
+            for sym, bars in (body.get("bars") or {}).items():
+                out.setdefault(sym, []).extend(
+                    {"timestamp": b["t"], "open": b["o"], "high": b["h"],
+                     "low": b["l"], "close": b["c"], "volume": b["v"]}
+                    for b in bars
+                )
+            token = body.get("next_page_token")
+            if not token:
+                return out
+            params["page_token"] = token
+
+    def bar_alignment(self, timeframe: str) -> int | None:
+        # Minute and hour aggregates start on UTC multiples of the bar length;
+        # daily bars follow the exchange session and aren't rebuilt locally.
+        t = (timeframe or "").lower()
+        return 0 if t.endswith(("min", "hour")) else None
+
+    def ranged_history(self) -> bool:
+        return True
 
     async def get_history(self, symbol: str, timeframe: str = "1Day", limit: int = 252, start: str | None = None, end: str | None = None) -> list[dict[str, Any]]:
         tf = (timeframe or "1Day").strip()
@@ -78,71 +183,72 @@ class AlpacaProvider(BaseProvider):
         end_dt = datetime.now(timezone.utc)
         end_iso = end or end_dt.isoformat().replace("+00:00", "Z")
 
-        async with httpx.AsyncClient() as c:
-            # SIP includes full-market coverage incl. extended hours for supported symbols.
-            feed = "sip"
-            # Primary path: ask for latest bars ending at end_iso.
-            primary = {
+        # SIP includes full-market coverage incl. extended hours for supported symbols.
+        feed = "sip"
+        # Primary path: ask for latest bars ending at end_iso.
+        primary = {
+            "timeframe": tf,
+            "limit": limit,
+            "adjustment": "raw",
+            "end": end_iso,
+            "feed": feed,
+            "sort": "desc",
+        }
+        if start:
+            primary["start"] = start
+        r = await self._get(
+            f"{self._data_url}/v2/stocks/{symbol}/bars",
+            params=primary,
+        )
+        bars = r.json().get("bars") or [] if r.status_code == 200 else []
+
+        # Fallback: explicit window for sparse/weekend behavior / API quirks.
+        # Some timeframes (notably 1Day) can return too-few bars on end-only queries.
+        need_fallback = (not bars)
+        if not start and bars:
+            min_expected = 5 if limit >= 20 else max(1, limit)
+            if len(bars) < min_expected:
+                need_fallback = True
+
+        if need_fallback:
+            lookback_minutes = max(max(limit, 1) * minutes * 12, 7 * 24 * 60)
+            fallback_end = datetime.fromisoformat(end_iso.replace("Z", "+00:00"))
+            start_dt = fallback_end - timedelta(minutes=lookback_minutes)
+            fallback = {
                 "timeframe": tf,
                 "limit": limit,
                 "adjustment": "raw",
+                "start": start_dt.isoformat().replace("+00:00", "Z"),
                 "end": end_iso,
                 "feed": feed,
                 "sort": "desc",
             }
-            if start:
-                primary["start"] = start
-            r = await c.get(
+            rr = await self._get(
                 f"{self._data_url}/v2/stocks/{symbol}/bars",
-                headers=self._headers,
-                params=primary,
+                params=fallback,
             )
-            bars = r.json().get("bars") or [] if r.status_code == 200 else []
-
-            # Fallback: explicit window for sparse/weekend behavior / API quirks.
-            # Some timeframes (notably 1Day) can return too-few bars on end-only queries.
-            need_fallback = (not bars)
-            if not start and bars:
-                min_expected = 5 if limit >= 20 else max(1, limit)
-                if len(bars) < min_expected:
-                    need_fallback = True
-
-            if need_fallback:
-                lookback_minutes = max(max(limit, 1) * minutes * 12, 7 * 24 * 60)
-                fallback_end = datetime.fromisoformat(end_iso.replace("Z", "+00:00"))
-                start_dt = fallback_end - timedelta(minutes=lookback_minutes)
-                fallback = {
-                    "timeframe": tf,
-                    "limit": limit,
-                    "adjustment": "raw",
-                    "start": start_dt.isoformat().replace("+00:00", "Z"),
-                    "end": end_iso,
-                    "feed": feed,
-                    "sort": "desc",
-                }
-                rr = await c.get(
-                    f"{self._data_url}/v2/stocks/{symbol}/bars",
-                    headers=self._headers,
-                    params=fallback,
-                )
-                rr.raise_for_status()
-                bars = rr.json().get("bars") or []
+            rr.raise_for_status()
+            bars = rr.json().get("bars") or []
 
-            # Ensure chronological order for consumers.
-            bars = sorted(bars, key=lambda x: x.get("t", ""))
+        # Ensure chronological order for consumers.
+        bars = sorted(bars, key=lambda x: x.get("t", ""))
 
-            # Guard against oversized responses.
-            if len(bars) > limit:
-                bars = bars[-limit:]
+        # Guard against oversized responses.
+        if len(bars) > limit:
+            bars = bars[-limit:]
 
-            return [
-                {"timestamp": b["t"], "open": b["o"], "high": b["h"],
-                 "low": b["l"], "close": b["c"], "volume": b["v"]}
-                for b in bars
-            ]
+        return [
+            {"timestamp": b["t"], "open": b["o"], "high": b["h"],
+             "low": b["l"], "close": b["c"], "volume": b["v"]}
+            for b in bars
+        ]
 
     async def get_options_chain(self, symbol: str, expiration_date: str | None = None, option_type: str | None = None) -> list[dict[str, Any]]:
-        from services.bs import bs_greeks, iv_from_price
+        chain = await self.get_options_chain_columnar(symbol, expiration_date=expiration_date, option_type=option_type)
+        return chain.to_records()
+
+    async def get_options_chain_columnar(self, symbol: str, expiration_date: str | None = None, option_type: str | None = None) -> OptionChain:
+        from services.bs import bs_greeks_batch, implied_vol_batch
 
         today = date.today()
         exp_gte = expiration_date or today.strftime("%Y-%m-%d")
@@ -158,153 +264,169 @@ class AlpacaProvider(BaseProvider):
         if option_type:
             params["type"] = option_type
 
-        async with httpx.AsyncClient(timeout=20.0) as c:
-            r = await c.get(
+        # The spot quote doesn't depend on the contract list; start it now.
+        spot_task = asyncio.create_task(self._spot_for_greeks(symbol))
+        try:
+            r = await self._get(
                 f"https://paper-api.alpaca.markets/v2/options/contracts",
-                headers=self._headers,
                 params=params,
+                timeout=20.0,
             )
             r.raise_for_status()
-            contracts = r.json().get("option_contracts", [])
-
-            # 2. Fetch snapshots for market data (bid/ask)
-            syms = [con["symbol"] for con in contracts if con.get("symbol")]
-            snap_map: dict[str, dict] = {}
-            if syms:
-                # batch in groups of 100
-                for i in range(0, len(syms), 100):
-                    batch = syms[i:i+100]
-                    sr = await c.get(
-                        f"{self._data_url}/v1beta1/options/snapshots",
-                        headers=self._headers,
-                        params={"symbols": ",".join(batch)},
-                    )
-                    if sr.status_code == 200:
-                        snap_map.update(sr.json().get("snapshots", {}))
-
-            # 3. Get spot price for BS
-            try:
-                qr = await c.get(
-                    f"{self._data_url}/v2/stocks/{symbol}/quotes/latest",
-                    headers=self._headers,
+        except BaseException:
+            spot_task.cancel()
+            raise
+        contracts = r.json().get("option_contracts", [])
+
+        # 2. Fetch snapshots for market data (bid/ask), batches of 100 in parallel
+        syms = [con["symbol"] for con in contracts if con.get("symbol")]
+        snap_map: dict[str, dict] = {}
+        try:
+            # A failed batch fails the chain: a partial one would be cached as complete.
+            responses = await asyncio.gather(*(
+                self._get(
+                    f"{self._data_url}/v1beta1/options/snapshots",
+                    params={"symbols": ",".join(syms[i:i+100])},
+                    timeout=20.0,
                 )
-                spot = float(qr.json().get("quote", {}).get("ap", 0)) if qr.status_code == 200 else 0
-            except Exception:
-                spot = 0
-
-        # 4. Combine + compute BS Greeks
-        chain = []
+                for i in range(0, len(syms), 100)
+            ))
+            for sr in responses:
+                sr.raise_for_status()
+                snap_map.update(sr.json().get("snapshots", {}))
+        except BaseException:
+            spot_task.cancel()
+            raise
+
+        # 3. Spot price for BS
+        spot = await spot_task
+
+        # 4. Build columns, then solve IV and compute BS Greeks for the whole chain
+        ordinals: dict[str, int] = {}
         for con in contracts:
-            sym = con.get("symbol", "")
-            strike = float(con.get("strike_price") or 0)
-            exp = con.get("expiration_date", "")
-            otype = con.get("type", "call")
-            oi = float(con.get("open_interest") or 0)
-            snap = snap_map.get(sym, {})
-            quote = snap.get("latestQuote", {})
-            bid = float(quote.get("bp") or 0)
-            ask = float(quote.get("ap") or 0)
-            mark = round((bid + ask) / 2, 2) if bid and ask else None
-
-            # Compute Greeks via BS
-            try:
-                exp_dt = date.fromisoformat(exp)
-                T = max((exp_dt - today).days / 365, 0.0)
-            except Exception:
-                T = 0.0
-
-            iv = 0.20
-            greeks = {"delta": None, "gamma": None, "theta": None, "vega": None}
-            if spot > 0 and T > 0 and mark and mark > 0:
-                iv = iv_from_price(mark, spot, strike, T, option_type=otype)
-                g = bs_greeks(spot, strike, T, sigma=iv, option_type=otype)
-                greeks = g
-
-            chain.append({
-                "symbol": sym,
-                "strike_price": strike,
-                "expiration_date": exp,
-                "option_type": otype,
-                "bid_price": bid or None,
-                "ask_price": ask or None,
-                "mark_price": mark,
-                "delta": greeks["delta"],
-                "gamma": greeks["gamma"],
-                "theta": greeks["theta"],
-                "vega": greeks["vega"],
-                "open_interest": oi,
-                "implied_volatility": iv,
-            })
-        return chain
+            exp = con.get("expiration_date") or ""
+            if exp not in ordinals:
+                try:
+                    ordinals[exp] = date.fromisoformat(exp).toordinal()
+                except ValueError:
+                    ordinals[exp] = 0
+        n = len(contracts)
+        quotes = [snap_map.get(con.get("symbol", ""), {}).get("latestQuote", {}) for con in contracts]
+        strike = np.array([float(con.get("strike_price") or 0) for con in contracts], dtype=np.float64)
+        expiry = np.array([ordinals[con.get("expiration_date") or ""] for con in contracts], dtype=np.int32)
+        type_flag = np.array(
+            [OPTION_TYPE_FLAGS.get(con.get("type", "call"), 0) for con in contracts], dtype=np.int8,
+        )
+        oi = np.array([float(con.get("open_interest") or 0) for con in contracts], dtype=np.float64)
+        bid = np.array([float(q.get("bp") or 0) for q in quotes], dtype=np.float64)
+        ask = np.array([float(q.get("ap") or 0) for q in quotes], dtype=np.float64)
+        quoted = (bid > 0) & (ask > 0)
+        mark = np.where(quoted, np.round((bid + ask) / 2, 2), np.nan)
+
+        T = np.where(expiry > 0, np.maximum((expiry - today.toordinal()) / 365, 0.0), 0.0)
+        iv = np.full(n, np.nan)
+        greeks = {k: np.full(n, np.nan) for k in ("delta", "gamma", "theta", "vega")}
+        priced = np.flatnonzero((T > 0) & (mark > 0)) if spot > 0 else np.empty(0, dtype=np.intp)
+        if priced.size:
+            is_call = type_flag[priced] == 1
+            solved = implied_vol_batch(mark[priced], spot, strike[priced], T[priced], is_call)
+            # Unsolvable contracts keep NaN IV/Greeks rather than a fake 20%.
+            ok = priced[solved["converged"]]
+            g = bs_greeks_batch(spot, strike[ok], T[ok], solved["iv"][solved["converged"]], is_call[solved["converged"]])
+            iv[ok] = np.round(solved["iv"][solved["converged"]], 4)
+            for name, digits in (("delta", 4), ("gamma", 6), ("theta", 4), ("vega", 4)):
+                greeks[name][ok] = np.round(g[name], digits)
+
+        return OptionChain(
+            symbol,
+            [con.get("symbol", "") for con in contracts],
+            np.rint(strike * 100),
+            expiry,
+            type_flag,
+            bid=np.where(bid > 0, bid, np.nan),
+            ask=np.where(ask > 0, ask, np.nan),
+            mark=mark,
+            open_interest=oi,
+            iv=iv,
+            **greeks,
+        )
+
+    async def _spot_for_greeks(self, symbol: str) -> float:
+        try:
+            qr = await self._get(f"{self._data_url}/v2/stocks/{symbol}/quotes/latest")
+            return float(qr.json().get("quote", {}).get("ap", 0)) if qr.status_code == 200 else 0
+        except Exception:
+            return 0
 
     async def place_order(self, order: dict[str, Any]) -> dict[str, Any]:
-        async with httpx.AsyncClient() as c:
-            r = await c.post(
-                f"{self._trade_url}/v2/orders",
-                headers=self._headers,
-                json=order,
-            )
-            r.raise_for_status()
-            return r.json()
+        r = await self._client.post(
+            f"{self._trade_url}/v2/orders",
+            json=order,
+        )
+        r.raise_for_status()
+        return r.json()
 
     async def cancel_order(self, order_id: str) -> dict[str, Any]:
-        async with httpx.AsyncClient() as c:
-            r = await c.delete(
-                f"{self._trade_url}/v2/orders/{order_id}",
-                headers=self._headers,
-            )
-            r.raise_for_status()
-            return {"cancelled": order_id}
+        r = await self._client.delete(f"{self._trade_url}/v2/orders/{order_id}")
+        r.raise_for_status()
+        return {"cancelled": order_id}
 
     async def get_orders(self, status: str = "open", limit: int = 50) -> list[dict[str, Any]]:
-        async with httpx.AsyncClient() as c:
-            r = await c.get(
-                f"{self._trade_url}/v2/orders",
-                headers=self._headers,
-                params={"status": status, "limit": limit},
-            )
-            r.raise_for_status()
-            return r.json()
-
-    async def get_trades(self, symbol: str, limit: int = 200) -> list[dict[str, Any]]:
-        async with httpx.AsyncClient(timeout=10.0) as c:
-            r = await c.get(
-                f"{self._data_url}/v2/stocks/{symbol}/trades",
-                headers=self._headers,
-                params={"limit": limit, "feed": "sip"},
-            )
-            if r.status_code != 200:
-                return []
-            trades = r.json().get("trades", [])
-            return [{
-                "price": float(t.get("p", 0)),
-                "size": int(t.get("s", 0)),
-                "timestamp": t.get("t", ""),
-                "conditions": t.get("c", []) or [],
-            } for t in trades]
+        r = await self._get(
+            f"{self._trade_url}/v2/orders",
+            params={"status": status, "limit": limit},
+        )
+        r.raise_for_status()
+        return r.json()
+
+    async def get_trades(self, symbol: str, limit: int = 200, start: str | None = None) -> list[dict[str, Any]]:
+        params: dict[str, Any] = {"limit": limit, "feed": "sip"}
+        if start:
+            params.update(start=start, sort="asc")
+        r = await self._get(f"{self._data_url}/v2/stocks/{symbol}/trades", params=params)
+        if r.status_code != 200:
+            return []
+        trades = r.json().get("trades") or []
+        return [{
+            "id": t.get("i"),
+            "price": float(t.get("p", 0)),
+            "size": int(t.get("s", 0)),
+            "timestamp": t.get("t", ""),
+            "conditions": t.get("c", []) or [],
+        } for t in trades]
+
+    async def get_assets(self) -> list[dict[str, Any]]:
+        r = await self._get(
+            f"{self._trade_url}/v2/assets",
+            params={"status": "active", "asset_class": "us_equity"},
+        )
+        r.raise_for_status()
+        return [
+            {"symbol": a["symbol"], "name": a.get("name") or "", "exchange": a.get("exchange") or ""}
+            for a in r.json()
+            if a.get("tradable") and a.get("symbol")
+        ]
 
     async def get_news(self, symbols: list[str], limit: int = 20) -> list[dict[str, Any]]:
-        async with httpx.AsyncClient(timeout=10.0) as c:
-            r = await c.get(
-                f"{self._data_url}/v1beta1/news",
-                headers=self._headers,
-                params={"symbols": ",".join(symbols), "limit": limit, "sort": "desc"},
-            )
-            if r.status_code != 200:
-                return []
-            items = r.json().get("news", [])
-            return [
-                {
-                    "id": str(item.get("id", "")),
-                    "headline": item.get("headline", ""),
-                    "summary": item.get("summary", ""),
-                    "source": item.get("source", ""),
-                    "symbols": item.get("symbols", []),
-                    "url": item.get("url", ""),
-                    "createdAt": item.get("created_at", ""),
-                }
-                for item in items
-            ]
+        r = await self._get(
+            f"{self._data_url}/v1beta1/news",
+            params={"symbols": ",".join(symbols), "limit": limit, "sort": "desc"},
+        )
+        if r.status_code != 200:
+            return []
+        items = r.json().get("news", [])
+        return [
+            {
+                "id": str(item.get("id", "")),
+                "headline": item.get("headline", ""),
+                "summary": item.get("summary", ""),
+                "source": item.get("source", ""),
+                "symbols": item.get("symbols", []),
+                "url": item.get("url", ""),
+                "createdAt": item.get("created_at", ""),
+            }
+            for item in items
+        ]
 
     async def get_option_expirations(self, symbol: str) -> list[str]:
         params: dict[str, Any] = {
@@ -315,40 +437,38 @@ class AlpacaProvider(BaseProvider):
         expirations: set[str] = set()
         page_token: str | None = None
 
-        async with httpx.AsyncClient(timeout=20.0) as c:
-            for _ in range(10):
-                p = dict(params)
-                if page_token:
-                    p["page_token"] = page_token
-                r = await c.get(
-                    f"{self._trade_url}/v2/options/contracts",
-                    headers=self._headers,
-                    params=p,
-                )
-                if r.status_code != 200:
-                    break
-                body = r.json() if r.content else {}
-                for con in body.get("option_contracts", []):
-                    exp = con.get("expiration_date")
-                    if exp:
-                        expirations.add(str(exp))
-                page_token = body.get("next_page_token")
-                if not page_token:
-                    break
+        for _ in range(10):
+            p = dict(params)
+            if page_token:
+                p["page_token"] = page_token
+            r = await self._get(
+                f"{self._trade_url}/v2/options/contracts",
+                params=p,
+                timeout=20.0,
+            )
+            if r.status_code != 200:
+                break
+            body = r.json() if r.content else {}
+            for con in body.get("option_contracts", []):
+                exp = con.get("expiration_date")
+                if exp:
+                    expirations.add(str(exp))
+            page_token = body.get("next_page_token")
+            if not page_token:
+                break
 
         return sorted(expirations)
 
     async def get_account(self) -> dict[str, Any]:
-        async with httpx.AsyncClient() as c:
-            r = await c.get(f"{self._trade_url}/v2/account", headers=self._headers)
-            r.raise_for_status()
-            a = r.json()
-            return {
-                "id": a.get("id"),
-                "equity": a.get("equity"),
-                "cash": a.get("cash"),
-                "buying_power": a.get("buying_power"),
-                "portfolio_value": a.get("portfolio_value"),
-                "pattern_day_trader": a.get("pattern_day_trader"),
-                "trading_blocked": a.get("trading_blocked"),
-            }
+        r = await self._get(f"{self._trade_url}/v2/account")
+        r.raise_for_status()
+        a = r.json()
+        return {
+            "id": a.get("id"),
+            "equity": a.get("equity"),
+            "cash": a.get("cash"),
+            "buying_power": a.get("buying_power"),
+            "portfolio_value": a.get("portfolio_value"),
+            "pattern_day_trader": a.get("pattern_day_trader"),
+            "trading_blocked": a.get("trading_blocked"),
+        }
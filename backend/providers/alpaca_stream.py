@@ -0,0 +1,168 @@
+"""
+Alpaca market-data WebSocket ingest.
+
+One upstream connection per provider instance carries trades + quotes for
+every symbol any client is watching. Symbols are reference-counted:
+``subscribe``/``unsubscribe`` adjust the upstream subscription as clients
+come and go, and the connection is re-established (with re-auth and
+re-subscribe) on failure. Consumers read merged snapshots shaped like
+``BaseProvider.get_quote`` and may register listeners for push updates.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from typing import Any, Callable
+
+import websockets
+
+import encoding
+
+log = logging.getLogger(__name__)
+
+Listener = Callable[[str, dict[str, Any]], None]
+
+
+class AlpacaQuoteStream:
+    def __init__(self, url: str, key: str, secret: str):
+        self._url = url
+        self._key = key
+        self._secret = secret
+        self._refs: dict[str, int] = defaultdict(int)
+        self._latest: dict[str, dict[str, Any]] = {}
+        self._listeners: dict[str, list[Listener]] = defaultdict(list)
+        self._ws: Any = None
+        self._task: asyncio.Task | None = None
+        self._wanted = asyncio.Event()
+        self.connected = False
+
+    # ── Subscriptions ─────────────────────────────────────────────────────────
+
+    def subscribe(self, symbol: str, listener: Listener | None = None):
+        symbol = symbol.upper()
+        self._refs[symbol] += 1
+        if listener is not None:
+            self._listeners[symbol].append(listener)
+        if self._refs[symbol] == 1:
+            self._send_nowait({"action": "subscribe", "trades": [symbol], "quotes": [symbol]})
+        self._wanted.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def unsubscribe(self, symbol: str, listener: Listener | None = None):
+        symbol = symbol.upper()
+        if listener is not None and listener in self._listeners.get(symbol, []):
+            self._listeners[symbol].remove(listener)
+        if self._refs.get(symbol, 0) <= 0:
+            return
+        self._refs[symbol] -= 1
+        if self._refs[symbol] == 0:
+            del self._refs[symbol]
+            self._listeners.pop(symbol, None)
+            self._latest.pop(symbol, None)
+            self._send_nowait({"action": "unsubscribe", "trades": [symbol], "quotes": [symbol]})
+
+    def latest(self, symbol: str) -> dict[str, Any] | None:
+        """Merged quote snapshot, or None until the stream has seen *symbol*."""
+        return self._latest.get(symbol.upper())
+
+    def seed(self, symbol: str, quote: dict[str, Any]):
+        """Prime the snapshot from a REST quote so the first update is complete."""
+        symbol = symbol.upper()
+        if symbol in self._refs and symbol not in self._latest:
+            self._latest[symbol] = dict(quote)
+
+    @property
+    def symbols(self) -> list[str]:
+        return sorted(self._refs)
+
+    # ── Connection ────────────────────────────────────────────────────────────
+
+    def _send_nowait(self, msg: dict[str, Any]):
+        ws = self._ws
+        if ws is None or not self.connected:
+            return  # (re)connect path subscribes to the full symbol set
+        asyncio.create_task(self._safe_send(ws, msg))
+
+    @staticmethod
+    async def _safe_send(ws: Any, msg: dict[str, Any]):
+        try:
+            await ws.send(json.dumps(msg))
+        except Exception:
+            pass  # the reader notices the broken socket and reconnects
+
+    async def _run(self):
+        backoff = 1.0
+        while True:
+            if not self._refs:
+                # Nothing to watch: stay disconnected until someone subscribes.
+                self._wanted.clear()
+                await self._wanted.wait()
+            try:
+                async with websockets.connect(self._url, open_timeout=10, ping_interval=20) as ws:
+                    await self._handshake(ws)
+                    self._ws = ws
+                    self.connected = True
+                    backoff = 1.0
+                    if self._refs:
+                        syms = list(self._refs)
+                        await ws.send(json.dumps({"action": "subscribe", "trades": syms, "quotes": syms}))
+                    async for raw in ws:
+                        self._on_message(raw)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("alpaca stream disconnected: %s", e)
+            finally:
+                self.connected = False
+                self._ws = None
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    async def _handshake(self, ws: Any):
+        await ws.send(json.dumps({"action": "auth", "key": self._key, "secret": self._secret}))
+        for _ in range(3):
+            msgs = json.loads(await asyncio.wait_for(ws.recv(), timeout=10))
+            for m in msgs if isinstance(msgs, list) else [msgs]:
+                if m.get("T") == "error":
+                    raise RuntimeError(f"auth failed: {m.get('code')} {m.get('msg')}")
+                if m.get("T") == "success" and m.get("msg") == "authenticated":
+                    return
+        raise RuntimeError("auth not acknowledged")
+
+    def _on_message(self, raw: str | bytes):
+        try:
+            msgs = encoding.loads(raw)
+        except ValueError:
+            return
+        for m in msgs if isinstance(msgs, list) else [msgs]:
+            kind = m.get("T")
+            symbol = m.get("S")
+            if kind not in ("q", "t") or symbol not in self._refs:
+                continue
+            snap = self._latest.setdefault(symbol, {
+                "symbol": symbol, "bid_price": None, "ask_price": None,
+                "last_price": None, "timestamp": None,
+            })
+            if kind == "q":
+                snap["bid_price"] = m.get("bp")
+                snap["ask_price"] = m.get("ap")
+                if snap["last_price"] is None and m.get("bp") and m.get("ap"):
+                    snap["last_price"] = (float(m["bp"]) + float(m["ap"])) / 2
+            else:
+                snap["last_price"] = m.get("p")
+            snap["timestamp"] = m.get("t") or snap["timestamp"]
+            for listener in list(self._listeners.get(symbol, ())):
+                try:
+                    listener(symbol, snap)
+                except Exception:
+                    log.exception("quote listener failed")
+
+    async def aclose(self):
+        self._refs.clear()
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
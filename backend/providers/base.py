@@ -4,17 +4,188 @@ Abstract base class for all market data / execution providers.
 
 from __future__ import annotations
 
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Any
+from datetime import date
+from typing import Any, Iterable
+
+import numpy as np
+
+from config import get_settings
+
+OPTION_TYPE_FLAGS = {"call": 1, "put": -1}
+_FLAG_TO_TYPE = {1: "call", -1: "put"}
+
+
+def _opt_float(v: Any) -> float:
+    try:
+        return float(v) if v is not None else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _nan_to_none(values: np.ndarray) -> list[float | None]:
+    return [None if x != x else x for x in values.tolist()]
+
+
+class OptionChain:
+    """
+    Columnar (struct-of-arrays) options chain.
+
+    One NumPy array per field instead of one dict per contract:
+      symbol         object   contract symbol
+      strike_cents   int64    strike * 100, exact integer bucket key
+      expiry         int32    date.toordinal() of expiration, 0 if unknown
+      type_flag      int8     1 call, -1 put, 0 unknown
+      bid, ask, mark, delta, gamma, theta, vega,
+      open_interest, iv, volume
+                     float64  NaN where the provider has no value
+
+    Arrays are read-only so a chain can be shared through caches.
+    ``to_records`` produces the legacy list-of-dicts shape for JSON edges.
+    """
+
+    FLOAT_FIELDS = (
+        "bid", "ask", "mark", "delta", "gamma", "theta", "vega",
+        "open_interest", "iv", "volume",
+    )
+    __slots__ = ("underlying", "symbol", "strike_cents", "expiry", "type_flag") + FLOAT_FIELDS
+
+    def __init__(self, underlying: str, symbol, strike_cents, expiry, type_flag, **floats):
+        self.underlying = underlying
+        self.symbol = np.asarray(symbol, dtype=object)
+        self.strike_cents = np.asarray(strike_cents, dtype=np.int64)
+        self.expiry = np.asarray(expiry, dtype=np.int32)
+        self.type_flag = np.asarray(type_flag, dtype=np.int8)
+        n = self.symbol.size
+        for name in self.FLOAT_FIELDS:
+            col = floats.get(name)
+            arr = np.full(n, np.nan) if col is None else np.asarray(col, dtype=np.float64)
+            setattr(self, name, arr)
+        for name in ("symbol", "strike_cents", "expiry", "type_flag") + self.FLOAT_FIELDS:
+            getattr(self, name).flags.writeable = False
+
+    def __len__(self) -> int:
+        return int(self.symbol.size)
+
+    @property
+    def strike(self) -> np.ndarray:
+        return self.strike_cents / 100.0
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, f).nbytes for f in self.__slots__[1:])
+
+    @classmethod
+    def empty(cls, underlying: str = "") -> "OptionChain":
+        return cls(underlying, [], [], [], [])
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict[str, Any]], underlying: str = "") -> "OptionChain":
+        """Build from the legacy list-of-dicts shape; rows without a strike are dropped."""
+        ordinals: dict[str, int] = {}
+        syms: list[str] = []
+        strikes: list[float] = []
+        expiries: list[int] = []
+        flags: list[int] = []
+        floats: dict[str, list[float]] = {f: [] for f in cls.FLOAT_FIELDS}
+        keys = {
+            "bid": "bid_price", "ask": "ask_price", "mark": "mark_price",
+            "delta": "delta", "gamma": "gamma", "theta": "theta", "vega": "vega",
+            "open_interest": "open_interest", "iv": "implied_volatility", "volume": "volume",
+        }
+        for rec in records:
+            try:
+                strike = float(rec.get("strike_price", 0))
+            except (TypeError, ValueError):
+                continue
+            exp = str(rec.get("expiration_date") or "")
+            if exp not in ordinals:
+                try:
+                    ordinals[exp] = date.fromisoformat(exp).toordinal()
+                except ValueError:
+                    ordinals[exp] = 0
+            syms.append(rec.get("symbol", ""))
+            strikes.append(strike)
+            expiries.append(ordinals[exp])
+            flags.append(OPTION_TYPE_FLAGS.get((rec.get("option_type") or "").lower(), 0))
+            for field, key in keys.items():
+                floats[field].append(_opt_float(rec.get(key)))
+        return cls(
+            underlying,
+            syms,
+            np.rint(np.asarray(strikes, dtype=np.float64) * 100),
+            expiries,
+            flags,
+            **floats,
+        )
+
+    @classmethod
+    def concat(cls, chains: list["OptionChain"]) -> "OptionChain":
+        if not chains:
+            return cls.empty()
+        cols = {f: np.concatenate([getattr(c, f) for c in chains]) for f in cls.__slots__[1:]}
+        return cls(chains[0].underlying, **cols)
+
+    def expiration_dates(self) -> list[str]:
+        return [date.fromordinal(int(o)).isoformat() for o in np.unique(self.expiry) if o > 0]
+
+    def to_records(self) -> list[dict[str, Any]]:
+        """Legacy list-of-dicts view; only call this at the JSON edge."""
+        iso = {int(o): (date.fromordinal(int(o)).isoformat() if o > 0 else None) for o in np.unique(self.expiry)}
+        cols = {f: _nan_to_none(getattr(self, f)) for f in self.FLOAT_FIELDS}
+        strikes = self.strike.tolist()
+        expiries = self.expiry.tolist()
+        flags = self.type_flag.tolist()
+        return [
+            {
+                "symbol": sym,
+                "strike_price": strikes[i],
+                "expiration_date": iso[expiries[i]],
+                "option_type": _FLAG_TO_TYPE.get(flags[i]),
+                "bid_price": cols["bid"][i],
+                "ask_price": cols["ask"][i],
+                "mark_price": cols["mark"][i],
+                "delta": cols["delta"][i],
+                "gamma": cols["gamma"][i],
+                "theta": cols["theta"][i],
+                "vega": cols["vega"][i],
+                "open_interest": cols["open_interest"][i],
+                "implied_volatility": cols["iv"][i],
+                "volume": cols["volume"][i],
+            }
+            for i, sym in enumerate(self.symbol.tolist())
+        ]
 
 
 class BaseProvider(ABC):
     """
     Every provider must implement these methods.
     Return values are plain dicts / lists — no ORM objects — so they
-    serialise straight to JSON.
+    serialise straight to JSON. Options chains additionally have a columnar
+    ``OptionChain`` form for analytics.
     """
 
+    # ── Lifecycle ─────────────────────────────────────────────────────────────
+
+    @property
+    def source_key(self) -> str:
+        """
+        Identifies the upstream data source for shared caches. Instances that
+        would return the same market data should return the same key.
+        """
+        return f"{type(self).__name__}:{id(self)}"
+
+    async def aclose(self) -> None:
+        """Release pooled connections. Providers holding a client override this."""
+
+    def adopt(self, old: "BaseProvider") -> None:
+        """
+        Take over warm state (connections, streams, rate budget) from *old*,
+        the instance this one replaces for the same ``source_key``. *old* is
+        closed afterwards, so anything taken must be swapped out of it.
+        """
+
     # ── Market data ───────────────────────────────────────────────────────────
 
     @abstractmethod
@@ -42,6 +213,55 @@ class BaseProvider(ABC):
           timestamp, open, high, low, close, volume
         """
 
+    async def get_snapshots(self, symbols: list[str]) -> dict[str, dict[str, Any]]:
+        """
+        Return the latest snapshot per symbol, for many symbols at once.
+
+        Each snapshot:
+          price, day_open, day_close, day_volume, prev_close, minute_volume
+
+        Symbols without data are left out. Providers may override; default returns {}.
+        """
+        return {}
+
+    async def get_history_batch(
+        self,
+        symbols: list[str],
+        timeframe: str,
+        start: str,
+        end: str | None = None,
+    ) -> dict[str, list[dict[str, Any]]]:
+        """
+        Bars for many symbols over ``[start, end]``, oldest first, keyed by
+        symbol (same bar layout as ``get_history``). Providers with a
+        multi-symbol endpoint should override; the default calls
+        ``get_history`` per symbol, ``history_batch_concurrency`` at a time.
+        """
+        sem = asyncio.Semaphore(max(1, get_settings().history_batch_concurrency))
+
+        async def one(symbol: str) -> list[dict[str, Any]]:
+            async with sem:
+                return await self.get_history(symbol, timeframe=timeframe, limit=5000, start=start, end=end)
+
+        results = await asyncio.gather(*(one(s) for s in symbols))
+        return dict(zip(symbols, results))
+
+    def bar_alignment(self, timeframe: str) -> int | None:
+        """
+        Offset in seconds of *timeframe* bar starts from epoch multiples of
+        the bar length, if such bars can be rebuilt from this provider's
+        1Min bars. None (the default) means always fetch them.
+        """
+        return None
+
+    def ranged_history(self) -> bool:
+        """
+        Whether ``get_history`` returns exactly the bars in ``[start, end]``
+        (newest ``limit`` of them). Only then can an empty or short page be
+        taken to mean the range is complete and be recorded as covered.
+        """
+        return False
+
     @abstractmethod
     async def get_options_chain(
         self,
@@ -59,6 +279,26 @@ class BaseProvider(ABC):
           open_interest, implied_volatility
         """
 
+    async def get_options_chain_columnar(
+        self,
+        symbol: str,
+        expiration_date: str | None = None,
+        option_type: str | None = None,
+    ) -> OptionChain:
+        """
+        Columnar variant of ``get_options_chain`` used by analytics and caches.
+        Providers that can build arrays directly should override this.
+        """
+        records = await self.get_options_chain(symbol, expiration_date=expiration_date, option_type=option_type)
+        return OptionChain.from_records(records, underlying=symbol)
+
+    def quote_stream(self) -> Any | None:
+        """
+        Push-based quote source (see ``providers.alpaca_stream``), or None
+        when the provider only supports polling ``get_quote``.
+        """
+        return None
+
     # ── Order management ──────────────────────────────────────────────────────
 
     @abstractmethod
@@ -87,8 +327,11 @@ class BaseProvider(ABC):
 
     # ── Trades ───────────────────────────────────────────────────────────────
 
-    async def get_trades(self, symbol: str, limit: int = 200) -> list[dict[str, Any]]:
-        """Return recent trades. Providers may override; default returns []."""
+    async def get_trades(self, symbol: str, limit: int = 200, start: str | None = None) -> list[dict[str, Any]]:
+        """
+        Return trades oldest first. With *start* (RFC 3339, inclusive) only
+        trades at or after it. Providers may override; default returns [].
+        """
         return []
 
     # ── News ─────────────────────────────────────────────────────────────────
@@ -97,11 +340,21 @@ class BaseProvider(ABC):
         """Return recent news articles. Providers may override; default returns []."""
         return []
 
+    async def get_assets(self) -> list[dict[str, Any]]:
+        """
+        Return every active, tradable US equity.
+
+        Each asset:
+          symbol, name, exchange, sector?, market_cap? (billions USD)
+
+        Providers may override; default returns [].
+        """
+        return []
+
     async def get_option_expirations(self, symbol: str) -> list[str]:
         """Return available option expiration dates (YYYY-MM-DD)."""
-        chain = await self.get_options_chain(symbol)
-        exps = sorted({str(c.get("expiration_date")) for c in chain if c.get("expiration_date")})
-        return exps
+        chain = await self.get_options_chain_columnar(symbol)
+        return chain.expiration_dates()
 
     # ── Account ───────────────────────────────────────────────────────────────
 
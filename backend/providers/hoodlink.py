@@ -5,8 +5,8 @@ on the configured host before this provider can be used.
 """
 from __future__ import annotations
 from typing import Any
-import httpx
 from .base import BaseProvider
+from .http import new_client
 from config import get_settings
 
 
@@ -18,24 +18,33 @@ class HoodlinkProvider(BaseProvider):
         api_key = cfg.get("api_key") or s.hoodlink_api_key
         self._base    = url.rstrip("/") + "/api/v1"
         self._headers = {"X-API-Key": api_key}
+        self._client  = new_client(timeout=15.0, headers=self._headers)
+
+    @property
+    def source_key(self) -> str:
+        return f"hoodlink:{self._base}"
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    def adopt(self, old: BaseProvider) -> None:
+        if isinstance(old, HoodlinkProvider) and old._headers == self._headers:
+            self._client, old._client = old._client, self._client
 
     async def _get(self, path: str, **params) -> Any:
-        async with httpx.AsyncClient(timeout=15.0) as c:
-            r = await c.get(f"{self._base}{path}", headers=self._headers, params=params)
-            r.raise_for_status()
-            return r.json()
+        r = await self._client.get(f"{self._base}{path}", params=params)
+        r.raise_for_status()
+        return r.json()
 
     async def _post(self, path: str, body: dict) -> Any:
-        async with httpx.AsyncClient(timeout=15.0) as c:
-            r = await c.post(f"{self._base}{path}", headers=self._headers, json=body)
-            r.raise_for_status()
-            return r.json()
+        r = await self._client.post(f"{self._base}{path}", json=body)
+        r.raise_for_status()
+        return r.json()
 
     async def _delete(self, path: str) -> Any:
-        async with httpx.AsyncClient(timeout=15.0) as c:
-            r = await c.delete(f"{self._base}{path}", headers=self._headers)
-            r.raise_for_status()
-            return r.json()
+        r = await self._client.delete(f"{self._base}{path}")
+        r.raise_for_status()
+        return r.json()
 
     async def get_quote(self, symbol: str) -> dict[str, Any]:
         data = await self._get(f"/market/quote/{symbol}")
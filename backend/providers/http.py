@@ -0,0 +1,107 @@
+"""
+Shared HTTP client factory for providers.
+
+Each provider instance owns exactly one pooled ``httpx.AsyncClient`` so
+repeated calls reuse keep-alive connections instead of paying a new
+TCP+TLS handshake per request.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import httpx
+
+from config import get_settings
+
+
+# True inside long-running poll loops (WebSocket producers, background
+# cache refreshers). Providers send their upstream calls through a separate
+# budget then, so a busy stream or refresher can't drain the one
+# request/response traffic (chains, history) uses.
+_polling: ContextVar[bool] = ContextVar("polling", default=False)
+
+
+@contextmanager
+def polling():
+    """Mark upstream calls made in this context as poll traffic."""
+    token = _polling.set(True)
+    try:
+        yield
+    finally:
+        _polling.reset(token)
+
+
+def is_polling() -> bool:
+    return _polling.get()
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def new_client(timeout: float = 15.0, headers: dict[str, str] | None = None) -> httpx.AsyncClient:
+    """Build a pooled client using the ``http_*`` settings."""
+    s = get_settings()
+    limits = httpx.Limits(
+        max_connections=s.http_max_connections,
+        max_keepalive_connections=s.http_max_keepalive,
+        keepalive_expiry=s.http_keepalive_expiry,
+    )
+    # HTTP/2 needs the optional ``h2`` package; fall back to HTTP/1.1 quietly.
+    http2 = s.http2 and _http2_available()
+    return httpx.AsyncClient(
+        timeout=timeout,
+        limits=limits,
+        http2=http2,
+        headers=headers,
+    )
+
+
+class RequestGate:
+    """
+    Caps in-flight requests and paces them to a per-minute budget.
+
+    Use as ``async with gate:`` around each upstream call. Fan-outs can
+    then simply ``asyncio.gather`` their calls and still stay within both
+    the concurrency cap and the provider's rate limit.
+    """
+
+    def __init__(self, max_concurrency: int, per_minute: int):
+        self._sem = asyncio.Semaphore(max(1, max_concurrency))
+        self._rate = max(1, per_minute) / 60.0
+        self._capacity = float(max(1, per_minute))
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def _take_token(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+    async def __aenter__(self):
+        await self._sem.acquire()
+        try:
+            await self._take_token()
+        except BaseException:
+            self._sem.release()
+            raise
+        return self
+
+    async def __aexit__(self, *exc):
+        self._sem.release()
+
@@ -0,0 +1,175 @@
+"""
+Live data provider instances, keyed by provider ID.
+
+Every configured data provider gets at most one instance, built on first
+use and kept until its config changes or it is deleted, so its pooled
+connections, quote stream and rate budget stay warm whether it is the
+active provider or only pinned by some requests. ``DEFAULT_ID`` stands for
+the provider configured through the environment, used while no data
+provider is active in the DB.
+
+``reload`` reconciles the instances with the DB after provider or
+settings writes. A provider whose config changed is rebuilt and, when the
+new instance reads the same upstream source, takes over the old one's
+connections (``BaseProvider.adopt``); the new active instance is built
+before the active ID flips, so the next request never waits on a cold
+build. Replaced instances are closed after a grace period, leaving
+requests already holding them time to finish.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any
+
+import db
+from config import get_settings
+from .base import BaseProvider
+
+DEFAULT_ID = "default"
+DATA_TYPES = ("alpaca", "hoodlink")
+
+# Requests already holding a replaced provider get this long to finish
+# before its connection pool is closed.
+_RETIRE_GRACE_SEC = 5.0
+
+_instances: dict[str, tuple[str, BaseProvider]] = {}  # id -> (config fingerprint, instance)
+_active: str | None = None  # resolved active id; None until first use
+_lock = asyncio.Lock()
+_retiring: dict[asyncio.Task, BaseProvider] = {}
+_stats = {"builds": 0, "adopted": 0, "retired": 0, "reloads": 0, "swaps": 0}
+
+
+def _build(type_: str, config: dict) -> BaseProvider:
+    if type_ == "hoodlink":
+        from .hoodlink import HoodlinkProvider
+        return HoodlinkProvider(config)
+    from .alpaca import AlpacaProvider
+    return AlpacaProvider(config)
+
+
+def _fingerprint(type_: str, config: dict) -> str:
+    return json.dumps([type_, config], sort_keys=True, default=str)
+
+
+async def _spec(provider_id: str) -> tuple[str, dict] | None:
+    """(type, config) for *provider_id*, or None if it isn't a configured data provider."""
+    if provider_id == DEFAULT_ID:
+        return get_settings().provider, {}
+    p = await db.get_provider(provider_id)
+    if not p or p["type"] not in DATA_TYPES:
+        return None
+    config = {k: v for k, v in p.items() if k not in ("id", "type", "name")}
+    return p["type"], config
+
+
+async def _active_id() -> str:
+    pid = await db.get_active_provider_id("data")
+    if pid and await _spec(pid) is not None:
+        return pid
+    return DEFAULT_ID
+
+
+def _retire(provider: BaseProvider):
+    _stats["retired"] += 1
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+
+    async def close():
+        await asyncio.sleep(_RETIRE_GRACE_SEC)
+        await provider.aclose()
+
+    task = loop.create_task(close())
+    _retiring[task] = provider
+    task.add_done_callback(lambda t: _retiring.pop(t, None))
+
+
+def _replace(provider_id: str, spec: tuple[str, dict]) -> BaseProvider:
+    """Build *provider_id* from *spec*, adopting warm state from the instance it replaces."""
+    new = _build(*spec)
+    _stats["builds"] += 1
+    old = _instances.get(provider_id)
+    if old is not None:
+        if old[1].source_key == new.source_key:
+            new.adopt(old[1])
+            _stats["adopted"] += 1
+        _retire(old[1])
+    _instances[provider_id] = (_fingerprint(*spec), new)
+    return new
+
+
+async def get(provider_id: str | None = None) -> BaseProvider:
+    """
+    The instance for *provider_id*, or the active data provider when None.
+    Raises KeyError for an ID that isn't a configured data provider.
+    """
+    global _active
+    pid = provider_id or _active
+    entry = _instances.get(pid) if pid is not None else None
+    if entry is not None:
+        return entry[1]
+    async with _lock:
+        if provider_id is None:
+            if _active is None:
+                _active = await _active_id()
+            pid = _active
+        entry = _instances.get(pid)
+        if entry is not None:
+            return entry[1]
+        spec = await _spec(pid)
+        if spec is None:
+            raise KeyError(pid)
+        return _replace(pid, spec)
+
+
+async def reload():
+    """Rebuild changed providers, drop deleted ones, then switch the active one."""
+    global _active
+    async with _lock:
+        _stats["reloads"] += 1
+        for pid, (fp, inst) in list(_instances.items()):
+            spec = await _spec(pid)
+            if spec is None:
+                del _instances[pid]
+                _retire(inst)
+            elif _fingerprint(*spec) != fp:
+                _replace(pid, spec)
+        active = await _active_id()
+        if active not in _instances:
+            spec = await _spec(active)
+            if spec is not None:
+                _replace(active, spec)
+        if _active is not None and active != _active:
+            _stats["swaps"] += 1
+        _active = active
+
+
+def active_id() -> str | None:
+    return _active
+
+
+def active_instance() -> BaseProvider | None:
+    entry = _instances.get(_active) if _active is not None else None
+    return entry[1] if entry is not None else None
+
+
+async def close():
+    """Close every instance, retiring ones included (app shutdown)."""
+    global _active
+    pending = [inst for _, inst in _instances.values()] + list(_retiring.values())
+    for task in list(_retiring):
+        task.cancel()
+    _instances.clear()
+    _active = None
+    await asyncio.gather(*(p.aclose() for p in pending), return_exceptions=True)
+
+
+def stats() -> dict[str, Any]:
+    return {
+        **_stats,
+        "active": _active,
+        "live": {pid: inst.source_key for pid, (_, inst) in _instances.items()},
+        "retiring": len(_retiring),
+    }
@@ -1,9 +1,7 @@
 from fastapi import APIRouter, Depends, Query
 from providers.base import BaseProvider
 from routes.deps import get_provider
-from services.gex import compute_gex
-from services.dex import compute_dex
-from services.oi import compute_oi
+from services.exposure import fetch_exposure, project_gex, project_dex, project_oi
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
@@ -24,34 +22,35 @@ def _parse_expirations(expiration_date: str | None, expiration_dates: str | None
     return uniq
 
 
-async def _chain_and_spot(symbol: str, expiration_date: str | None, provider: BaseProvider):
-    chain, quote = await provider.get_options_chain(symbol, expiration_date=expiration_date), None
-    quote = await provider.get_quote(symbol)
-    spot = float(quote.get("last_price") or 0)
-    return chain, spot
+async def _exposure(
+    symbol: str,
+    expiration_date: str | None,
+    expiration_dates: str | None,
+    provider: BaseProvider,
+) -> dict:
+    """One aggregation per request; every analytics route projects from this."""
+    return await fetch_exposure(provider, symbol, _parse_expirations(expiration_date, expiration_dates))
 
 
-@router.get("/gex/{symbol}")
-async def gex(
+@router.get("/exposure/{symbol}")
+async def exposure(
     symbol: str,
     expiration_date: str | None = Query(None),
     expiration_dates: str | None = Query(None, description="comma-separated expiration dates"),
     provider: BaseProvider = Depends(get_provider),
 ):
-    sym = symbol.upper()
-    requested_exps = _parse_expirations(expiration_date, expiration_dates)
-    quote = await provider.get_quote(sym)
-    spot = float(quote.get("last_price") or 0)
+    return await _exposure(symbol, expiration_date, expiration_dates, provider)
 
-    if not requested_exps:
-        chain = await provider.get_options_chain(sym)
-        return {"symbol": sym, "spot": spot, "expirations": [], "data": compute_gex(chain, spot)}
 
-    chain: list[dict] = []
-    for exp in requested_exps:
-        part = await provider.get_options_chain(sym, expiration_date=exp)
-        chain.extend(part)
-    return {"symbol": sym, "spot": spot, "expirations": requested_exps, "data": compute_gex(chain, spot)}
+@router.get("/gex/{symbol}")
+async def gex(
+    symbol: str,
+    expiration_date: str | None = Query(None),
+    expiration_dates: str | None = Query(None, description="comma-separated expiration dates"),
+    provider: BaseProvider = Depends(get_provider),
+):
+    out = await _exposure(symbol, expiration_date, expiration_dates, provider)
+    return {**out, "data": project_gex(out["data"])}
 
 
 @router.get("/dex/{symbol}")
@@ -61,20 +60,8 @@ async def dex(
     expiration_dates: str | None = Query(None, description="comma-separated expiration dates"),
     provider: BaseProvider = Depends(get_provider),
 ):
-    sym = symbol.upper()
-    requested_exps = _parse_expirations(expiration_date, expiration_dates)
-    quote = await provider.get_quote(sym)
-    spot = float(quote.get("last_price") or 0)
-
-    if not requested_exps:
-        chain = await provider.get_options_chain(sym)
-        return {"symbol": sym, "spot": spot, "expirations": [], "data": compute_dex(chain, spot)}
-
-    chain: list[dict] = []
-    for exp in requested_exps:
-        part = await provider.get_options_chain(sym, expiration_date=exp)
-        chain.extend(part)
-    return {"symbol": sym, "spot": spot, "expirations": requested_exps, "data": compute_dex(chain, spot)}
+    out = await _exposure(symbol, expiration_date, expiration_dates, provider)
+    return {**out, "data": project_dex(out["data"])}
 
 
 @router.get("/oi/{symbol}")
@@ -84,19 +71,5 @@ async def open_interest(
     expiration_dates: str | None = Query(None, description="comma-separated expiration dates"),
     provider: BaseProvider = Depends(get_provider),
 ):
-    sym = symbol.upper()
-    requested_exps = _parse_expirations(expiration_date, expiration_dates)
-
-    quote = await provider.get_quote(sym)
-    spot = float(quote.get("last_price") or 0)
-
-    if not requested_exps:
-        chain = await provider.get_options_chain(sym)
-        return {"symbol": sym, "spot": spot, "expirations": [], "data": compute_oi(chain)}
-
-    chain: list[dict] = []
-    for exp in requested_exps:
-        part = await provider.get_options_chain(sym, expiration_date=exp)
-        chain.extend(part)
-
-    return {"symbol": sym, "spot": spot, "expirations": requested_exps, "data": compute_oi(chain)}
+    out = await _exposure(symbol, expiration_date, expiration_dates, provider)
+    return {**out, "data": project_oi(out["data"])}
@@ -1,42 +1,34 @@
-"""FastAPI dependency — resolves the active provider from DB."""
+"""FastAPI dependency — resolves data providers through the live registry."""
 from __future__ import annotations
+from fastapi import HTTPException
+from providers import registry
 from providers.base import BaseProvider
 
-_provider_instance: BaseProvider | None = None
 
+async def reload_providers():
+    """Apply provider / active-provider changes just written to the DB."""
+    await registry.reload()
 
-def invalidate_provider_cache():
-    global _provider_instance
-    _provider_instance = None
 
+async def close_provider():
+    """Close every live provider (app shutdown)."""
+    await registry.close()
 
-async def _build_provider() -> BaseProvider:
-    from db import get_active_provider_config
-    from config import get_settings
 
-    provider_type, config = await get_active_provider_config("data")
-    settings = get_settings()
-
-    if not provider_type:
-        provider_type = settings.provider
-
-    if provider_type == "hoodlink":
-        from providers.hoodlink import HoodlinkProvider
-        return HoodlinkProvider(config or {})
-
-    from providers.alpaca import AlpacaProvider
-    return AlpacaProvider(config or {})
-
-
-async def get_provider() -> BaseProvider:
-    global _provider_instance
-    if _provider_instance is None:
-        _provider_instance = await _build_provider()
-    return _provider_instance
+async def get_provider(provider_id: str | None = None) -> BaseProvider:
+    """
+    The active data provider, or the one *provider_id* pins (a query
+    parameter on routes that depend on this).
+    """
+    try:
+        return await registry.get(provider_id)
+    except KeyError:
+        raise HTTPException(404, "Provider not found")
 
 
 def get_provider_instance() -> BaseProvider:
     """Sync version for WebSocket — returns cached instance or raises."""
-    if _provider_instance is None:
+    provider = registry.active_instance()
+    if provider is None:
         raise RuntimeError("Provider not yet initialised")
-    return _provider_instance
+    return provider
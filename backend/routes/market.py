@@ -1,8 +1,10 @@
 from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, Query
+import timestamps
+from encoding import FastResponse
 from providers.base import BaseProvider
 from routes.deps import get_provider
-from services import history_cache
+from services import chain_cache, history_cache, history_planner, symbol_catalog
 
 router = APIRouter(prefix="/market", tags=["market"])
 
@@ -25,11 +27,9 @@ def _parse_latest_to_end_ts(latest: str | None, timeframe: str) -> int:
         ts = int(datetime.now(timezone.utc).timestamp())
     else:
         # accept unix seconds or ISO-8601
-        try:
-            ts = int(float(latest))
-        except Exception:
-            dt = datetime.fromisoformat(latest.replace("Z", "+00:00"))
-            ts = int(dt.timestamp())
+        ts = timestamps.parse(latest)
+        if ts is None:
+            raise ValueError(f"invalid latest: {latest!r}")
     step = _tf_sec(timeframe)
     return (ts // step) * step
 
@@ -38,40 +38,6 @@ def _ts_to_iso(ts: int) -> str:
     return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat().replace("+00:00", "Z")
 
 
-def _to_unix_ts(ts_raw) -> int | None:
-    if ts_raw is None:
-        return None
-    if isinstance(ts_raw, (int, float)):
-        return int(ts_raw)
-    s = str(ts_raw).strip()
-    if not s:
-        return None
-    try:
-        return int(float(s))
-    except Exception:
-        pass
-
-    # Normalize ISO with optional nanoseconds + trailing Z.
-    try:
-        if s.endswith("Z"):
-            s = s[:-1] + "+00:00"
-        if "." in s:
-            head, rest = s.split(".", 1)
-            tz_part = ""
-            frac = rest
-            for sep in ("+", "-"):
-                ix = rest.find(sep)
-                if ix > 0:
-                    frac = rest[:ix]
-                    tz_part = rest[ix:]
-                    break
-            frac = (frac[:6]).ljust(6, "0")
-            s = f"{head}.{frac}{tz_part}"
-        return int(datetime.fromisoformat(s).timestamp())
-    except Exception:
-        return None
-
-
 @router.get("/history/{symbol}")
 async def history(
     symbol: str,
@@ -88,15 +54,19 @@ async def history(
     if latest is not None:
         step = _tf_sec(timeframe)
         end_ts = _parse_latest_to_end_ts(latest, timeframe)
-        end_iso = _ts_to_iso(end_ts)
 
         # Fully-formed bar boundary; anything newer is still forming and must not be cached forever.
         now_ts = int(datetime.now(timezone.utc).timestamp())
         current_bucket_ts = (now_ts // step) * step
         latest_closed_ts = current_bucket_ts - step
 
-        # Start with immutable cached bars.
-        cached = history_cache.get_cached_bars(sym, timeframe, end_ts=end_ts, limit=limit)
+        # Start with immutable cached bars (memory, then the on-disk store).
+        cached = await history_cache.load_bars(sym, timeframe, end_ts=end_ts, limit=limit)
+        # Short on bars: rebuild them from cached 1Min bars when the provider allows it.
+        offset = provider.bar_alignment(timeframe)
+        if len(cached) < limit and offset is not None:
+            if await history_cache.resample_bars(sym, timeframe, step, offset, end_ts, limit, latest_closed_ts):
+                cached = history_cache.get_cached_bars(sym, timeframe, end_ts=end_ts, limit=limit)
         merged: dict[int, dict] = {}
         for b in cached:
             try:
@@ -104,51 +74,34 @@ async def history(
             except Exception:
                 continue
 
-        # Pull only what is needed (plus small buffer for non-trading gaps).
-        attempts = 0
-        fetch_end_ts = end_ts
-        while len(merged) < limit and attempts < 5:
-            attempts += 1
-            missing = max(1, limit - len(merged))
-            req_limit = min(5000, max(80, int(missing * 1.6)))
-            batch = await provider.get_history(
-                sym,
-                timeframe=timeframe,
-                limit=req_limit,
-                start=start,
-                end=_ts_to_iso(fetch_end_ts),
-            )
-            if not batch:
-                break
-
+        async def fetch(lo: int, hi: int, n: int) -> list[dict]:
+            batch = await provider.get_history(sym, timeframe=timeframe, limit=n, start=_ts_to_iso(lo), end=_ts_to_iso(hi))
+            batch = batch or []
             compact_batch = []
-            for b in batch:
-                ts = _to_unix_ts(b.get("timestamp"))
-                if ts is None:
+            for b, ts in zip(batch, timestamps.parse_many([b.get("timestamp") for b in batch]).tolist()):
+                if ts == timestamps.INVALID:
                     continue
-                compact = {"ts": ts, "o": b.get("open"), "h": b.get("high"), "l": b.get("low"), "c": b.get("close"), "v": b.get("volume")}
-                compact_batch.append(compact)
-                merged[ts] = compact
-
-            # Indefinite caching only for fully-formed immutable bars.
-            history_cache.upsert_immutable_bars(sym, timeframe, compact_batch, latest_closed_ts=latest_closed_ts)
-
-            oldest_ts = min((x.get("ts") for x in compact_batch if isinstance(x.get("ts"), int)), default=None)
-            if oldest_ts is None:
-                break
-            next_fetch_end = oldest_ts - step
-            if next_fetch_end >= fetch_end_ts:
-                break
-            fetch_end_ts = next_fetch_end
+                compact_batch.append({"ts": ts, "o": b.get("open"), "h": b.get("high"), "l": b.get("low"), "c": b.get("close"), "v": b.get("volume")})
+            return compact_batch
+
+        # Fetch only the ranges the cache doesn't cover (caches closed bars as it goes).
+        fetched, report = await history_planner.fill(
+            sym, timeframe, fetch,
+            step=step, offset=offset, end_ts=end_ts, limit=limit,
+            latest_closed_ts=latest_closed_ts, floor_ts=timestamps.parse(start),
+            ranged=provider.ranged_history(),
+        )
+        for b in fetched:
+            merged[b["ts"]] = b
 
         ordered = [merged[k] for k in sorted(merged.keys()) if k <= end_ts]
         if len(ordered) > limit:
             ordered = ordered[-limit:]
         payload = {"s": sym, "tf": timeframe, "b": ordered}
-        return payload
+        return FastResponse(payload, headers={"X-Bars-Planned": str(report["planned"]), "X-Bars-Fetched": str(report["fetched"])})
 
     # Legacy mode (backward compatible)
-    return await provider.get_history(sym, timeframe=timeframe, limit=limit, start=start, end=end)
+    return FastResponse(await provider.get_history(sym, timeframe=timeframe, limit=limit, start=start, end=end))
 
 
 @router.get("/trades/{symbol}")
@@ -167,7 +120,8 @@ async def options_chain(
     option_type: str | None = Query(None, description="call|put"),
     provider: BaseProvider = Depends(get_provider),
 ):
-    return await provider.get_options_chain(symbol.upper(), expiration_date=expiration_date, option_type=option_type)
+    chain = await chain_cache.get_chain(provider, symbol.upper(), expiration_date=expiration_date, option_type=option_type)
+    return FastResponse(chain.to_records())
 
 
 @router.get("/expirations/{symbol}")
@@ -179,27 +133,10 @@ async def option_expirations(
     return {"symbol": symbol.upper(), "expirations": expirations}
 
 
-POPULAR_SYMBOLS = [
-    ("SPY","SPDR S&P 500 ETF"),("QQQ","Invesco QQQ Trust"),("IWM","iShares Russell 2000 ETF"),("DIA","SPDR Dow Jones ETF"),
-    ("AAPL","Apple Inc."),("MSFT","Microsoft Corp."),("NVDA","NVIDIA Corp."),("AMZN","Amazon.com Inc."),("GOOGL","Alphabet Class A"),("META","Meta Platforms"),("TSLA","Tesla Inc."),("AMD","Advanced Micro Devices"),("NFLX","Netflix Inc."),
-    ("JPM","JPMorgan Chase"),("BAC","Bank of America"),("GS","Goldman Sachs"),("XOM","Exxon Mobil"),("CVX","Chevron Corp."),("UNH","UnitedHealth Group"),("PFE","Pfizer Inc."),
-    ("PLTR","Palantir Technologies"),("COIN","Coinbase Global"),("MSTR","MicroStrategy"),("HOOD","Robinhood Markets"),("SOFI","SoFi Technologies"),
-    ("BABA","Alibaba Group"),("NIO","NIO Inc."),("DIS","Walt Disney Co."),("KO","Coca-Cola Co."),("WMT","Walmart Inc."),
-]
-
-
 @router.get("/symbols")
 async def symbol_suggestions(
     q: str = Query("", description="Prefix or partial symbol"),
     limit: int = Query(20, ge=1, le=100),
 ):
-    query = (q or "").strip().upper()
-    if not query:
-        items = [{"symbol": s, "name": n} for s, n in POPULAR_SYMBOLS[:limit]]
-        return {"symbols": [x["symbol"] for x in items], "items": items}
-
-    starts = [(s, n) for s, n in POPULAR_SYMBOLS if s.startswith(query) or n.upper().startswith(query)]
-    contains = [(s, n) for s, n in POPULAR_SYMBOLS if (query in s or query in n.upper()) and (s, n) not in starts]
-    merged = (starts + contains)[:limit]
-    items = [{"symbol": s, "name": n} for s, n in merged]
+    items = [{"symbol": e["symbol"], "name": e.get("name", "")} for e in symbol_catalog.search(q or "", limit)]
     return {"symbols": [x["symbol"] for x in items], "items": items}
@@ -7,7 +7,7 @@ from db import (
     get_all_providers, get_provider, save_provider, delete_provider,
     get_active_provider_id, set_active_provider_id,
 )
-from routes.deps import invalidate_provider_cache
+from routes.deps import reload_providers
 
 router = APIRouter(prefix="/providers", tags=["providers"])
 
@@ -51,7 +51,7 @@ async def create_provider(body: ProviderBody):
         raise HTTPException(400, f"Unsupported type. Supported: {sorted(SUPPORTED_TYPES)}")
     name = body.name or body.type.capitalize()
     pid = await save_provider(None, body.type, name, body.config)
-    invalidate_provider_cache()
+    await reload_providers()
     return {"id": pid, "ok": True}
 
 
@@ -77,7 +77,7 @@ async def update_provider(provider_id: str, body: ProviderBody):
 
     name = body.name or existing.get("name") or body.type.capitalize()
     await save_provider(provider_id, body.type, name, config)
-    invalidate_provider_cache()
+    await reload_providers()
     return {"ok": True}
 
 
@@ -87,7 +87,7 @@ async def remove_provider(provider_id: str):
     if not existing:
         raise HTTPException(404, "Provider not found")
     await delete_provider(provider_id)
-    invalidate_provider_cache()
+    await reload_providers()
     return {"ok": True}
 
 
@@ -97,5 +97,5 @@ async def activate_provider(provider_id: str, body: ActivateBody):
     if not p:
         raise HTTPException(404, "Provider not found")
     await set_active_provider_id(body.role, provider_id)
-    invalidate_provider_cache()
+    await reload_providers()
     return {"ok": True, "active": {body.role: provider_id}}
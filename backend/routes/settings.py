@@ -3,7 +3,7 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 import json
 from db import get_provider_config, set_provider_config, get_active_provider, set_active_provider, get_setting, set_setting
-from routes.deps import invalidate_provider_cache
+from routes.deps import reload_providers
 
 router = APIRouter(prefix="/settings", tags=["settings"])
 
@@ -57,7 +57,7 @@ async def save_alpaca(cfg: AlpacaConfig):
         "paper": cfg.paper,
         "data_url": cfg.data_url,
     })
-    invalidate_provider_cache()
+    await reload_providers()
     return {"ok": True}
 
 
@@ -68,7 +68,7 @@ async def save_hoodlink(cfg: HoodlinkConfig):
     if api_key.startswith("••••••••"):
         api_key = existing.get("api_key", "")
     await set_provider_config("hoodlink", {"url": cfg.url, "api_key": api_key})
-    invalidate_provider_cache()
+    await reload_providers()
     return {"ok": True}
 
 
@@ -77,7 +77,7 @@ async def update_active_provider(body: ActiveProviderBody):
     if body.provider not in ("alpaca", "hoodlink"):
         raise HTTPException(400, "Invalid provider")
     await set_active_provider(body.provider)
-    invalidate_provider_cache()
+    await reload_providers()
     return {"ok": True, "active_provider": body.provider}
 
 
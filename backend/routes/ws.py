@@ -1,215 +1,467 @@
 """
-WebSocket quote stream.
-Backend polls Alpaca REST every 1 second and pushes to all connected clients.
-No Alpaca WebSocket connections used.
+WebSocket streams.
+
+Every stream is a topic on the broadcast hub (services/broadcast.py) with a
+single producer task shared by all subscribers, whichever socket they came
+in on:
+
+    quote:{SYMBOL}                    upstream quote stream, REST poll fallback
+    orderflow:{SYMBOL}                per-second buy/sell aggregation
+    screener:{SYM,SYM,...}            screener rows for a symbol list
+    exposure:{SYMBOL}:{EXP,EXP,...}   GEX/DEX/OI aggregate, refreshed periodically
+
+``/ws/stream`` multiplexes any number of topics over one socket. Clients
+send ``{"op": "subscribe", "channel": "quote", "symbol": "SPY"}`` (screener
+takes ``symbols``, exposure an optional ``expirations`` list) and
+``{"op": "unsubscribe", "topic": ...}``; every server message carries its
+``topic``. Orderflow is delta-encoded (``kind`` "snapshot"/"delta" with a
+``seq``); a client that sees a gap sends ``{"op": "snapshot", "topic": ...}``.
+Quotes are only sent when price, bid or ask change. The per-symbol
+endpoints are kept as adapters over the same topics.
+
+Quote, orderflow and exposure subscriptions may pin a configured data
+provider with ``provider_id``; the topic then ends in ``@{provider_id}``
+and its producer reads from that provider instead of the active one. An
+unknown ID is refused with an ``error`` frame; if the provider is deleted
+later, the topic gets an ``error`` message and its producer stops.
+Screener rows come from the shared screener cache and can't be pinned.
+
+Producers run under ``providers.http.polling`` so their upstream calls
+draw on the provider's poll budget rather than the one REST routes use.
+
+Any endpoint accepts the ``msgpack`` subprotocol (see encoding.py); frames
+are then binary MessagePack instead of JSON text.
 """
 from __future__ import annotations
 import asyncio
-import json
-from collections import defaultdict
-from typing import Set
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+import encoding
+from config import get_settings
 from services import screener_cache
-from routes.deps import get_provider
+from services.exposure import fetch_exposure
+from services.broadcast import Subscriber, hub
+from services.orderflow import OrderFlow
+from providers import registry
+from providers.http import polling
+
+log = logging.getLogger(__name__)
 
 router = APIRouter(tags=["websocket"])
 
-_connections: dict[str, Set[WebSocket]] = defaultdict(set)
-_poll_tasks: dict[str, asyncio.Task] = {}
-_orderflow_connections: dict[str, Set[WebSocket]] = defaultdict(set)
-_orderflow_tasks: dict[str, asyncio.Task] = {}
+# topic -> producer task
+_tasks: dict[str, asyncio.Task] = {}
 
+CHANNELS = ("quote", "orderflow", "screener", "exposure")
+_MAX_TOPICS_PER_SOCKET = 200
 
-async def _poll_loop(symbol: str):
-    while True:
-        clients = _connections.get(symbol)
-        if not clients:
-            break
+# Minimum spacing between stream-driven pushes; bursts of ticks are conflated.
+_STREAM_MIN_INTERVAL = 0.1
 
-        try:
-            provider = await get_provider()
-            quote = await provider.get_quote(symbol)
-            msg = json.dumps({
-                "symbol": symbol,
-                "price": quote.get("last_price"),
-                "bid": quote.get("bid_price"),
-                "ask": quote.get("ask_price"),
-                "ts": quote.get("timestamp"),
-            })
-            dead: Set[WebSocket] = set()
-            for ws in list(clients):
+_ORDERFLOW_WINDOW_SEC = 300
+_ORDERFLOW_PAGE = 10000  # trades per fetch; a backlog drains over successive polls
+
+
+class _ProviderGone(ValueError):
+    """A pinned provider ID isn't (or is no longer) a configured data provider."""
+
+
+async def _provider(provider_id: str | None):
+    try:
+        return await registry.get(provider_id)
+    except KeyError:
+        raise _ProviderGone(f"unknown provider {provider_id!r}") from None
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+async def _quote_loop(topic: str, symbol: str, provider_id: str | None):
+    stream = None
+    last_sent: tuple | None = None
+    updated = asyncio.Event()
+
+    def on_quote(_symbol: str, _snap: dict):
+        updated.set()
+
+    try:
+        while True:
+            if not hub.has_subscribers(topic):
+                break
+
+            try:
+                provider = await _provider(provider_id)
+                current = provider.quote_stream()
+                if current is not stream:
+                    if stream is not None:
+                        stream.unsubscribe(symbol, on_quote)
+                    stream = current
+                    if stream is not None:
+                        stream.subscribe(symbol, on_quote)
+
+                updated.clear()
+                quote = stream.latest(symbol) if stream is not None and stream.connected else None
+                if quote is None:
+                    quote = await provider.get_quote(symbol)
+                    if stream is not None:
+                        stream.seed(symbol, quote)
+                values = (quote.get("last_price"), quote.get("bid_price"), quote.get("ask_price"))
+                if values != last_sent or not hub.has_state(topic):
+                    # Unchanged quotes are not re-sent; late joiners get the last one.
+                    last_sent = values
+                    hub.publish(topic, {
+                        "type": "quote",
+                        "topic": topic,
+                        "symbol": symbol,
+                        "price": values[0],
+                        "bid": values[1],
+                        "ask": values[2],
+                        "ts": quote.get("timestamp"),
+                    })
+            except _ProviderGone:
+                raise
+            except Exception:
+                pass
+
+            if stream is not None and stream.connected:
                 try:
-                    await ws.send_text(msg)
-                except Exception:
-                    dead.add(ws)
-            clients -= dead
+                    await asyncio.wait_for(updated.wait(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    pass
+                await asyncio.sleep(_STREAM_MIN_INTERVAL)
+            else:
+                await asyncio.sleep(1)
+    finally:
+        if stream is not None:
+            stream.unsubscribe(symbol, on_quote)
+
+
+async def _screener_loop(topic: str, symbols: list[str]):
+    while hub.has_subscribers(topic):
+        try:
+            provider = await registry.get()
+            await screener_cache.ensure_fresh(provider, symbols, {})
+            items = [x for x in (screener_cache.get_symbol(s) for s in symbols) if x]
+            hub.publish(topic, {"type": "screener", "topic": topic, "items": items})
+        except Exception:
+            pass
+        await asyncio.sleep(2.0)
+
+
+async def _exposure_loop(topic: str, symbol: str, expirations: list[str], provider_id: str | None):
+    while hub.has_subscribers(topic):
+        try:
+            provider = await _provider(provider_id)
+            out = await fetch_exposure(provider, symbol, expirations)
+            hub.publish(topic, {"type": "exposure", "topic": topic, **out})
+        except _ProviderGone:
+            raise
         except Exception:
             pass
+        await asyncio.sleep(get_settings().exposure_stream_interval_sec)
 
-        await asyncio.sleep(1)
 
-    _poll_tasks.pop(symbol, None)
+async def _orderflow_loop(topic: str, symbol: str, provider_id: str | None):
+    """
+    Publishes deltas: buckets touched and seconds evicted since the previous
+    message, tagged with a sequence number. Snapshots carry the same ``seq``
+    as the delta they follow, so a client resumes from ``seq + 1``.
+    """
+    flow = OrderFlow(_ORDERFLOW_WINDOW_SEC)
+    source = None
+    seq = 0
+    mid = 0.0
+    reset = True
 
+    def snapshot() -> dict[str, Any]:
+        return {
+            "type": "orderflow",
+            "kind": "snapshot",
+            "topic": topic,
+            "symbol": symbol,
+            "seq": seq,
+            "mid": mid,
+            "buckets": flow.buckets(),
+        }
 
-async def _handle_client(websocket: WebSocket, symbol: str):
-    symbol = symbol.upper()
-    await websocket.accept()
-    _connections[symbol].add(websocket)
+    stream = None
+    polled = float("-inf")
+    new_mid = 0.0
 
-    task = _poll_tasks.get(symbol)
-    if task is None or task.done():
-        _poll_tasks[symbol] = asyncio.create_task(_poll_loop(symbol))
+    def on_quote(_symbol: str, _snap: dict):
+        pass
 
     try:
-        while True:
+        while hub.has_subscribers(topic):
             try:
-                await asyncio.wait_for(websocket.receive_text(), timeout=30.0)
-            except asyncio.TimeoutError:
-                await websocket.send_text(json.dumps({"ping": True}))
-    except (WebSocketDisconnect, Exception):
-        pass
+                provider = await _provider(provider_id)
+                if provider.source_key != source:
+                    # New data source: its trades don't continue our cursor.
+                    flow, source, reset = OrderFlow(_ORDERFLOW_WINDOW_SEC), provider.source_key, True
+                    polled = float("-inf")
+                current = provider.quote_stream()
+                if current is not stream:
+                    if stream is not None:
+                        stream.unsubscribe(symbol, on_quote)
+                    stream = current
+                    if stream is not None:
+                        stream.subscribe(symbol, on_quote)
+
+                # Trades are polled every orderflow_poll_interval_sec; between
+                # polls only the mid moves, and only when the stream has it.
+                now = time.time()
+                quote = stream.latest(symbol) if stream is not None and stream.connected else None
+                trades = []
+                if now - polled >= get_settings().orderflow_poll_interval_sec:
+                    polled = now
+                    start = flow.cursor or _iso(now - _ORDERFLOW_WINDOW_SEC)
+                    if quote is None:
+                        quote, trades = await asyncio.gather(
+                            provider.get_quote(symbol),
+                            provider.get_trades(symbol, limit=_ORDERFLOW_PAGE, start=start),
+                        )
+                    else:
+                        trades = await provider.get_trades(symbol, limit=_ORDERFLOW_PAGE, start=start)
+                if quote is not None:
+                    try:
+                        bid = float(quote.get("bid_price") or 0)
+                        ask = float(quote.get("ask_price") or 0)
+                        new_mid = ((bid + ask) / 2.0) if bid and ask else float(quote.get("last_price") or 0)
+                    except (TypeError, ValueError):
+                        new_mid = 0.0
+
+                if trades:
+                    flow.ingest(trades, new_mid, now)
+                flow.evict(now)
+                changed, evicted = flow.take_changes()
+                reset = reset or not hub.has_state(topic)
+                if reset or changed or evicted or new_mid != mid:
+                    seq += 1
+                    mid = new_mid
+                    if reset:
+                        payload = snapshot()
+                        reset = False
+                    else:
+                        payload = {
+                            "type": "orderflow",
+                            "kind": "delta",
+                            "topic": topic,
+                            "symbol": symbol,
+                            "seq": seq,
+                            "mid": mid,
+                            "buckets": changed,
+                            "evicted": evicted,
+                        }
+                    hub.publish(topic, payload, snapshot=snapshot)
+            except _ProviderGone:
+                raise
+            except Exception as e:
+                log.warning("orderflow poll for %s failed: %r", symbol, e)
+            await asyncio.sleep(0.25)
     finally:
-        _connections[symbol].discard(websocket)
+        if stream is not None:
+            stream.unsubscribe(symbol, on_quote)
 
 
-@router.websocket("/ws/quotes/{symbol}")
-async def quote_stream(websocket: WebSocket, symbol: str):
-    await _handle_client(websocket, symbol)
+# ── Topics ────────────────────────────────────────────────────────────────────
 
+def _symbols(raw: Any, limit: int) -> list[str]:
+    if isinstance(raw, str):
+        raw = raw.split(",")
+    out: list[str] = []
+    for s in raw or []:
+        s = str(s).strip().upper()
+        if s and s not in out:
+            out.append(s)
+    return out[:limit]
 
-@router.websocket("/ws/market/{symbol}")
-async def market_stream_legacy(websocket: WebSocket, symbol: str):
-    await _handle_client(websocket, symbol)
 
+def _pinned(params: dict[str, Any]) -> str | None:
+    return str(params.get("provider_id") or "").strip() or None
 
-@router.websocket("/ws/screener")
-async def screener_stream(websocket: WebSocket):
-    await websocket.accept()
-    symbols: list[str] = []
-    provider = await get_provider()
+
+async def _check_pinned(channel: str, params: dict[str, Any]):
+    """Reject a subscription pinned to an unknown provider before it gets a producer."""
+    pid = _pinned(params)
+    if pid and channel != "screener":
+        await _provider(pid)
+
+
+def _resolve(channel: str, params: dict[str, Any]) -> tuple[str, Callable[[str], Awaitable[None]]]:
+    """Map a subscription request to its topic and producer coroutine factory."""
+    if channel == "screener":
+        symbols = _symbols(params.get("symbols"), 100)
+        if not symbols:
+            raise ValueError("screener needs symbols")
+        return f"screener:{','.join(symbols)}", lambda t: _screener_loop(t, symbols)
+
+    symbol = str(params.get("symbol") or "").strip().upper()
+    if not symbol:
+        raise ValueError(f"{channel} needs a symbol")
+    pid = _pinned(params)
+    pin = f"@{pid}" if pid else ""
+    if channel == "quote":
+        return f"quote:{symbol}{pin}", lambda t: _quote_loop(t, symbol, pid)
+    if channel == "orderflow":
+        return f"orderflow:{symbol}{pin}", lambda t: _orderflow_loop(t, symbol, pid)
+    if channel == "exposure":
+        exps = sorted({str(x).strip() for x in (params.get("expirations") or []) if str(x).strip()})
+        return f"exposure:{symbol}:{','.join(exps)}{pin}", lambda t: _exposure_loop(t, symbol, exps, pid)
+    raise ValueError(f"unknown channel {channel!r}")
+
+
+async def _produce(topic: str, factory: Callable[[str], Awaitable[None]]):
+    try:
+        with polling():
+            await factory(topic)
+    except _ProviderGone as e:
+        hub.publish(topic, {"type": "error", "topic": topic, "message": str(e)})
+    finally:
+        if _tasks.get(topic) is asyncio.current_task():
+            del _tasks[topic]
+
+
+def _subscribe(sub: Subscriber, channel: str, params: dict[str, Any], full: bool = False) -> str:
+    topic, factory = _resolve(channel, params)
+    hub.subscribe(sub, topic, full=full)
+    task = _tasks.get(topic)
+    if task is None or task.done():
+        _tasks[topic] = asyncio.create_task(_produce(topic, factory))
+    return topic
+
+
+# ── Endpoints ─────────────────────────────────────────────────────────────────
+
+async def _accept(websocket: WebSocket) -> Subscriber:
+    """Accept, negotiating the MessagePack subprotocol if the client offers it."""
+    subprotocol = encoding.websocket_subprotocol(websocket.scope.get("subprotocols") or [])
+    await websocket.accept(subprotocol=subprotocol)
+    return hub.attach(websocket, binary=subprotocol is not None)
+
+
+async def _receive(websocket: WebSocket, timeout: float) -> str | bytes:
+    message = await asyncio.wait_for(websocket.receive(), timeout=timeout)
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    if message.get("bytes") is not None:
+        return message["bytes"]
+    return message.get("text") or ""
+
+
+def _decode(raw: str | bytes) -> dict[str, Any]:
+    """Parse a client frame. Anything that isn't a well-formed object raises ValueError."""
+    try:
+        msg = encoding.unpackb(raw) if isinstance(raw, bytes) else encoding.loads(raw)
+    except Exception as e:  # decoders differ in what they raise (ValueError, TypeError, msgpack's own)
+        raise ValueError(f"malformed frame: {str(e) or type(e).__name__}") from None
+    if not isinstance(msg, dict):
+        raise ValueError("frame must be an object")
+    return msg
+
+
+@router.websocket("/ws/stream")
+async def multiplexed_stream(websocket: WebSocket):
+    sub = await _accept(websocket)
     try:
         while True:
             try:
-                raw = await asyncio.wait_for(websocket.receive_text(), timeout=2.0)
-                msg = json.loads(raw)
-                symbols = [str(s).upper() for s in (msg.get("symbols") or [])][:100]
+                raw = await _receive(websocket, timeout=30.0)
             except asyncio.TimeoutError:
-                pass
-
-            if symbols:
-                await screener_cache.refresh_if_needed(provider, symbols, {})
-                items = [x for x in (screener_cache.get_symbol(s) for s in symbols) if x]
-                await websocket.send_text(json.dumps({"type": "screener", "items": items}))
-            else:
-                await websocket.send_text(json.dumps({"ping": True}))
+                hub.send(sub, {"ping": True})
+                continue
+            msg: dict[str, Any] = {}
+            try:
+                msg = _decode(raw)
+                op = msg.get("op")
+                if op == "subscribe":
+                    if len(sub.topics) >= _MAX_TOPICS_PER_SOCKET:
+                        raise ValueError("too many subscriptions")
+                    channel = str(msg.get("channel") or "")
+                    topic = _resolve(channel, msg)[0]
+                    await _check_pinned(channel, msg)
+                    # Ack first so the client can route the priming snapshot.
+                    hub.send(sub, {"type": "subscribed", "id": msg.get("id"), "topic": topic})
+                    _subscribe(sub, channel, msg)
+                elif op == "unsubscribe":
+                    topic = msg.get("topic") or _resolve(str(msg.get("channel") or ""), msg)[0]
+                    hub.unsubscribe(sub, topic)
+                    hub.send(sub, {"type": "unsubscribed", "id": msg.get("id"), "topic": topic})
+                elif op == "snapshot":
+                    hub.resync(sub, str(msg.get("topic") or ""))
+                elif op != "ping":
+                    raise ValueError(f"unknown op {op!r}")
+            except (ValueError, TypeError, AttributeError) as e:
+                # Malformed frames and ill-typed fields get an error reply, not a closed socket.
+                hub.send(sub, {"type": "error", "id": msg.get("id"), "message": str(e)})
     except (WebSocketDisconnect, Exception):
-        return
+        pass
+    finally:
+        hub.release(sub)
 
 
-async def _orderflow_loop(symbol: str):
-    symbol = symbol.upper()
-    while True:
-        clients = _orderflow_connections.get(symbol)
-        if not clients:
-            break
-        try:
-            provider = await get_provider()
-            quote = await provider.get_quote(symbol)
-            trades = await provider.get_trades(symbol, limit=1200)
-            mid = 0.0
+async def _serve_channel(websocket: WebSocket, channel: str, symbol: str):
+    """
+    Single-topic legacy endpoint: subscribe, then keep alive with pings.
+    These clients predate the delta protocol and always get full snapshots.
+    """
+    sub = await _accept(websocket)
+    params = {"symbol": symbol, "provider_id": websocket.query_params.get("provider_id")}
+    try:
+        await _check_pinned(channel, params)
+        _subscribe(sub, channel, params, full=True)
+    except ValueError as e:
+        hub.send(sub, {"type": "error", "message": str(e)})
+    try:
+        while True:
             try:
-                bid = float(quote.get("bid_price") or 0)
-                ask = float(quote.get("ask_price") or 0)
-                mid = ((bid + ask) / 2.0) if bid and ask else float(quote.get("last_price") or 0)
-            except Exception:
-                mid = 0.0
-
-            ordered = sorted(trades or [], key=lambda t: t.get("timestamp", ""))
-            by_sec: dict[int, dict[str, float]] = {}
-            prev_trade_price = 0.0
-            for t in ordered:
-                ts_raw = t.get("timestamp")
-                if not ts_raw:
-                    continue
-                try:
-                    ts = ts_raw.replace("Z", "+00:00") if isinstance(ts_raw, str) else ""
-                    sec = int(__import__("datetime").datetime.fromisoformat(ts).timestamp())
-                except Exception:
-                    continue
-                if sec < (int(__import__("time").time()) - 300):
-                    continue
-                price = float(t.get("price") or 0)
-                size = float(t.get("size") or 0)
-                if not price or not size:
-                    continue
-                conds = t.get("conditions") or []
-                is_t = isinstance(conds, list) and ("T" in conds)
-                slot = by_sec.get(sec) or {"buy": 0.0, "sell": 0.0, "pxv": 0.0, "vol": 0.0}
-                if is_t and prev_trade_price > 0:
-                    if price > prev_trade_price:
-                        slot["buy"] += size
-                    elif price < prev_trade_price:
-                        slot["sell"] += size
-                    else:
-                        slot["buy"] += size / 2; slot["sell"] += size / 2
-                elif mid > 0:
-                    if price > mid:
-                        slot["buy"] += size
-                    elif price < mid:
-                        slot["sell"] += size
-                    else:
-                        slot["buy"] += size / 2; slot["sell"] += size / 2
-                else:
-                    slot["buy"] += size / 2; slot["sell"] += size / 2
-                slot["pxv"] += price * size
-                slot["vol"] += size
-                by_sec[sec] = slot
-                prev_trade_price = price
-
-            buckets = []
-            for k, v in sorted(by_sec.items()):
-                vol = float(v.get("vol") or 0.0)
-                buy = float(v.get("buy") or 0.0)
-                sell = float(v.get("sell") or 0.0)
-                price = (float(v.get("pxv") or 0.0) / vol) if vol > 0 else 0.0
-                imbalance = ((buy - sell) / vol) if vol > 0 else 0.0
-                buckets.append({"sec": k, "buy": buy, "sell": sell, "vol": vol, "price": price, "imbalance": imbalance})
-
-            payload = {
-                "type": "orderflow",
-                "symbol": symbol,
-                "mid": mid,
-                "buckets": buckets,
-            }
-            msg = json.dumps(payload)
-            dead: Set[WebSocket] = set()
-            for ws in list(clients):
-                try:
-                    await ws.send_text(msg)
-                except Exception:
-                    dead.add(ws)
-            clients -= dead
-        except Exception:
-            pass
-        await asyncio.sleep(0.25)
-    _orderflow_tasks.pop(symbol, None)
+                await _receive(websocket, timeout=30.0)
+            except asyncio.TimeoutError:
+                hub.send(sub, {"ping": True})
+    except (WebSocketDisconnect, Exception):
+        pass
+    finally:
+        hub.release(sub)
+
+
+@router.websocket("/ws/quotes/{symbol}")
+async def quote_stream(websocket: WebSocket, symbol: str):
+    await _serve_channel(websocket, "quote", symbol)
+
+
+@router.websocket("/ws/market/{symbol}")
+async def market_stream_legacy(websocket: WebSocket, symbol: str):
+    await _serve_channel(websocket, "quote", symbol)
 
 
 @router.websocket("/ws/orderflow/{symbol}")
 async def orderflow_stream(websocket: WebSocket, symbol: str):
-    symbol = symbol.upper()
-    await websocket.accept()
-    _orderflow_connections[symbol].add(websocket)
-    task = _orderflow_tasks.get(symbol)
-    if task is None or task.done():
-        _orderflow_tasks[symbol] = asyncio.create_task(_orderflow_loop(symbol))
+    await _serve_channel(websocket, "orderflow", symbol)
+
+
+@router.websocket("/ws/screener")
+async def screener_stream(websocket: WebSocket):
+    # The client re-sends its symbol list whenever it changes.
+    sub = await _accept(websocket)
+    topic = ""
     try:
         while True:
             try:
-                await asyncio.wait_for(websocket.receive_text(), timeout=30.0)
+                msg = _decode(await _receive(websocket, timeout=2.0))
+                if topic:
+                    hub.unsubscribe(sub, topic)
+                    topic = ""
+                if msg.get("symbols"):
+                    topic = _subscribe(sub, "screener", msg)
             except asyncio.TimeoutError:
-                await websocket.send_text(json.dumps({"ping": True}))
+                if not topic:
+                    hub.send(sub, {"ping": True})
+            except (ValueError, TypeError) as e:
+                hub.send(sub, {"type": "error", "message": str(e)})
     except (WebSocketDisconnect, Exception):
-        pass
+        return
     finally:
-        _orderflow_connections[symbol].discard(websocket)
+        hub.release(sub)
@@ -0,0 +1,311 @@
+"""
+On-disk tier for the immutable bar cache.
+
+Closed bars accepted by ``history_cache.upsert_immutable_bars`` are
+buffered here and written behind to a SQLite file (``bar_store_path``)
+every ``bar_store_flush_sec``, so history survives restarts without
+re-downloading it. ``history_cache.load_bars`` reads through to the store
+when memory can't satisfy a request and warms the in-memory series with
+the result.
+
+Alongside bars the store keeps coverage spans: ``[lo, hi]`` ranges of bar
+timestamps known to be complete (a range with no bars in it was empty
+upstream, not missing). Spans are written after their bars, so a stored
+span never refers to bars that aren't on disk.
+
+All SQLite work runs on one dedicated thread that owns the connection.
+The flush loop also enforces retention (intraday bars older than
+``bar_store_intraday_retention_days``; daily and longer are kept) and
+compacts the file every ``bar_store_compact_hours``.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import numpy as np
+
+from config import get_settings
+
+log = logging.getLogger(__name__)
+
+_FIELDS = ("o", "h", "l", "c", "v")
+# Buffered rows that trigger an early flush.
+_FLUSH_ROWS = 50_000
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bar-store")
+_conn: sqlite3.Connection | None = None
+_pending: list[tuple] = []
+_pending_spans: list[tuple] = []
+_wake: asyncio.Event | None = None
+_task: asyncio.Task | None = None
+_last_compact = 0.0
+_stats = {
+    "reads": 0, "read_rows": 0, "flushes": 0, "written_rows": 0, "dropped_rows": 0,
+    "pruned_rows": 0, "compactions": 0, "errors": 0,
+}
+
+
+def enabled() -> bool:
+    return bool(get_settings().bar_store_path)
+
+
+def _intraday(tf: str) -> bool:
+    return not tf.endswith(("day", "d", "week", "w", "month", "mo"))
+
+
+# ── Store thread ──────────────────────────────────────────────
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        path = get_settings().bar_store_path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False)
+        # auto_vacuum only takes effect before the first table is created.
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS bars (
+                sym TEXT    NOT NULL,
+                tf  TEXT    NOT NULL,
+                ts  INTEGER NOT NULL,
+                o REAL, h REAL, l REAL, c REAL, v REAL,
+                PRIMARY KEY (sym, tf, ts)
+            ) WITHOUT ROWID
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS spans (
+                sym TEXT    NOT NULL,
+                tf  TEXT    NOT NULL,
+                lo  INTEGER NOT NULL,
+                hi  INTEGER NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS spans_key ON spans (sym, tf)")
+        conn.commit()
+        _conn = conn
+    return _conn
+
+
+def merge_spans(spans: list[tuple[int, int]], gap: int = 0) -> list[tuple[int, int]]:
+    """Sort and merge ``[lo, hi]`` spans that overlap or are within *gap* of each other."""
+    merged: list[tuple[int, int]] = []
+    for lo, hi in sorted(spans):
+        if merged and lo <= merged[-1][1] + gap:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+def _write(rows: list[tuple], spans: list[tuple]):
+    db = _db()
+    with db:
+        db.executemany("INSERT OR REPLACE INTO bars (sym, tf, ts, o, h, l, c, v) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        db.executemany("INSERT INTO spans (sym, tf, lo, hi) VALUES (?, ?, ?, ?)", spans)
+
+
+def _read(sym: str, tf: str, start_ts: int | None, end_ts: int, limit: int) -> list[tuple]:
+    cur = _db().execute(
+        "SELECT ts, o, h, l, c, v FROM bars WHERE sym = ? AND tf = ? AND ts >= ? AND ts <= ? ORDER BY ts DESC LIMIT ?",
+        (sym, tf, start_ts if start_ts is not None else -(1 << 62), end_ts, limit),
+    )
+    return cur.fetchall()
+
+
+def _read_spans(sym: str, tf: str) -> list[tuple[int, int]]:
+    return _db().execute("SELECT lo, hi FROM spans WHERE sym = ? AND tf = ?", (sym, tf)).fetchall()
+
+
+def _compact(retention_days: int) -> int:
+    db = _db()
+    pruned = 0
+    if retention_days > 0:
+        cutoff = int(time.time()) - retention_days * 86400
+        tfs = [tf for (tf,) in db.execute("SELECT DISTINCT tf FROM bars") if _intraday(tf)]
+        with db:
+            for tf in tfs:
+                pruned += db.execute("DELETE FROM bars WHERE tf = ? AND ts < ?", (tf, cutoff)).rowcount
+                db.execute("DELETE FROM spans WHERE tf = ? AND hi < ?", (tf, cutoff))
+                db.execute("UPDATE spans SET lo = ? WHERE tf = ? AND lo < ?", (cutoff, tf, cutoff))
+    # Collapse the spans each fetch appended.
+    keys = db.execute("SELECT sym, tf FROM spans GROUP BY sym, tf HAVING COUNT(*) > 1").fetchall()
+    with db:
+        for sym, tf in keys:
+            spans = merge_spans(_read_spans(sym, tf))
+            db.execute("DELETE FROM spans WHERE sym = ? AND tf = ?", (sym, tf))
+            db.executemany("INSERT INTO spans (sym, tf, lo, hi) VALUES (?, ?, ?, ?)", [(sym, tf, lo, hi) for lo, hi in spans])
+    db.execute("PRAGMA incremental_vacuum")
+    db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return pruned
+
+
+def _size() -> dict[str, int]:
+    # File size only: COUNT(*) would scan the whole table on every status call.
+    db = _db()
+    (pages,) = db.execute("PRAGMA page_count").fetchone()
+    (page_size,) = db.execute("PRAGMA page_size").fetchone()
+    return {"bytes": pages * page_size}
+
+
+def _close():
+    global _conn
+    if _conn is not None:
+        _conn.close()
+        _conn = None
+
+
+async def _run(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+
+
+# ── Public API ────────────────────────────────────────────────
+
+def _writing() -> bool:
+    return _task is not None and not _task.done()
+
+
+def enqueue(sym: str, tf: str, ts: np.ndarray, cols: dict[str, np.ndarray]):
+    """Buffer closed bars for the next write-behind flush (dropped while no flush loop runs)."""
+    if not enabled() or not len(ts):
+        return
+    if not _writing():
+        # Nothing would drain the buffer; the bars stay in memory only.
+        _stats["dropped_rows"] += len(ts)
+        return
+    values = [np.where(np.isnan(cols[f]), None, cols[f]).tolist() for f in _FIELDS]
+    _pending.extend(zip([sym] * len(ts), [tf] * len(ts), ts.tolist(), *values))
+    if len(_pending) >= _FLUSH_ROWS and _wake is not None:
+        _wake.set()
+
+
+def enqueue_span(sym: str, tf: str, lo: int, hi: int):
+    """Record ``[lo, hi]`` as complete once the bars buffered so far are written."""
+    if enabled() and lo <= hi and _writing():
+        _pending_spans.append((sym, tf, lo, hi))
+
+
+async def read(
+    sym: str, tf: str, end_ts: int, limit: int, start_ts: int | None = None,
+) -> tuple[np.ndarray, dict[str, np.ndarray]] | None:
+    """The last *limit* stored bars in ``[start_ts, end_ts]``, oldest first."""
+    if not enabled() or limit <= 0:
+        return None
+    try:
+        rows = await _run(_read, sym, tf, start_ts, end_ts, limit)
+    except Exception:
+        _stats["errors"] += 1
+        log.exception("bar store read failed")
+        return None
+    _stats["reads"] += 1
+    if not rows:
+        return None
+    _stats["read_rows"] += len(rows)
+    rows.reverse()
+    ts = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    cols = {f: np.array([r[i + 1] for r in rows], dtype=np.float64) for i, f in enumerate(_FIELDS)}
+    return ts, cols
+
+
+async def read_spans(sym: str, tf: str) -> list[tuple[int, int]]:
+    """Stored coverage spans for one series, unmerged."""
+    if not enabled():
+        return []
+    try:
+        return await _run(_read_spans, sym, tf)
+    except Exception:
+        _stats["errors"] += 1
+        log.exception("bar store span read failed")
+        return []
+
+
+async def flush():
+    """Write buffered bars now."""
+    if not _pending and not _pending_spans:
+        return
+    rows = _pending[:]
+    spans = _pending_spans[:]
+    del _pending[:len(rows)]
+    del _pending_spans[:len(spans)]
+    try:
+        await _run(_write, rows, spans)
+    except Exception:
+        _stats["errors"] += 1
+        log.exception("bar store flush failed; dropping %d rows", len(rows))
+        return
+    _stats["flushes"] += 1
+    _stats["written_rows"] += len(rows)
+
+
+async def compact():
+    """Apply retention and return freed pages to the filesystem."""
+    global _last_compact
+    _last_compact = time.monotonic()
+    try:
+        pruned = await _run(_compact, get_settings().bar_store_intraday_retention_days)
+    except Exception:
+        _stats["errors"] += 1
+        log.exception("bar store compaction failed")
+        return
+    _stats["compactions"] += 1
+    _stats["pruned_rows"] += pruned
+
+
+async def _loop():
+    s = get_settings()
+    await compact()
+    while True:
+        try:
+            await asyncio.wait_for(_wake.wait(), timeout=s.bar_store_flush_sec)
+        except asyncio.TimeoutError:
+            pass
+        _wake.clear()
+        try:
+            await flush()
+            if s.bar_store_compact_hours > 0 and time.monotonic() - _last_compact >= s.bar_store_compact_hours * 3600:
+                await compact()
+        except Exception:
+            # One bad cycle must not end write-behind for the process.
+            _stats["errors"] += 1
+            log.exception("bar store flush cycle failed")
+
+
+def start():
+    global _wake, _task
+    if not enabled() or _task is not None:
+        return
+    _wake = asyncio.Event()
+    _task = asyncio.create_task(_loop())
+
+
+async def stop():
+    """Stop the flush loop, write what's buffered and close the file."""
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+    if enabled():
+        await flush()
+        await _run(_close)
+
+
+async def stats() -> dict[str, Any]:
+    out: dict[str, Any] = {"enabled": enabled(), "pending_rows": len(_pending), **_stats}
+    if enabled():
+        try:
+            out.update(await _run(_size))
+        except Exception:
+            pass
+    return out
@@ -0,0 +1,271 @@
+"""
+Pub/sub hub for WebSocket fan-out.
+
+Producers publish once per topic; the payload is wrapped in a ``Frame``
+that serialises it at most once per wire encoding (JSON text, or
+MessagePack for clients that negotiated the ``msgpack`` subprotocol) and is
+handed to every subscriber's bounded outbound queue. Each client has
+its own writer task, so one slow browser never delays the others.
+
+Slow clients are conflated: when a queue is full, older messages for the
+same topic are dropped in favour of the newest one. Clients whose oldest
+pending message is older than ``ws_max_lag_sec``, or whose socket stops
+accepting writes within ``ws_send_timeout_sec``, are disconnected. The last
+message per topic is kept so late subscribers are primed immediately.
+
+Delta topics publish with a ``snapshot`` factory. New subscribers, clients
+asking to resync, and clients whose queued deltas were conflated away get
+a full snapshot instead; subscribers in ``full`` mode (legacy endpoints)
+get a snapshot on every publish.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import defaultdict, deque
+from typing import Any, Callable
+
+from fastapi import WebSocket
+
+import encoding
+from config import get_settings
+
+log = logging.getLogger(__name__)
+
+# Close code for "try again later" — the client may reconnect.
+_CLOSE_SLOW = 1013
+
+Snapshot = Callable[[], "dict[str, Any]"]
+
+
+class Frame:
+    """One outbound message, encoded lazily and at most once per encoding."""
+
+    __slots__ = ("payload", "_text", "_binary")
+
+    def __init__(self, payload: dict[str, Any]):
+        self.payload = payload
+        self._text: str | None = None
+        self._binary: bytes | None = None
+
+    def text(self) -> str:
+        if self._text is None:
+            self._text = encoding.dumps(self.payload).decode("utf-8")
+        return self._text
+
+    def binary(self) -> bytes:
+        if self._binary is None:
+            self._binary = encoding.packb(self.payload)
+        return self._binary
+
+
+class Subscriber:
+    def __init__(self, hub: "Hub", websocket: WebSocket, binary: bool = False):
+        s = get_settings()
+        self.ws = websocket
+        self.binary = binary
+        self.topics: set[str] = set()
+        self.full: set[str] = set()  # topics delivered as snapshots only
+        self._hub = hub
+        self._queue: deque[tuple[str, Frame, float]] = deque()
+        self._maxlen = max(1, s.ws_queue_max)
+        self._ready = asyncio.Event()
+        self._closed = False
+        # metrics
+        self.sent = 0
+        self.dropped = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._task = asyncio.create_task(self._writer())
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def offer(self, topic: str, frame: Frame, snapshot: Callable[[], Frame] | None = None):
+        if self._closed:
+            return
+        now = time.monotonic()
+        q = self._queue
+        if q and now - q[0][2] > get_settings().ws_max_lag_sec:
+            self._disconnect("lagging")
+            return
+        if len(q) >= self._maxlen:
+            # Conflate: keep only the newest message for this topic.
+            kept = deque(m for m in q if m[0] != topic)
+            conflated = len(q) - len(kept)
+            self.dropped += conflated
+            if conflated and snapshot is not None:
+                frame = snapshot()  # dropped deltas: resend full state
+            if len(kept) >= self._maxlen:
+                kept.popleft()
+                self.dropped += 1
+            self._queue = q = kept
+        q.append((topic, frame, now))
+        self._ready.set()
+
+    async def _writer(self):
+        timeout = get_settings().ws_send_timeout_sec
+        try:
+            while True:
+                await self._ready.wait()
+                while self._queue:
+                    _, frame, queued_at = self._queue.popleft()
+                    if self.binary:
+                        send = self.ws.send_bytes(frame.binary())
+                    else:
+                        send = self.ws.send_text(frame.text())
+                    await asyncio.wait_for(send, timeout=timeout)
+                    self.sent += 1
+                    self.last_lag = time.monotonic() - queued_at
+                    self.max_lag = max(self.max_lag, self.last_lag)
+                self._ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            self._disconnect("send timeout")
+        except Exception:
+            self._disconnect(None)
+
+    def _disconnect(self, reason: str | None):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.clear()
+        self._hub.detach(self)
+        if reason:
+            log.info("dropping slow websocket client: %s", reason)
+            asyncio.create_task(self._close(reason))
+
+    async def _close(self, reason: str):
+        try:
+            await self.ws.close(code=_CLOSE_SLOW, reason=reason)
+        except Exception:
+            pass
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "topics": sorted(self.topics),
+            "encoding": "msgpack" if self.binary else "json",
+            "queued": len(self._queue),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "last_lag_ms": round(self.last_lag * 1000, 1),
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+        }
+
+    def close(self):
+        self._closed = True
+        self._queue.clear()
+        self._task.cancel()
+
+
+class Hub:
+    def __init__(self):
+        self._topics: dict[str, set[Subscriber]] = defaultdict(set)
+        self._subscribers: set[Subscriber] = set()
+        self._last: dict[str, Frame] = {}
+        self._snapshots: dict[str, Snapshot] = {}
+        self.published = 0
+
+    def attach(self, websocket: WebSocket, binary: bool = False) -> Subscriber:
+        sub = Subscriber(self, websocket, binary)
+        self._subscribers.add(sub)
+        return sub
+
+    def detach(self, sub: Subscriber):
+        for topic in list(sub.topics):
+            self.unsubscribe(sub, topic)
+        self._subscribers.discard(sub)
+
+    def release(self, sub: Subscriber):
+        """Detach and stop the writer; call when the client's socket is gone."""
+        self.detach(sub)
+        sub.close()
+
+    def subscribe(self, sub: Subscriber, topic: str, full: bool = False):
+        if sub.closed:
+            return
+        subs = self._topics[topic]
+        if sub in subs:
+            return
+        subs.add(sub)
+        sub.topics.add(topic)
+        if full:
+            sub.full.add(topic)
+        self.resync(sub, topic)
+
+    def unsubscribe(self, sub: Subscriber, topic: str):
+        subs = self._topics.get(topic)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del self._topics[topic]
+                self._last.pop(topic, None)
+                self._snapshots.pop(topic, None)
+        sub.topics.discard(topic)
+        sub.full.discard(topic)
+
+    def has_subscribers(self, topic: str) -> bool:
+        return bool(self._topics.get(topic))
+
+    def has_state(self, topic: str) -> bool:
+        """Whether new subscribers to *topic* can be primed without a publish."""
+        return topic in self._last or topic in self._snapshots
+
+    def resync(self, sub: Subscriber, topic: str):
+        """Queue the current state of *topic* for one subscriber, if known."""
+        if topic not in sub.topics:
+            return
+        factory = self._snapshots.get(topic)
+        frame = Frame(factory()) if factory is not None else self._last.get(topic)
+        if frame is not None:
+            sub.offer(topic, frame)
+
+    def publish(self, topic: str, payload: dict[str, Any], snapshot: Snapshot | None = None) -> int:
+        """
+        Enqueue *payload* for every subscriber. Returns the fan-out.
+
+        Pass *snapshot* when *payload* is a delta; it is only called (once)
+        if some subscriber needs the full state.
+        """
+        subs = self._topics.get(topic)
+        if not subs:
+            return 0
+        frame = Frame(payload)
+        snap: Callable[[], Frame] | None = None
+        if snapshot is None:
+            self._last[topic] = frame
+        else:
+            self._snapshots[topic] = snapshot
+            cached: list[Frame] = []
+
+            def _snap() -> Frame:
+                if not cached:
+                    cached.append(Frame(snapshot()))
+                return cached[0]
+
+            snap = _snap
+
+        for sub in list(subs):
+            if snap is not None and topic in sub.full:
+                sub.offer(topic, snap())
+            else:
+                sub.offer(topic, frame, snap)
+        self.published += 1
+        return len(subs)
+
+    def send(self, sub: Subscriber, payload: dict[str, Any]):
+        """Queue a message for one subscriber (heartbeats, acks)."""
+        sub.offer("", Frame(payload))
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "published": self.published,
+            "topics": {t: len(s) for t, s in self._topics.items()},
+            "clients": [s.stats() for s in self._subscribers],
+        }
+
+
+hub = Hub()
@@ -1,17 +1,73 @@
 """
 Black-Scholes Greeks calculator.
 Used when the broker/data provider doesn't return live Greeks.
+
+``bs_greeks_batch`` and ``implied_vol_batch`` work on a whole chain in
+vectorized NumPy passes; ``bs_greeks`` and ``iv_from_price`` are the scalar
+convenience wrappers around them.
 """
 from __future__ import annotations
 import math
 
+import numpy as np
+
+from services.normal import norm_cdf
+
+_INV_SQRT_2PI = 1.0 / math.sqrt(2 * math.pi)
+
+
+def bs_greeks_batch(
+    S,                 # spot price(s)
+    K,                 # strike price(s)
+    T,                 # time(s) to expiry in years
+    sigma,             # implied volatility(ies)
+    is_call,           # bool array, or "call"/"put" strings
+    r: float = 0.053,
+) -> dict[str, np.ndarray]:
+    """
+    Vectorized Greeks for a whole chain. Inputs broadcast against each other.
+
+    Returns unrounded float64 arrays ``delta, gamma, theta, vega`` (theta per
+    day, vega per 1% IV). Contracts with non-positive S/K/T/sigma get zeros,
+    matching the scalar function.
+    """
+    S, K, T, sigma = np.broadcast_arrays(
+        np.asarray(S, dtype=np.float64),
+        np.asarray(K, dtype=np.float64),
+        np.asarray(T, dtype=np.float64),
+        np.asarray(sigma, dtype=np.float64),
+    )
+    call = np.asarray(is_call)
+    if call.dtype != np.bool_:
+        call = call == "call"
+    call = np.broadcast_to(call, S.shape)
+
+    valid = (T > 0) & (S > 0) & (K > 0) & (sigma > 0)
+    # Substitute harmless values for invalid rows so the math stays finite.
+    Sv = np.where(valid, S, 1.0)
+    Kv = np.where(valid, K, 1.0)
+    Tv = np.where(valid, T, 1.0)
+    sv = np.where(valid, sigma, 1.0)
 
-def _norm_pdf(x: float) -> float:
-    return math.exp(-0.5 * x * x) / math.sqrt(2 * math.pi)
+    d1, d2, sqrt_t = _d1_d2(Sv, Kv, Tv, sv, r)
+    pdf_d1 = np.exp(-0.5 * d1 * d1) * _INV_SQRT_2PI
+    cdf_d1, cdf_d2 = norm_cdf(np.stack([d1, d2]))
 
+    gamma = pdf_d1 / (Sv * sv * sqrt_t)
+    vega = Sv * pdf_d1 * sqrt_t / 100  # per 1% move in IV
+    decay = -(Sv * pdf_d1 * sv) / (2 * sqrt_t)
+    carry = r * Kv * np.exp(-r * Tv)
+    delta = np.where(call, cdf_d1, cdf_d1 - 1.0)
+    # N(-d2) == 1 - N(d2)
+    theta = np.where(call, decay - carry * cdf_d2, decay + carry * (1.0 - cdf_d2)) / 365
 
-def _norm_cdf(x: float) -> float:
-    return 0.5 * (1.0 + math.erf(x / math.sqrt(2)))
+    zero = np.zeros_like(Sv)
+    return {
+        "delta": np.where(valid, delta, zero),
+        "gamma": np.where(valid, gamma, zero),
+        "theta": np.where(valid, theta, zero),
+        "vega": np.where(valid, vega, zero),
+    }
 
 
 def bs_greeks(
@@ -22,30 +78,153 @@ def bs_greeks(
     sigma: float = 0.2, # implied volatility (default 20% if unknown)
     option_type: str = "call",
 ) -> dict:
-    if T <= 0 or S <= 0 or K <= 0 or sigma <= 0:
-        return {"delta": 0.0, "gamma": 0.0, "theta": 0.0, "vega": 0.0}
-    try:
-        d1 = (math.log(S / K) + (r + 0.5 * sigma**2) * T) / (sigma * math.sqrt(T))
-        d2 = d1 - sigma * math.sqrt(T)
-        pdf_d1 = _norm_pdf(d1)
-        gamma = pdf_d1 / (S * sigma * math.sqrt(T))
-        vega = S * pdf_d1 * math.sqrt(T) / 100  # per 1% move in IV
-        if option_type == "call":
-            delta = _norm_cdf(d1)
-            theta = (-(S * pdf_d1 * sigma) / (2 * math.sqrt(T))
-                     - r * K * math.exp(-r * T) * _norm_cdf(d2)) / 365
-        else:
-            delta = _norm_cdf(d1) - 1.0
-            theta = (-(S * pdf_d1 * sigma) / (2 * math.sqrt(T))
-                     + r * K * math.exp(-r * T) * _norm_cdf(-d2)) / 365
-        return {
-            "delta": round(delta, 4),
-            "gamma": round(gamma, 6),
-            "theta": round(theta, 4),
-            "vega": round(vega, 4),
-        }
-    except (ValueError, ZeroDivisionError):
-        return {"delta": 0.0, "gamma": 0.0, "theta": 0.0, "vega": 0.0}
+    g = bs_greeks_batch(S, K, T, sigma, option_type == "call", r=r)
+    return {
+        "delta": round(float(g["delta"]), 4),
+        "gamma": round(float(g["gamma"]), 6),
+        "theta": round(float(g["theta"]), 4),
+        "vega": round(float(g["vega"]), 4),
+    }
+
+
+def _d1_d2(S, K, T, sigma, r):
+    """d1, d2 and sqrt(T); inputs must be valid (all positive)."""
+    sqrt_t = np.sqrt(T)
+    d1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * sqrt_t)
+    return d1, d1 - sigma * sqrt_t, sqrt_t
+
+
+def _price(S, K, T, is_call, r, d1, d2):
+    disc = K * np.exp(-r * T)
+    cdf_d1, cdf_d2 = norm_cdf(np.stack([d1, d2]))
+    call = S * cdf_d1 - disc * cdf_d2
+    # Put via parity keeps a single pair of CDF evaluations.
+    return np.where(is_call, call, call - S + disc)
+
+
+def bs_price_batch(S, K, T, sigma, is_call, r: float = 0.053) -> np.ndarray:
+    """Vectorized Black-Scholes price. Inputs must be valid (all positive)."""
+    d1, d2, _ = _d1_d2(S, K, T, sigma, r)
+    return _price(S, K, T, is_call, r, d1, d2)
+
+
+def _price_and_vega(S, K, T, sigma, is_call, r):
+    d1, d2, sqrt_t = _d1_d2(S, K, T, sigma, r)
+    price = _price(S, K, T, is_call, r, d1, d2)
+    vega = S * np.exp(-0.5 * d1 * d1) * _INV_SQRT_2PI * sqrt_t
+    return price, vega
+
+
+def implied_vol_batch(
+    price,
+    S,
+    K,
+    T,
+    is_call,
+    r: float = 0.053,
+    tol: float = 1e-5,
+    newton_iter: int = 20,
+    bisect_iter: int = 100,
+    sigma_lo: float = 1e-4,
+    sigma_hi: float = 5.0,
+) -> dict[str, np.ndarray]:
+    """
+    Vectorized implied-volatility solver for a whole chain.
+
+    Runs batched Newton steps from a Brenner-Subrahmanyam starting guess;
+    contracts whose vega is too small for Newton, or that have not converged
+    after ``newton_iter`` steps, fall back to a bracketed bisection on
+    ``[sigma_lo, sigma_hi]``. Prices outside the no-arbitrage bounds are never
+    solved.
+
+    Returns arrays:
+      iv          float64, NaN where unsolved
+      converged   bool
+      iterations  int32, Newton + bisection steps spent per contract
+      in_bounds   bool, price within the no-arbitrage bounds
+    """
+    price, S, K, T = np.broadcast_arrays(
+        np.asarray(price, dtype=np.float64),
+        np.asarray(S, dtype=np.float64),
+        np.asarray(K, dtype=np.float64),
+        np.asarray(T, dtype=np.float64),
+    )
+    call = np.asarray(is_call)
+    if call.dtype != np.bool_:
+        call = call == "call"
+    call = np.broadcast_to(call, price.shape)
+    shape = price.shape
+    price, S, K, T, call = (a.ravel() for a in (price, S, K, T, call))
+
+    n = price.size
+    iv = np.full(n, np.nan)
+    converged = np.zeros(n, dtype=bool)
+    iterations = np.zeros(n, dtype=np.int32)
+
+    valid = (T > 0) & (S > 0) & (K > 0) & (price > 0)
+    with np.errstate(invalid="ignore", over="ignore"):
+        disc = K * np.exp(-r * np.where(valid, T, 0.0))
+        lower = np.where(call, np.maximum(S - disc, 0.0), np.maximum(disc - S, 0.0))
+        upper = np.where(call, S, disc)
+    in_bounds = valid & (price > lower) & (price < upper)
+
+    # ── Newton ──────────────────────────────────────────────────────────────
+    idx = np.flatnonzero(in_bounds)
+    sigma = np.clip(np.sqrt(2 * math.pi / T[idx]) * price[idx] / S[idx], 0.05, 3.0)
+    fallback: list[np.ndarray] = []
+    for _ in range(newton_iter):
+        if idx.size == 0:
+            break
+        p, vega = _price_and_vega(S[idx], K[idx], T[idx], sigma, call[idx], r)
+        iterations[idx] += 1
+        diff = p - price[idx]
+        done = np.abs(diff) < tol
+        if done.any():
+            iv[idx[done]] = sigma[done]
+            converged[idx[done]] = True
+        flat = ~done & (vega < 1e-8 * S[idx])
+        if flat.any():
+            fallback.append(idx[flat])
+        keep = ~done & ~flat
+        idx = idx[keep]
+        sigma = sigma[keep] - diff[keep] / vega[keep]
+        sigma = np.clip(sigma, sigma_lo, sigma_hi)
+    fallback.append(idx)
+
+    # ── Bisection fallback ──────────────────────────────────────────────────
+    idx = np.concatenate(fallback) if fallback else idx
+    if idx.size:
+        target = price[idx]
+        lo = np.full(idx.size, sigma_lo)
+        hi = np.full(idx.size, sigma_hi)
+        args = (S[idx], K[idx], T[idx])
+        p_lo = bs_price_batch(*args, lo, call[idx], r)
+        p_hi = bs_price_batch(*args, hi, call[idx], r)
+        # Price is increasing in sigma: a root exists only inside the bracket.
+        active = (p_lo - tol <= target) & (target <= p_hi + tol)
+        for _ in range(bisect_iter):
+            if not active.any():
+                break
+            a = np.flatnonzero(active)
+            mid = 0.5 * (lo[a] + hi[a])
+            pm = bs_price_batch(S[idx[a]], K[idx[a]], T[idx[a]], mid, call[idx[a]], r)
+            iterations[idx[a]] += 1
+            diff = pm - target[a]
+            hit = (np.abs(diff) < tol) | (hi[a] - lo[a] < 1e-10)
+            if hit.any():
+                iv[idx[a[hit]]] = mid[hit]
+                converged[idx[a[hit]]] = True
+                active[a[hit]] = False
+            above = diff > 0
+            hi[a] = np.where(above, mid, hi[a])
+            lo[a] = np.where(above, lo[a], mid)
+
+    return {
+        "iv": iv.reshape(shape),
+        "converged": converged.reshape(shape),
+        "iterations": iterations.reshape(shape),
+        "in_bounds": in_bounds.reshape(shape),
+    }
 
 
 def iv_from_price(
@@ -53,25 +232,14 @@ def iv_from_price(
     r: float = 0.053, option_type: str = "call",
     tol: float = 1e-5, max_iter: int = 100,
 ) -> float:
-    """Newton-Raphson IV solver. Returns 0.20 (20%) on failure."""
-    if T <= 0 or option_price <= 0:
+    """
+    Scalar IV. Returns 0.20 (20%) when unsolvable; callers that must tell
+    failures apart should use ``implied_vol_batch`` and its ``converged`` flag.
+    """
+    res = implied_vol_batch(
+        option_price, S, K, T, option_type == "call",
+        r=r, tol=tol, bisect_iter=max_iter,
+    )
+    if not res["converged"]:
         return 0.20
-    sigma = 0.20
-    for _ in range(max_iter):
-        g = bs_greeks(S, K, T, r, sigma, option_type)
-        vega = g["vega"] * 100  # undo /100 scaling
-        if abs(vega) < 1e-10:
-            break
-        # BS price
-        d1 = (math.log(S / K) + (r + 0.5 * sigma**2) * T) / (sigma * math.sqrt(T))
-        d2 = d1 - sigma * math.sqrt(T)
-        if option_type == "call":
-            price = S * _norm_cdf(d1) - K * math.exp(-r * T) * _norm_cdf(d2)
-        else:
-            price = K * math.exp(-r * T) * _norm_cdf(-d2) - S * _norm_cdf(-d1)
-        diff = price - option_price
-        if abs(diff) < tol:
-            break
-        sigma -= diff / vega
-        sigma = max(0.001, min(sigma, 5.0))
-    return round(sigma, 4)
+    return round(float(res["iv"]), 4)
@@ -0,0 +1,101 @@
+"""
+Short-TTL options chain cache with request coalescing.
+
+GEX, DEX, OI, the raw chain route and the daily report all want the same
+chain at the same moment. Entries are keyed by (provider data source,
+symbol, expiration, type); concurrent misses for one key share a single
+in-flight fetch ("singleflight"). Cached values are columnar ``OptionChain``
+objects with read-only arrays, so sharing them between callers is safe.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import TYPE_CHECKING, Any
+
+from config import get_settings
+from providers.base import OptionChain
+
+if TYPE_CHECKING:
+    from providers.base import BaseProvider
+
+_Key = tuple[str, str, str, str]
+
+_entries: dict[_Key, tuple[float, OptionChain]] = {}
+_inflight: dict[_Key, asyncio.Task] = {}
+_stats = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+
+def _key(provider: "BaseProvider", symbol: str, expiration_date: str | None, option_type: str | None) -> _Key:
+    return (provider.source_key, symbol.upper(), expiration_date or "", option_type or "")
+
+
+def _sweep(now: float):
+    for k in [k for k, (exp, _) in _entries.items() if exp <= now]:
+        _entries.pop(k, None)
+
+
+async def _fetch(provider: "BaseProvider", key: _Key) -> OptionChain:
+    _, symbol, exp, otype = key
+    try:
+        chain = await provider.get_options_chain_columnar(symbol, expiration_date=exp or None, option_type=otype or None)
+    except Exception:
+        _stats["errors"] += 1
+        raise
+    ttl = get_settings().chain_cache_ttl_sec
+    if ttl > 0:
+        _entries[key] = (time.monotonic() + ttl, chain)
+    return chain
+
+
+def _forget(key: _Key, task: asyncio.Task):
+    if _inflight.get(key) is task:
+        _inflight.pop(key, None)
+    # Mark the exception as retrieved even if every waiter went away.
+    if not task.cancelled():
+        task.exception()
+
+
+async def get_chain(
+    provider: "BaseProvider",
+    symbol: str,
+    expiration_date: str | None = None,
+    option_type: str | None = None,
+) -> OptionChain:
+    """Cached/coalesced ``provider.get_options_chain_columnar``."""
+    key = _key(provider, symbol, expiration_date, option_type)
+    now = time.monotonic()
+    row = _entries.get(key)
+    if row and row[0] > now:
+        _stats["hits"] += 1
+        return row[1]
+
+    task = _inflight.get(key)
+    if task is not None:
+        _stats["coalesced"] += 1
+    else:
+        _stats["misses"] += 1
+        _sweep(now)
+        task = asyncio.create_task(_fetch(provider, key))
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _forget(key, t))
+    # Shield so one caller disconnecting doesn't cancel the shared fetch.
+    return await asyncio.shield(task)
+
+
+def invalidate(symbol: str | None = None):
+    if symbol is None:
+        _entries.clear()
+        return
+    sym = symbol.upper()
+    for k in [k for k in _entries if k[1] == sym]:
+        _entries.pop(k, None)
+
+
+def stats() -> dict[str, Any]:
+    return {
+        **_stats,
+        "entries": len(_entries),
+        "inflight": len(_inflight),
+        "bytes": sum(chain.nbytes for _, chain in _entries.values()),
+    }
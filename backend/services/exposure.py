@@ -0,0 +1,172 @@
+"""
+Combined per-strike exposure: GEX, DEX, open interest and volume in one pass.
+
+GEX per contract = gamma * open_interest * 100 * spot^2 * 0.01
+DEX per contract = delta * open_interest * 100
+  Puts contribute with the opposite sign (market makers short puts).
+
+``compute_gex``, ``compute_dex`` and ``compute_oi`` are projections of
+``compute_exposure`` so a dashboard needs a single aggregation per chain.
+``fetch_exposure`` fetches the chains and aggregates them for the
+analytics routes and the exposure stream.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any
+
+import numpy as np
+
+from config import get_settings
+from providers.base import OptionChain
+from services.chain_cache import get_chain
+
+
+_COLUMNS = ("gex", "dex", "oi_call", "oi_put", "volume_call", "volume_put", "n_call", "n_put")
+
+
+class ExposureAccumulator:
+    """
+    Streaming per-strike aggregation over columnar chains. Feed chain parts
+    with ``add`` as they arrive (e.g. one per expiration), then read
+    ``rows()`` once. Each part is reduced with one vectorized group-by on
+    integer strike cents.
+    """
+
+    def __init__(self, spot_price: float):
+        self._gex_mult = 100 * (spot_price ** 2) * 0.01
+        self._parts: list[tuple[np.ndarray, np.ndarray]] = []
+
+    def add(self, options_chain: OptionChain | list[dict]):
+        chain = options_chain
+        if not isinstance(chain, OptionChain):
+            chain = OptionChain.from_records(chain)
+        if not len(chain):
+            return
+        keys, inv = np.unique(chain.strike_cents, return_inverse=True)
+        m = keys.size
+        oi = np.nan_to_num(chain.open_interest)
+        vol = np.nan_to_num(chain.volume)
+        call = chain.type_flag == 1
+        put = chain.type_flag == -1
+        signed_oi = np.where(put, -oi, oi)
+        sums = np.vstack([
+            np.bincount(inv, signed_oi * np.nan_to_num(chain.gamma) * self._gex_mult, m),
+            np.bincount(inv, signed_oi * np.nan_to_num(chain.delta) * 100, m),
+            np.bincount(inv, np.where(call, oi, 0.0), m),
+            np.bincount(inv, np.where(put, oi, 0.0), m),
+            np.bincount(inv, np.where(call, vol, 0.0), m),
+            np.bincount(inv, np.where(put, vol, 0.0), m),
+            np.bincount(inv, call, m),
+            np.bincount(inv, put, m),
+        ])
+        self._parts.append((keys, sums))
+
+    def totals(self) -> tuple[np.ndarray, np.ndarray]:
+        """(strike_cents, sums) with one column per strike, rows in ``_COLUMNS`` order."""
+        if not self._parts:
+            return np.empty(0, dtype=np.int64), np.zeros((len(_COLUMNS), 0))
+        if len(self._parts) == 1:
+            return self._parts[0]
+        keys = np.concatenate([k for k, _ in self._parts])
+        sums = np.hstack([v for _, v in self._parts])
+        uniq, inv = np.unique(keys, return_inverse=True)
+        return uniq, np.vstack([np.bincount(inv, row, uniq.size) for row in sums])
+
+    def rows(self) -> list[dict]:
+        """
+        Per-strike rows sorted by strike:
+          strike, gex, dex, oi_call, oi_put, oi_total,
+          volume_call, volume_put, volume_total, n_call, n_put
+        """
+        keys, sums = self.totals()
+        strikes = (keys / 100.0).tolist()
+        gex, dex, oi_c, oi_p, vol_c, vol_p, n_c, n_p = (row.tolist() for row in sums)
+        return [
+            {
+                "strike": strike,
+                "gex": round(gex[i], 2),
+                "dex": round(dex[i], 2),
+                "oi_call": round(oi_c[i], 0),
+                "oi_put": round(oi_p[i], 0),
+                "oi_total": round(oi_c[i] + oi_p[i], 0),
+                "volume_call": round(vol_c[i], 0),
+                "volume_put": round(vol_p[i], 0),
+                "volume_total": round(vol_c[i] + vol_p[i], 0),
+                "n_call": int(n_c[i]),
+                "n_put": int(n_p[i]),
+            }
+            for i, strike in enumerate(strikes)
+        ]
+
+
+def compute_exposure(options_chain: OptionChain | list[dict], spot_price: float) -> list[dict]:
+    """Per-strike exposure rows for a whole chain (see ``ExposureAccumulator.rows``)."""
+    acc = ExposureAccumulator(spot_price)
+    acc.add(options_chain)
+    return acc.rows()
+
+
+async def fetch_exposure(provider: Any, symbol: str, expirations: list[str]) -> dict:
+    """
+    Exposure for *symbol* over *expirations* (the provider's default chain
+    when empty), with spot and per-expiration fetch timings.
+
+    Expirations are fetched concurrently (bounded by
+    ``chain_fetch_concurrency``) and folded into the aggregate as each one
+    lands, so no merged chain is ever materialised.
+    """
+    sym = symbol.upper()
+    sem = asyncio.Semaphore(max(1, get_settings().chain_fetch_concurrency))
+    timings: dict[str, float] = {}
+
+    async def fetch(exp: str | None):
+        async with sem:
+            t0 = time.perf_counter()
+            part = await get_chain(provider, sym, expiration_date=exp)
+            timings[exp or "default"] = round((time.perf_counter() - t0) * 1000, 1)
+            return part
+
+    tasks = [asyncio.create_task(fetch(exp)) for exp in (expirations or [None])]
+    try:
+        quote = await provider.get_quote(sym)
+        spot = float(quote.get("last_price") or 0)
+        acc = ExposureAccumulator(spot)
+        for fut in asyncio.as_completed(tasks):
+            acc.add(await fut)
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        raise
+    return {
+        "symbol": sym,
+        "spot": spot,
+        "expirations": expirations,
+        "timings_ms": timings,
+        "data": acc.rows(),
+    }
+
+
+# ── Projections ─────────────────────────────────────────────────
+
+def project_gex(rows: list[dict]) -> list[dict]:
+    return [{"strike": r["strike"], "gex": r["gex"]} for r in rows]
+
+
+def project_dex(rows: list[dict]) -> list[dict]:
+    return [{"strike": r["strike"], "dex": r["dex"]} for r in rows]
+
+
+def project_oi(rows: list[dict]) -> list[dict]:
+    return [
+        {
+            "strike": r["strike"],
+            "oi_call": r["oi_call"],
+            "oi_put": r["oi_put"],
+            "oi_total": r["oi_total"],
+            "volume_total": r["volume_total"],
+        }
+        for r in rows
+        if r["n_call"] or r["n_put"]
+    ]
@@ -1,14 +1,33 @@
+"""
+History caches.
+
+``get``/``setex`` are a short-TTL payload cache. The immutable bar cache
+holds closed bars per (symbol, timeframe) as a ``BarSeries``: a sorted
+int64 timestamp array with parallel float64 OHLCV columns, so a range read
+is one binary search and a slice. All series share one memory budget
+(``bar_cache_max_mb``); the least recently used series are evicted first.
+
+Closed bars are also written behind to ``bar_store`` on disk;
+``load_bars`` reads through to it when memory comes up short.
+
+Each series also tracks coverage spans, ranges known to hold every bar the
+provider has. Within a covered 1Min range, intraday timeframes can be
+rebuilt locally (``resample_bars``) instead of fetched.
+"""
 from __future__ import annotations
 
 import time
+from collections import OrderedDict
 from typing import Any
 
+import numpy as np
+
+from config import get_settings
+from services import bar_store
+
 # Legacy request cache (short TTL, payload-level)
 _CACHE: dict[str, tuple[float, Any]] = {}
 
-# New immutable bar cache: symbol+tf -> ts -> compact bar
-_BAR_CACHE: dict[str, dict[int, dict[str, Any]]] = {}
-
 
 def _now() -> float:
     return time.time()
@@ -40,44 +59,325 @@ def ttl_for_timeframe(tf: str) -> int:
     return 300
 
 
+_FIELDS = ("o", "h", "l", "c", "v")
+
+
+class BarSeries:
+    """Closed bars of one symbol/timeframe, sorted by timestamp. Missing values are NaN."""
+
+    __slots__ = ("ts", "o", "h", "l", "c", "v", "spans")
+
+    def __init__(self):
+        self.ts = np.empty(0, dtype=np.int64)
+        for f in _FIELDS:
+            setattr(self, f, np.empty(0, dtype=np.float64))
+        # Complete [lo, hi] timestamp ranges, sorted and disjoint.
+        self.spans: list[tuple[int, int]] = []
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    @property
+    def nbytes(self) -> int:
+        return self.ts.nbytes + sum(getattr(self, f).nbytes for f in _FIELDS)
+
+    def upsert(self, ts: np.ndarray, cols: dict[str, np.ndarray]):
+        """Insert bars; a timestamp already held is overwritten."""
+        if len(ts) > 1 and not np.all(ts[1:] > ts[:-1]):
+            order = np.argsort(ts, kind="stable")
+            ts = ts[order]
+            cols = {f: cols[f][order] for f in _FIELDS}
+        if not len(self.ts) or ts[0] > self.ts[-1]:
+            if np.all(ts[1:] > ts[:-1]):
+                # Common case: strictly newer bars, append.
+                self.ts = np.concatenate([self.ts, ts])
+                for f in _FIELDS:
+                    setattr(self, f, np.concatenate([getattr(self, f), cols[f]]))
+                return
+        all_ts = np.concatenate([self.ts, ts])
+        # Stable sort keeps held-before-new for equal stamps; keep the last of each run.
+        order = np.argsort(all_ts, kind="stable")
+        all_ts = all_ts[order]
+        last = np.ones(len(all_ts), dtype=bool)
+        last[:-1] = all_ts[:-1] != all_ts[1:]
+        idx = order[last]
+        self.ts = all_ts[last]
+        for f in _FIELDS:
+            setattr(self, f, np.concatenate([getattr(self, f), cols[f]])[idx])
+
+    def add_span(self, lo: int, hi: int, step: int):
+        self.spans = bar_store.merge_spans([*self.spans, (lo, hi)], gap=step)
+
+    def span_at(self, ts: int) -> tuple[int, int] | None:
+        return next(((lo, hi) for lo, hi in self.spans if lo <= ts <= hi), None)
+
+    def bounds(self, end_ts: int, limit: int) -> tuple[int, int]:
+        """Index range of the last *limit* bars at or before *end_ts* (all of them if limit <= 0)."""
+        hi = int(np.searchsorted(self.ts, end_ts, side="right"))
+        return (max(0, hi - limit) if limit > 0 else 0), hi
+
+    def rows(self, lo: int, hi: int) -> list[dict[str, Any]]:
+        """Compact bar dicts for ``[lo, hi)``."""
+        cols: dict[str, list[Any]] = {"ts": self.ts[lo:hi].tolist()}
+        for f in _FIELDS:
+            a = getattr(self, f)[lo:hi]
+            nan = np.isnan(a)
+            if nan.any():
+                cols[f] = [None if m else x for x, m in zip(a.tolist(), nan.tolist())]
+            elif f == "v" and np.all(a == np.trunc(a)):
+                cols[f] = a.astype(np.int64).tolist()
+            else:
+                cols[f] = a.tolist()
+        return [
+            {"ts": ts, "o": o, "h": h, "l": l, "c": c, "v": v}
+            for ts, o, h, l, c, v in zip(cols["ts"], *(cols[f] for f in _FIELDS))
+        ]
+
+
+# Immutable bar cache: "SYMBOL::tf" -> series, least recently used first
+_BAR_CACHE: OrderedDict[str, BarSeries] = OrderedDict()
+_bar_bytes = 0
+_bar_stats = {"hits": 0, "partial": 0, "misses": 0, "evictions": 0}
+
+
 def _bar_key(symbol: str, timeframe: str) -> str:
     return f"{symbol.upper()}::{(timeframe or '1Day').lower()}"
 
 
+def _budget_bytes() -> int:
+    return max(0, get_settings().bar_cache_max_mb) * 1024 * 1024
+
+
+def _float(x: Any) -> float:
+    try:
+        return float(x)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _evict(keep: str):
+    """Drop least recently used series until under budget, sparing *keep*."""
+    global _bar_bytes
+    budget = _budget_bytes()
+    for key in list(_BAR_CACHE.keys()):
+        if _bar_bytes <= budget:
+            break
+        if key == keep:
+            continue
+        _bar_bytes -= _BAR_CACHE.pop(key).nbytes
+        _bar_stats["evictions"] += 1
+
+
+def _lookup(key: str, end_ts: int, limit: int) -> tuple[BarSeries | None, int, int]:
+    series = _BAR_CACHE.get(key)
+    if series is None:
+        return None, 0, 0
+    _BAR_CACHE.move_to_end(key)
+    lo, hi = series.bounds(end_ts, limit)
+    return series, lo, hi
+
+
+def _count(lo: int, hi: int, limit: int):
+    if hi == lo:
+        _bar_stats["misses"] += 1
+    elif limit > 0 and hi - lo < limit:
+        _bar_stats["partial"] += 1
+    else:
+        _bar_stats["hits"] += 1
+
+
 def get_cached_bars(symbol: str, timeframe: str, end_ts: int, limit: int) -> list[dict[str, Any]]:
+    series, lo, hi = _lookup(_bar_key(symbol, timeframe), end_ts, limit)
+    _count(lo, hi, limit)
+    return series.rows(lo, hi) if series is not None else []
+
+
+async def load_bars(symbol: str, timeframe: str, end_ts: int, limit: int) -> list[dict[str, Any]]:
+    """``get_cached_bars``, reading through to the on-disk store when memory is short."""
     key = _bar_key(symbol, timeframe)
-    rows = _BAR_CACHE.get(key, {})
-    if not rows:
-        return []
-    ts_sorted = sorted((ts for ts in rows.keys() if ts <= end_ts))
-    if limit > 0:
-        ts_sorted = ts_sorted[-limit:]
-    return [rows[ts] for ts in ts_sorted]
+    series, lo, hi = _lookup(key, end_ts, limit)
+    if limit > 0 and hi - lo < limit:
+        sym, tf = symbol.upper(), (timeframe or "1Day").lower()
+        stored = await bar_store.read(sym, tf, end_ts, limit)
+        if stored is not None:
+            _insert(key, *stored)
+            series, lo, hi = _lookup(key, end_ts, limit)
+            # Memory now holds every stored bar from the oldest one read up to
+            # end_ts, so the store's coverage of that range carries over.
+            cut = int(stored[0][0]) if len(stored[0]) >= limit else None
+            for a, b in bar_store.merge_spans(await bar_store.read_spans(sym, tf)):
+                a, b = max(a, cut) if cut is not None else a, min(b, end_ts)
+                if a <= b:
+                    series.add_span(a, b, 0)
+    _count(lo, hi, limit)
+    return series.rows(lo, hi) if series is not None else []
+
+
+def _insert(key: str, ts: np.ndarray, cols: dict[str, np.ndarray]):
+    global _bar_bytes
+    series = _BAR_CACHE.get(key)
+    if series is None:
+        series = _BAR_CACHE[key] = BarSeries()
+    before = series.nbytes
+    series.upsert(ts, cols)
+    _bar_bytes += series.nbytes - before
+    _BAR_CACHE.move_to_end(key)
+    _evict(keep=key)
 
 
 def upsert_immutable_bars(symbol: str, timeframe: str, bars: list[dict[str, Any]], latest_closed_ts: int):
     if not bars:
         return
-    key = _bar_key(symbol, timeframe)
-    slot = _BAR_CACHE.setdefault(key, {})
+    ts: list[int] = []
+    cols: dict[str, list[float]] = {f: [] for f in _FIELDS}
     for b in bars:
         ts_val = b.get("ts")
         if ts_val is None:
             continue
         try:
-            ts = int(ts_val)
+            t = int(ts_val)
         except Exception:
             continue
         # Only cache fully-formed bars indefinitely.
-        if ts <= latest_closed_ts:
-            slot[ts] = b
+        if t > latest_closed_ts:
+            continue
+        ts.append(t)
+        for f in _FIELDS:
+            cols[f].append(_float(b.get(f)))
+    if not ts:
+        return
+    ts_a = np.asarray(ts, dtype=np.int64)
+    cols_a = {f: np.asarray(v, dtype=np.float64) for f, v in cols.items()}
+    _insert(_bar_key(symbol, timeframe), ts_a, cols_a)
+    bar_store.enqueue(symbol.upper(), (timeframe or "1Day").lower(), ts_a, cols_a)
+
+
+def count_bars(symbol: str, timeframe: str, lo: int, hi: int) -> int:
+    """Cached bars with ``lo <= ts <= hi``."""
+    series = _BAR_CACHE.get(_bar_key(symbol, timeframe))
+    if series is None:
+        return 0
+    return int(np.searchsorted(series.ts, hi, side="right") - np.searchsorted(series.ts, lo, side="left"))
+
+
+def spans(symbol: str, timeframe: str) -> list[tuple[int, int]]:
+    """Coverage spans of the in-memory series, sorted and disjoint."""
+    series = _BAR_CACHE.get(_bar_key(symbol, timeframe))
+    return list(series.spans) if series is not None else []
+
+
+def mark_covered(symbol: str, timeframe: str, lo: int, hi: int, step: int):
+    """Record that every provider bar in ``[lo, hi]`` is cached (call after the upsert)."""
+    if lo > hi:
+        return
+    series = _BAR_CACHE.get(_bar_key(symbol, timeframe))
+    if series is not None:
+        series.add_span(lo, hi, step)
+    bar_store.enqueue_span(symbol.upper(), (timeframe or "1Day").lower(), lo, hi)
+
+
+# Timeframe that higher intraday bars are rebuilt from.
+_BASE_TF = "1Min"
+_BASE_STEP = 60
+
+
+async def _base_span(symbol: str, hi: int, max_rows: int) -> tuple[BarSeries, tuple[int, int]] | None:
+    """Cached 1Min bars complete up to *hi*, reading a covered range through from disk."""
+    key = _bar_key(symbol, _BASE_TF)
+    series = _BAR_CACHE.get(key)
+    span = series.span_at(hi) if series is not None else None
+    if span is not None:
+        held = np.searchsorted(series.ts, hi, side="right") - np.searchsorted(series.ts, span[0], side="left")
+        if held >= max_rows:
+            return series, span
+    sym, tf = symbol.upper(), _BASE_TF.lower()
+    stored = next((sp for sp in bar_store.merge_spans(await bar_store.read_spans(sym, tf), gap=_BASE_STEP)
+                   if sp[0] <= hi <= sp[1]), None)
+    if stored is None or (span is not None and stored[0] >= span[0]):
+        return (series, span) if span is not None else None
+    rows = await bar_store.read(sym, tf, hi, max_rows, start_ts=stored[0])
+    # The newest max_rows bars of a complete range are complete from the oldest one read.
+    lo = stored[0] if rows is None or len(rows[0]) < max_rows else int(rows[0][0])
+    if rows is not None:
+        _insert(key, *rows)
+    series = _BAR_CACHE.get(key)
+    if series is None:
+        series = _BAR_CACHE[key] = BarSeries()
+    series.add_span(lo, hi, _BASE_STEP)
+    return series, series.span_at(hi)
+
+
+async def resample_bars(
+    symbol: str, timeframe: str, step: int, offset: int, end_ts: int, limit: int, latest_closed_ts: int,
+) -> int:
+    """
+    Derive up to *limit* closed *timeframe* bars at or before *end_ts* from
+    cached 1Min bars and cache them. Buckets start at epoch multiples of
+    *step* shifted by *offset*, the provider's alignment. Only buckets whose
+    whole range lies in a 1Min coverage span are built. Returns the count.
+    """
+    if step <= _BASE_STEP or step % _BASE_STEP or limit <= 0:
+        return 0
+    last = (min(end_ts, latest_closed_ts) - offset) // step * step + offset
+    hi = last + step - _BASE_STEP  # last minute of the newest wanted bucket
+    per_bucket = step // _BASE_STEP
+    found = await _base_span(symbol, hi, max_rows=(limit + 1) * per_bucket)
+    if found is None:
+        return 0
+    series, (span_lo, _) = found
+    first = -((offset - span_lo) // step) * step + offset  # first bucket starting inside the span
+    i = int(np.searchsorted(series.ts, first, side="left"))
+    j = int(np.searchsorted(series.ts, hi, side="right"))
+    # Market closures leave empty buckets, so bound the work by rows, not time.
+    i = max(i, j - (limit + 1) * per_bucket)
+    if i >= j:
+        return 0
+    ts = series.ts[i:j]
+    buckets = (ts - offset) // step * step + offset
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    if i > 0 and series.ts[i - 1] >= buckets[0]:
+        starts = starts[1:]  # row bound cut the oldest bucket
+    if not len(starts):
+        return 0
+    lo = i + starts[0]
+    ts_out = buckets[starts]
+    starts = starts - starts[0]
+    o, h, l, c, v = (getattr(series, f)[lo:j] for f in _FIELDS)
+    ends = np.r_[starts[1:], len(o)] - 1
+    cols = {
+        "o": o[starts],
+        "h": np.fmax.reduceat(h, starts),
+        "l": np.fmin.reduceat(l, starts),
+        "c": c[ends],
+        "v": np.add.reduceat(np.nan_to_num(v), starts),
+    }
+    ts_out, cols = ts_out[-limit:], {f: a[-limit:] for f, a in cols.items()}
+    _insert(_bar_key(symbol, timeframe), ts_out, cols)
+    bar_store.enqueue(symbol.upper(), (timeframe or "1Day").lower(), ts_out, cols)
+    mark_covered(symbol, timeframe, int(ts_out[0]), last, step)
+    return len(ts_out)
 
 
 def clear_symbol(symbol: str, timeframe: str | None = None):
+    global _bar_bytes
     sym = symbol.upper()
     if timeframe:
-        _BAR_CACHE.pop(_bar_key(sym, timeframe), None)
-        return
-    for k in list(_BAR_CACHE.keys()):
-        if k.startswith(f"{sym}::"):
-            _BAR_CACHE.pop(k, None)
+        keys = [_bar_key(sym, timeframe)]
+    else:
+        keys = [k for k in _BAR_CACHE if k.startswith(f"{sym}::")]
+    for k in keys:
+        series = _BAR_CACHE.pop(k, None)
+        if series is not None:
+            _bar_bytes -= series.nbytes
+
+
+def stats() -> dict[str, Any]:
+    lookups = _bar_stats["hits"] + _bar_stats["partial"] + _bar_stats["misses"]
+    return {
+        "series": len(_BAR_CACHE),
+        "bars": sum(len(s) for s in _BAR_CACHE.values()),
+        "bytes": _bar_bytes,
+        "budget_bytes": _budget_bytes(),
+        **_bar_stats,
+        "hit_rate": round(_bar_stats["hits"] / lookups, 4) if lookups else None,
+    }
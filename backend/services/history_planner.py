@@ -0,0 +1,216 @@
+"""
+Gap-aware history fetch planning.
+
+Instead of paging backwards from the newest bar with guessed limits, the
+planner sizes the window that should hold ``limit`` bars using the trading
+calendar, subtracts the ranges the bar cache already covers, trims what's
+left to trading sessions and fetches only those intervals, concurrently,
+with explicit ``start``/``end``. Illiquid symbols (empty minutes) come up
+short, so the window is widened by the observed fill rate and re-planned a
+few times; ranges fetched in earlier rounds are covered by then and cost
+nothing.
+
+Coverage stops ``_SETTLE_BARS`` bars (at least ``_SETTLE_SEC``) short of
+the newest closed bar: providers publish and amend bars for a while after
+they close, and a covered range is never asked for again. Providers whose
+``get_history`` ignores the requested range get no coverage at all.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from functools import lru_cache
+from typing import Any, Awaitable, Callable
+
+from services import history_cache, market_calendar
+
+log = logging.getLogger(__name__)
+
+# fetch(start_ts, end_ts, limit) -> compact bars ({"ts", "o", "h", "l", "c", "v"})
+Fetch = Callable[[int, int, int], Awaitable[list[dict[str, Any]]]]
+
+_MAX_ROUNDS = 4
+_MAX_WIDEN = 16  # per round
+_MAX_PER_CALL = 5000
+# Recently closed bars stay uncovered (refetched) until this settles.
+_SETTLE_BARS = 2
+_SETTLE_SEC = 600
+# Nothing supported serves bars older than this; bounds calendar walks.
+_EARLIEST_TS = 946684800  # 2000-01-01
+
+_stats = {"requests": 0, "rounds": 0, "intervals": 0, "calls": 0, "planned_bars": 0, "fetched_bars": 0}
+
+
+def _whole_day(step: int) -> bool:
+    return step >= 86400
+
+
+def _days_per_bar(step: int) -> int:
+    # Trading sessions per bar for daily-or-longer timeframes (a week is ~5).
+    return max(1, step // 86400 * 5 // 7)
+
+
+def _floor(ts: int, step: int, offset: int) -> int:
+    return (ts - offset) // step * step + offset
+
+
+def _ceil(ts: int, step: int, offset: int) -> int:
+    return -((offset - ts) // step) * step + offset
+
+
+def count_slots(lo: int, hi: int, step: int, offset: int = 0) -> int:
+    """Bars the calendar allows in ``[lo, hi]`` (an upper bound for intraday)."""
+    if lo > hi:
+        return 0
+    if _whole_day(step):
+        n = len(market_calendar.sessions(lo, hi, whole_day=True))
+        return -(-n // _days_per_bar(step))
+    total = 0
+    for start, end in market_calendar.sessions(lo, hi):
+        a = max(_ceil(lo, step, offset), _floor(start, step, offset))
+        b = min(_floor(hi, step, offset), _floor(end - 1, step, offset))
+        if a <= b:
+            total += (b - a) // step + 1
+    return total
+
+
+@lru_cache(maxsize=512)
+def rewind(end_ts: int, bars: int, step: int, offset: int = 0, floor_ts: int | None = None) -> int:
+    """Start of the window ending at *end_ts* that holds *bars* bar slots."""
+    floor_ts = max(floor_ts or _EARLIEST_TS, _EARLIEST_TS)
+    whole_day = _whole_day(step)
+    need = bars * _days_per_bar(step) if whole_day else bars
+    for start, end in market_calendar.sessions_before(end_ts, floor_ts, whole_day):
+        if whole_day:
+            need -= 1
+            if need <= 0:
+                return max(start, floor_ts)
+            continue
+        first = _floor(start, step, offset)
+        last = _floor(min(end - 1, end_ts), step, offset)
+        n = (last - first) // step + 1
+        if n >= need:
+            return max(last - (need - 1) * step, floor_ts)
+        need -= n
+    return floor_ts
+
+
+def plan(
+    spans: list[tuple[int, int]], lo: int, hi: int, step: int, offset: int = 0,
+) -> tuple[list[tuple[int, int, int]], list[tuple[int, int]]]:
+    """
+    Split ``[lo, hi]`` minus *spans* into fetchable ``(start, end, bars)``
+    intervals, trimmed to trading sessions and at most ``_MAX_PER_CALL``
+    bars each. Also returns the uncovered ranges that hold no session at all.
+    """
+    gaps: list[tuple[int, int]] = []
+    cursor = lo
+    for a, b in spans:
+        if b < cursor:
+            continue
+        if a > hi:
+            break
+        if a > cursor:
+            gaps.append((cursor, a - 1))
+        cursor = max(cursor, b + 1)
+    if cursor <= hi:
+        gaps.append((cursor, hi))
+
+    whole_day = _whole_day(step)
+    intervals: list[tuple[int, int, int]] = []
+    closed: list[tuple[int, int]] = []
+    for a, b in gaps:
+        sess = market_calendar.sessions(a, b, whole_day)
+        n = count_slots(a, b, step, offset)
+        if not n:
+            closed.append((a, b))
+            continue
+        if whole_day:
+            a, b = max(a, sess[0][0]), min(b, sess[-1][1] - 1)
+        else:
+            a = max(_ceil(a, step, offset), _floor(sess[0][0], step, offset))
+            b = min(_floor(b, step, offset), _floor(sess[-1][1] - 1, step, offset))
+        pieces = -(-n // _MAX_PER_CALL)
+        width = _ceil(-(-(b - a + 1) // pieces), step, 0)
+        for i in range(pieces):
+            pa, pb = a + i * width, min(b, a + (i + 1) * width - 1)
+            if pa <= pb:
+                intervals.append((pa, pb, min(_MAX_PER_CALL, count_slots(pa, pb, step, offset))))
+    return intervals, closed
+
+
+async def fill(
+    symbol: str,
+    timeframe: str,
+    fetch: Fetch,
+    *,
+    step: int,
+    offset: int | None,
+    end_ts: int,
+    limit: int,
+    latest_closed_ts: int,
+    floor_ts: int | None = None,
+    ranged: bool = True,
+) -> tuple[list[dict[str, Any]], dict[str, int]]:
+    """
+    Fetch what the cache is missing for the newest *limit* bars at or before
+    *end_ts*. Closed bars are cached and their intervals marked covered up
+    to the settle cutoff; newer and still-forming bars are fetched on every
+    call that reaches them. With ``ranged=False`` (the provider ignores
+    ``start``/``end``/``limit``) nothing is covered and one round is made.
+    Returns the fetched bars and a report.
+    """
+    offset = offset or 0
+    settled_ts = latest_closed_ts - max(_SETTLE_BARS * step, _SETTLE_SEC)
+    report = {"rounds": 0, "intervals": 0, "calls": 0, "planned": 0, "fetched": 0}
+    out: dict[int, dict[str, Any]] = {}
+    window = limit
+
+    async def run(a: int, b: int, n: int) -> tuple[int, int, int, list[dict[str, Any]]]:
+        # Room for calendar slack (early closes, odd alignments).
+        req = min(_MAX_PER_CALL, n + n // 10 + 2)
+        return a, b, req, await fetch(a, b, req)
+
+    while report["rounds"] < _MAX_ROUNDS:
+        report["rounds"] += 1
+        lo = rewind(end_ts, window, step, offset, floor_ts)
+        intervals, closed = plan(history_cache.spans(symbol, timeframe), lo, end_ts, step, offset)
+        for a, b in closed:
+            history_cache.mark_covered(symbol, timeframe, a, min(b, latest_closed_ts), step)
+        report["intervals"] += len(intervals)
+        report["planned"] += sum(n for _, _, n in intervals)
+        results = await asyncio.gather(*(run(*iv) for iv in intervals))
+        report["calls"] += len(results)
+        got = 0
+        for a, b, req, page in results:
+            bars = [x for x in page if isinstance(x.get("ts"), int) and a <= x["ts"] <= b]
+            got += len(bars)
+            for x in bars:
+                out[x["ts"]] = x
+            history_cache.upsert_immutable_bars(symbol, timeframe, bars, latest_closed_ts=latest_closed_ts)
+            if ranged:
+                # A full page is the newest req bars of the interval; a short one is all of it.
+                oldest = min((x["ts"] for x in bars), default=a) if len(page) >= req else a
+                history_cache.mark_covered(symbol, timeframe, oldest, min(b, settled_ts), step)
+        report["fetched"] += got
+        if not ranged:
+            break  # another round would fetch the same page
+        have = history_cache.count_bars(symbol, timeframe, lo, end_ts) + sum(1 for ts in out if ts > latest_closed_ts)
+        if have >= limit:
+            break
+        if lo <= max(floor_ts or _EARLIEST_TS, _EARLIEST_TS) or (intervals and not got):
+            break  # reached the start of history
+        # Widen by the observed fill rate (sparse symbols skip empty minutes).
+        window = min(window * _MAX_WIDEN, int(window * limit / max(have, 1) * 1.25) + 1)
+
+    _stats["requests"] += 1
+    for k in ("rounds", "intervals", "calls"):
+        _stats[k] += report[k]
+    _stats["planned_bars"] += report["planned"]
+    _stats["fetched_bars"] += report["fetched"]
+    log.debug("history %s %s: %s", symbol, timeframe, report)
+    return [out[k] for k in sorted(out)], report
+
+
+def stats() -> dict[str, Any]:
+    return dict(_stats)
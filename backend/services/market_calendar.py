@@ -0,0 +1,113 @@
+"""
+US equity trading calendar.
+
+NYSE full-day holidays are computed from their rules (no table to keep up
+to date). Intraday sessions span the extended-hours window, 04:00-20:00
+America/New_York, since that's what SIP minute bars cover. Early closes are
+treated as full days; callers only use the calendar to size and trim
+fetches, so over-estimating a session is harmless.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+ET = ZoneInfo("America/New_York")
+EXTENDED_OPEN = time(4, 0)
+EXTENDED_CLOSE = time(20, 0)
+
+
+def _easter(year: int) -> date:
+    # Anonymous Gregorian algorithm
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    first = date(year, month, 1)
+    return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+
+
+def _last_weekday(year: int, month: int, weekday: int) -> date:
+    last = date(year, month + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(d: date) -> date | None:
+    if d.weekday() == 5:
+        # Saturday holidays move to Friday, except New Year's (no Dec 31 closure).
+        return None if (d.month, d.day) == (1, 1) else d - timedelta(days=1)
+    if d.weekday() == 6:
+        return d + timedelta(days=1)
+    return d
+
+
+@lru_cache(maxsize=64)
+def holidays(year: int) -> frozenset[date]:
+    days = [
+        date(year, 1, 1),
+        _nth_weekday(year, 1, 0, 3),   # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),   # Washington's Birthday
+        _easter(year) - timedelta(days=2),  # Good Friday
+        _last_weekday(year, 5, 0),     # Memorial Day
+        date(year, 7, 4),
+        _nth_weekday(year, 9, 0, 1),   # Labor Day
+        _nth_weekday(year, 11, 3, 4),  # Thanksgiving
+        date(year, 12, 25),
+    ]
+    if year >= 2022:
+        days.append(date(year, 6, 19))  # Juneteenth
+    return frozenset(o for o in map(_observed, days) if o is not None)
+
+
+def is_trading_day(d: date) -> bool:
+    return d.weekday() < 5 and d not in holidays(d.year)
+
+
+def trading_day(ts: int) -> date:
+    """Exchange-local calendar date of epoch second *ts*."""
+    return datetime.fromtimestamp(ts, ET).date()
+
+
+def _at(d: date, t: time) -> int:
+    return int(datetime.combine(d, t, ET).timestamp())
+
+
+def session(d: date, whole_day: bool = False) -> tuple[int, int]:
+    """``[open, close)`` epoch seconds of *d*: extended hours, or the whole local day."""
+    if whole_day:
+        return _at(d, time(0)), _at(d + timedelta(days=1), time(0))
+    return _at(d, EXTENDED_OPEN), _at(d, EXTENDED_CLOSE)
+
+
+def sessions(lo: int, hi: int, whole_day: bool = False) -> list[tuple[int, int]]:
+    """Sessions of trading days overlapping ``[lo, hi]``, oldest first."""
+    out = []
+    d, last = trading_day(lo), trading_day(hi)
+    while d <= last:
+        if is_trading_day(d):
+            start, end = session(d, whole_day)
+            if start <= hi and end > lo:
+                out.append((start, end))
+        d += timedelta(days=1)
+    return out
+
+
+def sessions_before(ts: int, floor: int, whole_day: bool = False):
+    """Sessions of trading days at or before *ts*, newest first, back to *floor*."""
+    d, stop = trading_day(ts), trading_day(floor)
+    while d >= stop:
+        if is_trading_day(d):
+            start, end = session(d, whole_day)
+            if start <= ts:
+                yield start, end
+        d -= timedelta(days=1)
@@ -44,7 +44,8 @@ async def generate_daily_bias_report(symbol: str, provider: "BaseProvider") -> s
     try:
         from services.gex import compute_gex
         from services.oi import compute_oi
-        chain = await provider.get_options_chain(symbol)
+        from services.chain_cache import get_chain
+        chain = await get_chain(provider, symbol)
         if chain:
             gex_data = compute_gex(chain, spot)
             # Find max GEX strike (resistance/support)
@@ -0,0 +1,96 @@
+"""
+Standard normal CDF on NumPy arrays, accurate to about 1 ulp.
+
+A vectorized port of erf/erfc from fdlibm's s_erf.c: the same rational
+approximations and coefficients, evaluated on whole arrays. The tails go
+through erfc so N(x) keeps full relative precision far from the mean.
+
+fdlibm carries this notice:
+
+    Copyright (C) 1993 by Sun Microsystems, Inc. All rights reserved.
+
+    Developed at SunPro, a Sun Microsystems, Inc. business.
+    Permission to use, copy, modify, and distribute this
+    software is freely granted, provided that this notice
+    is preserved.
+"""
+from __future__ import annotations
+import math
+
+import numpy as np
+
+_SQRT2 = math.sqrt(2)
+
+# Coefficients are highest power first.
+_ERX = 8.45062911510467529297e-01
+_PP = [-2.37630166566501626084e-05, -5.77027029648944159157e-03, -2.84817495755985104766e-02,
+       -3.25042107247001499370e-01, 1.28379167095512558561e-01]
+_QQ = [-3.96022827877536812320e-06, 1.32494738004321644526e-04, 5.08130628187576562776e-03,
+       6.50222499887672944485e-02, 3.97917223959155352819e-01, 1.0]
+_PA = [-2.16637559486879084300e-03, 3.54783043256182359371e-02, -1.10894694282396677476e-01,
+       3.18346619901161753674e-01, -3.72207876035701323847e-01, 4.14856118683748331666e-01,
+       -2.36211856075265944077e-03]
+_QA = [1.19844998467991074170e-02, 1.36370839120290507362e-02, 1.26171219808761642112e-01,
+       7.18286544141962662868e-02, 5.40397917702171048937e-01, 1.06420880400844228286e-01, 1.0]
+_RA = [-9.81432934416914548592e+00, -8.12874355063065934246e+01, -1.84605092906711035994e+02,
+       -1.62396669462573470355e+02, -6.23753324503260060396e+01, -1.05586262253232909814e+01,
+       -6.93858572707181764372e-01, -9.86494403484714822705e-03]
+_SA = [-6.04244152148580987438e-02, 6.57024977031928170135e+00, 1.08635005541779435134e+02,
+       4.29008140027567833386e+02, 6.45387271733267880336e+02, 4.34565877475229228821e+02,
+       1.37657754143519042600e+02, 1.96512716674392571292e+01, 1.0]
+_RB = [-4.83519191608651397019e+02, -1.02509513161107724954e+03, -6.37566443368389627722e+02,
+       -1.60636384855821916062e+02, -1.77579549177547519889e+01, -7.99283237680523006574e-01,
+       -9.86494292470009928597e-03]
+_SB = [-2.24409524465858183362e+01, 4.74528541206955367215e+02, 2.55305040643316442583e+03,
+       3.19985821950859553908e+03, 1.53672958608443695994e+03, 3.25792512996573918826e+02,
+       3.03380607434824582924e+01, 1.0]
+
+
+def _horner(coefs: list[float], x: np.ndarray) -> np.ndarray:
+    # np.polyval's per-call overhead dominates at chain sizes.
+    y = coefs[0] * x + coefs[1]
+    for c in coefs[2:]:
+        y *= x
+        y += c
+    return y
+
+
+def _erfc_tail(a: np.ndarray) -> np.ndarray:
+    """erfc(a) for a >= 1.25 (NaN stays NaN)."""
+    a = np.minimum(a, 28.0)  # erfc(28) underflows to 0 already
+    s = 1.0 / (a * a)
+    near = a < 1 / 0.35
+    if near.all():
+        rs = _horner(_RA, s) / _horner(_SA, s)
+    elif not near.any():
+        rs = _horner(_RB, s) / _horner(_SB, s)
+    else:
+        rs = np.empty_like(s)
+        sn, sf = s[near], s[~near]
+        rs[near] = _horner(_RA, sn) / _horner(_SA, sn)
+        rs[~near] = _horner(_RB, sf) / _horner(_SB, sf)
+    # a with the low word cleared, so z*z is exact.
+    z = (np.ascontiguousarray(a).view(np.uint64) & np.uint64(0xFFFFFFFF00000000)).view(np.float64)
+    return np.exp(-z * z - 0.5625) * np.exp((z - a) * (z + a) + rs) / a
+
+
+def norm_cdf(x) -> np.ndarray:
+    """Standard normal CDF; tails go through erfc so they keep full precision."""
+    x = np.asarray(x, dtype=np.float64)
+    t = x.ravel() / _SQRT2
+    a = np.abs(t)
+    out = np.empty_like(t)
+    small = a < 0.84375
+    tail = ~(a < 1.25)  # NaN lands here and stays NaN
+    mid = ~small & ~tail
+    if small.any():
+        ts = t[small]
+        z = ts * ts
+        out[small] = 0.5 + 0.5 * (ts + ts * (_horner(_PP, z) / _horner(_QQ, z)))
+    if mid.any():
+        s = a[mid] - 1.0
+        out[mid] = 0.5 + 0.5 * np.copysign(_ERX + _horner(_PA, s) / _horner(_QA, s), t[mid])
+    if tail.any():
+        c = 0.5 * _erfc_tail(a[tail])
+        out[tail] = np.where(t[tail] < 0, c, 1.0 - c)
+    return out.reshape(x.shape)
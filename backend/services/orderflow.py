@@ -0,0 +1,159 @@
+"""
+Incremental per-second order-flow aggregation.
+
+Trades are folded into a fixed ring of one-second buckets (``window_sec``
+slots, slot = epoch second mod window) held in NumPy arrays. Each tick only
+ingests trades newer than the cursor, touches the buckets those trades land
+in, and clears buckets that have aged out of the window. Touched and
+evicted seconds are tracked so callers can publish deltas.
+
+Side classification matches the original stream:
+  * trades flagged "T" (extended hours) use the tick rule against the
+    previous trade price,
+  * everything else compares against the quote mid,
+  * ties and unclassifiable trades split 50/50.
+"""
+from __future__ import annotations
+
+from typing import Any
+
+import numpy as np
+
+import timestamps
+
+
+class OrderFlow:
+    def __init__(self, window_sec: int = 300):
+        self.window = window_sec
+        self._sec = np.full(window_sec, -1, dtype=np.int64)  # epoch second held by each slot
+        self._buy = np.zeros(window_sec)
+        self._sell = np.zeros(window_sec)
+        self._pxv = np.zeros(window_sec)
+        self._vol = np.zeros(window_sec)
+        self._dirty = np.zeros(window_sec, dtype=bool)
+        self._evicted: list[int] = []
+        self._last_price = 0.0
+        # Cursor: newest trade timestamp seen and the trades at exactly that
+        # stamp, so an inclusive ``start=cursor`` re-fetch doesn't double count.
+        self.cursor: str | None = None
+        self._cursor_ns = -1
+        self._at_cursor: set[Any] = set()
+
+    @staticmethod
+    def _trade_key(t: dict[str, Any]) -> Any:
+        return t.get("id") or (t.get("price"), t.get("size"), tuple(t.get("conditions") or ()))
+
+    def ingest(self, trades: list[dict[str, Any]], mid: float, now: float) -> int:
+        """Fold trades (oldest first) newer than the cursor. Returns how many were used."""
+        horizon = int(now) - self.window
+        secs: list[int] = []
+        prices: list[float] = []
+        sizes: list[float] = []
+        is_t: list[bool] = []
+        cursor, at_cursor = self._cursor_ns, self._at_cursor
+        stamps = [t.get("timestamp") for t in trades]
+        for t, ts, ns in zip(trades, stamps, timestamps.parse_many_ns(stamps).tolist()):
+            if ns == timestamps.INVALID or ns < cursor:
+                continue
+            key = self._trade_key(t)
+            if ns == cursor:
+                if key in at_cursor:
+                    continue
+                at_cursor.add(key)
+            else:
+                cursor, at_cursor = ns, {key}
+                self.cursor = ts
+            sec = ns // 1_000_000_000
+            price = float(t.get("price") or 0)
+            size = float(t.get("size") or 0)
+            if sec <= horizon or not price or not size:
+                continue
+            conds = t.get("conditions") or []
+            secs.append(sec)
+            prices.append(price)
+            sizes.append(size)
+            is_t.append(isinstance(conds, list) and "T" in conds)
+        self._cursor_ns, self._at_cursor = cursor, at_cursor
+        if not secs:
+            return 0
+
+        sec_a = np.asarray(secs, dtype=np.int64)
+        px = np.asarray(prices)
+        sz = np.asarray(sizes)
+        prev = np.empty_like(px)
+        prev[0] = self._last_price
+        prev[1:] = px[:-1]
+        self._last_price = float(px[-1])
+
+        # Fraction of each trade's size that counts as buying.
+        buy_frac = np.full(len(px), 0.5)
+        tick = np.asarray(is_t) & (prev > 0)
+        buy_frac[tick & (px > prev)] = 1.0
+        buy_frac[tick & (px < prev)] = 0.0
+        if mid > 0:
+            quote = ~tick
+            buy_frac[quote & (px > mid)] = 1.0
+            buy_frac[quote & (px < mid)] = 0.0
+
+        slots = sec_a % self.window
+        # Claim slots that still hold an older second.
+        stale = self._sec[slots] != sec_a
+        if stale.any():
+            fresh = np.unique(slots[stale])
+            self._clear(fresh)
+            self._sec[slots[stale]] = sec_a[stale]
+        self._dirty[slots] = True
+
+        np.add.at(self._buy, slots, sz * buy_frac)
+        np.add.at(self._sell, slots, sz * (1.0 - buy_frac))
+        np.add.at(self._pxv, slots, px * sz)
+        np.add.at(self._vol, slots, sz)
+        return len(px)
+
+    def _clear(self, slots: np.ndarray):
+        held = self._sec[slots]
+        self._evicted.extend(held[held >= 0].tolist())
+        self._sec[slots] = -1
+        self._buy[slots] = 0.0
+        self._sell[slots] = 0.0
+        self._pxv[slots] = 0.0
+        self._vol[slots] = 0.0
+
+    def evict(self, now: float) -> np.ndarray:
+        """Drop buckets older than the window; returns the evicted seconds."""
+        old = (self._sec >= 0) & (self._sec <= int(now) - self.window)
+        if not old.any():
+            return self._sec[:0]
+        evicted = self._sec[old].copy()
+        self._clear(np.flatnonzero(old))
+        self._dirty[old] = False
+        return evicted
+
+    def take_changes(self) -> tuple[list[dict[str, Any]], list[int]]:
+        """Buckets touched and seconds evicted since the last call."""
+        changed = self._rows(np.flatnonzero(self._dirty))
+        evicted = sorted(set(self._evicted) - {b["sec"] for b in changed})
+        self._dirty[:] = False
+        self._evicted.clear()
+        return changed, evicted
+
+    def buckets(self) -> list[dict[str, Any]]:
+        return self._rows(np.arange(self.window))
+
+    def _rows(self, slots: np.ndarray) -> list[dict[str, Any]]:
+        live = slots[(self._sec[slots] >= 0) & (self._vol[slots] > 0)]
+        live = live[np.argsort(self._sec[live])]
+        out = []
+        for i in live:
+            vol = float(self._vol[i])
+            buy = float(self._buy[i])
+            sell = float(self._sell[i])
+            out.append({
+                "sec": int(self._sec[i]),
+                "buy": buy,
+                "sell": sell,
+                "vol": vol,
+                "price": float(self._pxv[i]) / vol,
+                "imbalance": (buy - sell) / vol,
+            })
+        return out
@@ -1,85 +1,202 @@
+"""
+Screener snapshot cache, kept warm in the background.
+
+Requests and screener streams register the symbols they want with
+``ensure_fresh`` and read rows straight from memory. A background task
+re-fetches every tracked symbol whose row is older than
+``screener_ttl_sec``, in batches fetched concurrently (the provider's
+request gate bounds the fan-out), and merges the results in: a failed
+batch keeps its previous rows. Stale rows are served until their refresh
+lands (stale-while-revalidate). Only symbols that have never been fetched
+are fetched inline. Symbols nobody has asked for in ``screener_idle_sec``
+are dropped.
+
+Horizon changes (``c1m`` .. ``ytd``) come from ``screener_metrics``, whose
+bar pipeline runs alongside over the same tracked symbols. Every change to
+the rows rebuilds the columnar ``screener_table`` that queries run against.
+"""
 from __future__ import annotations
 
 import asyncio
+import logging
 import time
-from typing import Any
-import httpx
+from typing import Any, Awaitable, Callable
+
+import numpy as np
+
+from config import get_settings
+from providers.http import polling
+from services import screener_metrics
+from services.screener_table import ScreenerTable
+
+log = logging.getLogger(__name__)
+
+# Symbols per snapshot request.
+_BATCH = 200
 
-TTL_SEC = 15
 _cache: dict[str, dict[str, Any]] = {}
-_last_refresh = 0.0
-_lock = asyncio.Lock()
+_updated: dict[str, float] = {}  # symbol -> monotonic time of its last refresh
+_requested: dict[str, float] = {}  # symbol -> monotonic time it was last asked for
+_meta: dict[str, dict[str, Any]] = {}
+_table = ScreenerTable([])
+_cold_lock = asyncio.Lock()
+_wake: asyncio.Event | None = None
+_task: asyncio.Task | None = None
+_stats = {"refreshes": 0, "cold_fetches": 0, "batches": 0, "rows": 0, "errors": 0, "last_refresh_ms": 0.0}
 
 
 def _pct(a: float, b: float) -> float:
     return ((a - b) / b) * 100 if a and b else 0.0
 
 
-async def refresh_if_needed(provider: Any, symbols: list[str], universe_meta: dict[str, dict[str, Any]]) -> None:
-    global _last_refresh
-    now = time.time()
-    if now - _last_refresh < TTL_SEC and _cache:
-      return
-    async with _lock:
-      now = time.time()
-      if now - _last_refresh < TTL_SEC and _cache:
-        return
+def _row(sym: str, snap: dict[str, Any], meta: dict[str, Any], chg: dict[str, float]) -> dict[str, Any]:
+    v = snap["day_volume"]
+    return {
+        "s": sym,
+        "p": snap["price"],
+        "sec": meta.get("sec", "Unknown"),
+        "mc": float(meta.get("mc", 0)),
+        "rv": (snap["minute_volume"] / (v / 390.0)) if v > 0 else 0,
+        "c1m": chg["c1m"],
+        "c1h": chg["c1h"],
+        "c1d": _pct(snap["day_close"], snap["prev_close"]),
+        "c1w": chg["c1w"],
+        "c1mo": chg["c1mo"],
+        "c1y": chg["c1y"],
+        "ytd": chg["ytd"],
+        "lg": meta.get("logo", ""),
+        "vol": v,
+    }
 
-      data_url = getattr(provider, "_data_url", None)
-      headers = getattr(provider, "_headers", None)
-      if not data_url or not headers:
-        return
 
-      out: dict[str, dict[str, Any]] = {}
-      async with httpx.AsyncClient(timeout=20.0) as c:
-        for i in range(0, len(symbols), 200):
-          batch = symbols[i:i+200]
-          r = await c.get(
-            f"{data_url}/v2/stocks/snapshots",
-            headers=headers,
-            params={"symbols": ",".join(batch), "feed": "sip"},
-          )
-          if r.status_code != 200:
+async def _refresh(provider: Any, symbols: list[str]) -> int:
+    """Fetch *symbols* in concurrent batches and merge them into the cache."""
+    batches = [symbols[i:i + _BATCH] for i in range(0, len(symbols), _BATCH)]
+    results = await asyncio.gather(*(provider.get_snapshots(b) for b in batches), return_exceptions=True)
+    now = time.monotonic()
+    got: dict[str, dict[str, Any]] = {}
+    for batch, snaps in zip(batches, results):
+        _stats["batches"] += 1
+        if isinstance(snaps, BaseException):
+            _stats["errors"] += 1
+            log.warning("screener snapshot batch failed: %s", snaps)
             continue
-          snaps = r.json().get("snapshots", {})
-          for sym in batch:
-            s = snaps.get(sym) or {}
-            trade = s.get("latestTrade") or {}
-            day = s.get("dailyBar") or {}
-            prev = s.get("prevDailyBar") or {}
-            minbar = s.get("minuteBar") or {}
-            p = float(trade.get("p") or day.get("c") or 0)
-            prev_c = float(prev.get("c") or 0)
-            day_c = float(day.get("c") or p)
-            day_o = float(day.get("o") or p)
-            v = float(day.get("v") or 0)
-            mv = float(minbar.get("v") or 0)
-            meta = universe_meta.get(sym, {})
-            out[sym] = {
-              "s": sym,
-              "p": p,
-              "sec": meta.get("sec", "Unknown"),
-              "mc": float(meta.get("mc", 0)),
-              "rv": (mv / (v / 390.0)) if v > 0 else 0,
-              "c1m": 0.0,
-              "c1h": 0.0,
-              "c1d": _pct(day_c, prev_c),
-              "c1w": 0.0,
-              "c1mo": 0.0,
-              "c1y": 0.0,
-              "ytd": _pct(day_c, day_o),
-              "lg": meta.get("logo", ""),
-              "vol": v,
-            }
-
-      _cache.clear()
-      _cache.update(out)
-      _last_refresh = time.time()
-
-
-def get_rows(symbols: list[str]) -> list[dict[str, Any]]:
-    return [v for s, v in _cache.items() if s in symbols]
+        for sym in batch:
+            _updated[sym] = now
+            if snaps.get(sym):
+                got[sym] = snaps[sym]
+    if got:
+        syms = list(got)
+        chg = screener_metrics.changes(syms, np.array([got[s]["price"] for s in syms]))
+        cols = {k: v.tolist() for k, v in chg.items()}
+        for i, sym in enumerate(syms):
+            _cache[sym] = _row(sym, got[sym], _meta.get(sym, {}), {k: v[i] for k, v in cols.items()})
+        _rebuild()
+    _stats["rows"] += len(got)
+    return len(got)
+
+
+def _rebuild():
+    global _table
+    _table = ScreenerTable(list(_cache.values()))
+
+
+def _sweep(now: float):
+    idle = get_settings().screener_idle_sec
+    idle_syms = [s for s, t in _requested.items() if now - t > idle]
+    for sym in idle_syms:
+        for d in (_requested, _updated, _cache, _meta):
+            d.pop(sym, None)
+    if idle_syms:
+        _rebuild()
+
+
+def _stale(now: float) -> list[str]:
+    ttl = get_settings().screener_ttl_sec
+    return [s for s in _requested if now - _updated.get(s, float("-inf")) >= ttl]
+
+
+async def ensure_fresh(provider: Any, symbols: list[str], universe_meta: dict[str, dict[str, Any]]) -> None:
+    """
+    Track *symbols* for background refresh. Returns at once when each has a
+    row, stale or not; symbols never fetched before are fetched here.
+    """
+    now = time.monotonic()
+    for sym in symbols:
+        _requested[sym] = now
+        if sym in universe_meta:
+            _meta[sym] = universe_meta[sym]
+    cold = [s for s in symbols if s not in _updated]
+    if cold:
+        screener_metrics.wake()
+        async with _cold_lock:
+            cold = [s for s in cold if s not in _updated]
+            if cold:
+                _stats["cold_fetches"] += 1
+                await _refresh(provider, cold)
+    if _wake is not None and any(now - _updated.get(s, now) >= get_settings().screener_ttl_sec for s in symbols):
+        _wake.set()
+
+
+def table() -> ScreenerTable:
+    """Columnar snapshot of every cached row (replaced, never mutated)."""
+    return _table
 
 
 def get_symbol(symbol: str) -> dict[str, Any] | None:
     return _cache.get(symbol)
+
+
+async def _loop(get_provider: Callable[[], Awaitable[Any]]):
+    while True:
+        ttl = get_settings().screener_ttl_sec
+        try:
+            await asyncio.wait_for(_wake.wait(), timeout=max(ttl / 3, 0.5))
+        except asyncio.TimeoutError:
+            pass
+        _wake.clear()
+        now = time.monotonic()
+        _sweep(now)
+        stale = _stale(now)
+        if not stale:
+            continue
+        started = time.perf_counter()
+        try:
+            # Background refreshes share the stream poll budget; only the
+            # cold fetch in ensure_fresh, which a request waits on, is
+            # interactive.
+            with polling():
+                await _refresh(await get_provider(), stale)
+        except Exception:
+            _stats["errors"] += 1
+            log.exception("screener refresh failed")
+            continue
+        _stats["refreshes"] += 1
+        _stats["last_refresh_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+
+def start(get_provider: Callable[[], Awaitable[Any]]):
+    """Start the background refresher; *get_provider* is awaited each cycle."""
+    global _wake, _task
+    if _task is not None:
+        return
+    _wake = asyncio.Event()
+    _task = asyncio.create_task(_loop(get_provider))
+    screener_metrics.start(get_provider, lambda: list(_requested))
+
+
+async def stop():
+    global _task
+    await screener_metrics.stop()
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+
+
+def stats() -> dict[str, Any]:
+    now = time.monotonic()
+    return {**_stats, "tracked": len(_requested), "cached": len(_cache), "stale": len(_stale(now)), "table_rows": len(_table)}
@@ -0,0 +1,305 @@
+"""
+Multi-horizon screener returns from a batch bar pipeline.
+
+Daily and 1Min closes for every tracked screener symbol are pulled in bulk
+with ``provider.get_history_batch`` (many symbols per request) and held as
+per-symbol arrays: daily bars for about 400 days, 1Min bars for the last
+hour or so of the latest session. Each sync only asks for bars after what
+was already fetched (a per-symbol watermark, shared by symbols synced
+together so they stay in one request), so after the first pass the 1Min
+sync is one small request per batch a minute and the daily sync runs once
+a day. Closed daily bars also go into the bar cache and from there to the
+on-disk store, which is what a restart reloads them from.
+
+``changes`` turns a batch of prices into percent changes against the close
+1 minute, 1 hour, 1 week, 1 month and 1 year back and the previous year's
+last close, for all symbols in one vectorized pass: closes are stacked into
+padded (symbols × bars) matrices and each horizon's reference is the last
+bar at or before its target time. Intraday horizons count back from the
+close of the latest session when the market is shut.
+"""
+from __future__ import annotations
+
+import asyncio
+import calendar
+import logging
+import time
+from datetime import date, datetime, timezone
+from typing import Any, Awaitable, Callable
+
+import numpy as np
+
+import timestamps
+from providers.http import polling
+from services import history_cache, market_calendar
+
+log = logging.getLogger(__name__)
+
+# Symbols per batch request.
+_BATCH = 200
+_DAILY_TF = "1Day"
+_MINUTE_TF = "1Min"
+_DAILY_KEEP_SEC = 400 * 86400
+_MINUTE_KEEP_SEC = 3600 + 600
+# Intraday horizons: the reference bar must have closed this long before the anchor.
+_INTRADAY = {"c1m": 60, "c1h": 3600}
+KEYS = ("c1m", "c1h", "c1w", "c1mo", "c1y", "ytd")
+
+_wake: asyncio.Event | None = None
+_task: asyncio.Task | None = None
+_stats = {"syncs": 0, "requests": 0, "daily_bars": 0, "minute_bars": 0, "errors": 0, "last_sync_ms": 0.0}
+
+
+class _Panel:
+    """Recent closes per symbol, stacked on demand into padded matrices."""
+
+    def __init__(self, keep_sec: int):
+        self.keep = keep_sec
+        self.series: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        self.synced: dict[str, int] = {}  # symbol -> end of the last fetched range
+        self._stacked: tuple[dict[str, int], np.ndarray, np.ndarray] | None = None
+
+    def merge(self, sym: str, ts: np.ndarray, c: np.ndarray):
+        old = self.series.get(sym)
+        if old is not None:
+            ts, c = np.concatenate([old[0], ts]), np.concatenate([old[1], c])
+            order = np.argsort(ts, kind="stable")
+            ts, c = ts[order], c[order]
+            last = np.append(ts[1:] != ts[:-1], True)  # newest value wins
+            ts, c = ts[last], c[last]
+        if not len(ts):
+            return
+        cut = int(np.searchsorted(ts, ts[-1] - self.keep))
+        self.series[sym] = (ts[cut:], c[cut:])
+        self._stacked = None
+
+    def drop(self, keep: set[str]):
+        for sym in [s for s in self.series if s not in keep]:
+            del self.series[sym]
+            self._stacked = None
+        for sym in [s for s in self.synced if s not in keep]:
+            del self.synced[sym]
+
+    def _stack(self) -> tuple[dict[str, int], np.ndarray, np.ndarray]:
+        if self._stacked is None:
+            syms = list(self.series)
+            width = max((len(t) for t, _ in self.series.values()), default=0)
+            ts = np.full((len(syms), width), np.iinfo(np.int64).max, dtype=np.int64)
+            c = np.full((len(syms), width), np.nan)
+            for i, sym in enumerate(syms):
+                t, v = self.series[sym]
+                ts[i, :len(t)] = t
+                c[i, :len(v)] = v
+            self._stacked = ({s: i for i, s in enumerate(syms)}, ts, c)
+        return self._stacked
+
+    def refs(self, symbols: list[str], targets: np.ndarray) -> np.ndarray:
+        """(symbols × targets) closes of the last bar at or before each target; NaN if none."""
+        index, ts, c = self._stack()
+        out = np.full((len(symbols), len(targets)), np.nan)
+        rows = np.fromiter((index.get(s, -1) for s in symbols), dtype=np.int64, count=len(symbols))
+        have = rows >= 0
+        if not have.any() or not ts.shape[1]:
+            return out
+        r = rows[have]
+        # Rows are sorted with padding at the end, so a count is an index.
+        idx = (ts[r][:, :, None] <= targets[None, None, :]).sum(axis=1) - 1
+        vals = c[r[:, None], np.maximum(idx, 0)]
+        out[have] = np.where(idx >= 0, vals, np.nan)
+        return out
+
+
+_daily = _Panel(_DAILY_KEEP_SEC)
+_minute = _Panel(_MINUTE_KEEP_SEC)
+
+
+def _iso(ts: int) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _months_back(d: date, months: int) -> date:
+    y, m = divmod(d.year * 12 + d.month - 1 - months, 12)
+    return date(y, m + 1, min(d.day, calendar.monthrange(y, m + 1)[1]))
+
+
+def _midnight(d: date) -> int:
+    return market_calendar.session(d, whole_day=True)[0]
+
+
+def _anchor(now: int) -> int:
+    """Now, or the close of the latest session if it's over."""
+    for _, end in market_calendar.sessions_before(now, now - 10 * 86400):
+        return min(now, end)
+    return now
+
+
+def _targets(now: int) -> tuple[np.ndarray, np.ndarray]:
+    anchor = _anchor(now)
+    intraday = np.array([anchor - h - 60 for h in _INTRADAY.values()], dtype=np.int64)
+    today = market_calendar.trading_day(now)
+    daily = np.array([
+        _midnight(date.fromordinal(today.toordinal() - 7)),
+        _midnight(_months_back(today, 1)),
+        _midnight(_months_back(today, 12)),
+        _midnight(date(today.year, 1, 1)) - 1,
+    ], dtype=np.int64)
+    return intraday, daily
+
+
+def changes(symbols: list[str], prices: np.ndarray, now: int | None = None) -> dict[str, np.ndarray]:
+    """Percent change of *prices* over each horizon in ``KEYS``; 0 where there's no reference."""
+    intraday, daily = _targets(int(time.time()) if now is None else now)
+    refs = np.hstack([_minute.refs(symbols, intraday), _daily.refs(symbols, daily)])
+    p = np.asarray(prices, dtype=np.float64)[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = (p - refs) / refs * 100
+    pct = np.where(np.isfinite(pct) & (p > 0), pct, 0.0)
+    return {k: pct[:, i] for i, k in enumerate(KEYS)}
+
+
+# ── Pipeline ──────────────────────────────────────────────────
+
+async def _fetch(provider: Any, timeframe: str, symbols: list[str], lo: int, hi: int) -> dict[str, list[dict]]:
+    batches = [symbols[i:i + _BATCH] for i in range(0, len(symbols), _BATCH)]
+    results = await asyncio.gather(
+        *(provider.get_history_batch(b, timeframe, start=_iso(lo), end=_iso(hi)) for b in batches),
+        return_exceptions=True,
+    )
+    _stats["requests"] += len(batches)
+    out: dict[str, list[dict]] = {}
+    for batch, res in zip(batches, results):
+        if isinstance(res, BaseException):
+            _stats["errors"] += 1
+            log.warning("screener %s bars for %d symbols failed: %s", timeframe, len(batch), res)
+            continue
+        for sym in batch:
+            out[sym] = res.get(sym) or []
+    return out
+
+
+def _compact(bars: list[dict]) -> list[dict]:
+    out = []
+    for b, ts in zip(bars, timestamps.parse_many([b.get("timestamp") for b in bars]).tolist()):
+        if ts != timestamps.INVALID:
+            out.append({"ts": ts, "o": b.get("open"), "h": b.get("high"), "l": b.get("low"), "c": b.get("close"), "v": b.get("volume")})
+    return out
+
+
+def _closes(bars: list[dict]) -> tuple[np.ndarray, np.ndarray]:
+    ts = np.fromiter((b["ts"] for b in bars), dtype=np.int64, count=len(bars))
+    c = np.array([b["c"] if b["c"] is not None else np.nan for b in bars], dtype=np.float64)
+    return ts, c
+
+
+async def _load_daily(symbols: list[str], floor: int, end_ts: int):
+    """Seed symbols new to the daily panel from the bar cache / on-disk store."""
+    limit = _DAILY_KEEP_SEC // 86400
+    for sym in symbols:
+        bars = await history_cache.load_bars(sym, _DAILY_TF, end_ts=end_ts, limit=limit)
+        if bars:
+            _daily.merge(sym, *_closes(bars))
+            # Resume after the newest stored bar, unless the store doesn't reach back far enough.
+            if bars[0]["ts"] <= floor + 10 * 86400:
+                _daily.synced[sym] = bars[-1]["ts"]
+
+
+async def _sync_panel(panel: _Panel, provider: Any, timeframe: str, symbols: list[str], floor: int, hi: int, step: int) -> int:
+    # Symbols that share a watermark share a request.
+    groups: dict[int, list[str]] = {}
+    for sym in symbols:
+        lo = max(panel.synced.get(sym, floor - step) + step, floor)
+        if lo > hi:
+            continue
+        if step < 86400 and not market_calendar.sessions(lo, hi):
+            panel.synced[sym] = hi  # market shut the whole time; nothing to ask for
+            continue
+        groups.setdefault(lo, []).append(sym)
+    fetched = await asyncio.gather(*(_fetch(provider, timeframe, syms, lo, hi) for lo, syms in groups.items()))
+    ranged = provider.ranged_history()
+    n = 0
+    for lo, got in zip(groups, fetched):
+        for sym, bars in got.items():
+            bars = _compact(bars)
+            if bars:
+                panel.merge(sym, *_closes(bars))
+                n += len(bars)
+            if timeframe == _DAILY_TF:
+                history_cache.upsert_immutable_bars(sym, timeframe, bars, latest_closed_ts=hi)
+                if ranged:
+                    history_cache.mark_covered(sym, timeframe, lo, hi, step)
+            panel.synced[sym] = hi
+    return n
+
+
+async def sync(provider: Any, symbols: list[str]):
+    """Bring both panels up to date for *symbols* and forget everything else."""
+    started = time.perf_counter()
+    now = int(time.time())
+    keep = set(symbols)
+    _daily.drop(keep)
+    _minute.drop(keep)
+
+    # Daily: closed sessions only (bars before today's local midnight).
+    day_lo, day_hi = now - _DAILY_KEEP_SEC, _midnight(market_calendar.trading_day(now)) - 1
+    await _load_daily([s for s in symbols if s not in _daily.synced and s not in _daily.series], day_lo, day_hi)
+    _stats["daily_bars"] += await _sync_panel(_daily, provider, _DAILY_TF, symbols, day_lo, day_hi, 86400)
+
+    # 1Min: enough of the latest session to reach back an hour from its end.
+    anchor = _anchor(now)
+    _stats["minute_bars"] += await _sync_panel(
+        _minute, provider, _MINUTE_TF, symbols, anchor - _MINUTE_KEEP_SEC, now // 60 * 60 - 60, 60,
+    )
+    _stats["syncs"] += 1
+    _stats["last_sync_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+
+def wake():
+    """Sync now rather than at the next minute (new symbols were tracked)."""
+    if _wake is not None:
+        _wake.set()
+
+
+async def _loop(get_provider: Callable[[], Awaitable[Any]], get_symbols: Callable[[], list[str]]):
+    while True:
+        symbols = get_symbols()
+        if symbols:
+            try:
+                with polling():
+                    await sync(await get_provider(), symbols)
+            except Exception:
+                _stats["errors"] += 1
+                log.exception("screener bar sync failed")
+        # Just after the next minute bar closes.
+        delay = 60 - time.time() % 60 + 2
+        try:
+            await asyncio.wait_for(_wake.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+        _wake.clear()
+
+
+def start(get_provider: Callable[[], Awaitable[Any]], get_symbols: Callable[[], list[str]]):
+    global _wake, _task
+    if _task is not None:
+        return
+    _wake = asyncio.Event()
+    _task = asyncio.create_task(_loop(get_provider, get_symbols))
+
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+
+
+def stats() -> dict[str, Any]:
+    return {
+        **_stats,
+        "daily_symbols": len(_daily.series),
+        "minute_symbols": len(_minute.series),
+    }
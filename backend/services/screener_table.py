@@ -0,0 +1,141 @@
+"""
+Columnar screener table and compiled filter queries.
+
+``ScreenerTable`` holds the cached screener rows as NumPy columns, one
+numeric array per metric plus object arrays for the text fields, and the
+ascending and descending sort permutation of every column, built once per
+refresh. A query is then a boolean mask (symbol subset & compiled filters),
+the chosen permutation masked down to the matching rows, and a slice for
+the page.
+
+Filter JSON (``[{f, op, v}, ...]``) compiles once per distinct string into
+vectorized predicates with the same semantics as the row-at-a-time
+matcher it replaces: ``sec``/``s`` take ``=``, ``!=``, ``in`` and ``not-in``
+(comma-separated), ``mc`` takes ``bucket:<name>`` market-cap ranges, and
+everything else compares numerically. Conditions that can't be evaluated
+(unknown field or operator, non-numeric value) match every row.
+"""
+from __future__ import annotations
+
+import json
+import operator
+from functools import lru_cache
+from typing import Any, Callable
+
+import numpy as np
+
+NUMERIC = ("p", "mc", "rv", "c1m", "c1h", "c1d", "c1w", "c1mo", "c1y", "ytd", "vol")
+TEXT = ("s", "sec")
+
+# Market cap buckets, in billions: [lo, hi).
+MC_BUCKETS = {
+    "lt10m": (-np.inf, 0.01),
+    "10m_99m": (0.01, 0.1),
+    "100m_999m": (0.1, 1),
+    "1b_99b": (1, 100),
+    "100b_999b": (100, 1000),
+    "1t_plus": (1000, np.inf),
+}
+
+_OPS: dict[str, Callable[[Any, Any], Any]] = {
+    "=": operator.eq, "!=": operator.ne,
+    ">": operator.gt, "<": operator.lt, ">=": operator.ge, "<=": operator.le,
+}
+
+Predicate = Callable[["ScreenerTable"], np.ndarray]
+
+
+class ScreenerTable:
+    def __init__(self, rows: list[dict[str, Any]]):
+        self.rows = rows
+        self.index = {r["s"]: i for i, r in enumerate(rows)}
+        self.cols: dict[str, np.ndarray] = {}
+        for k in NUMERIC:
+            self.cols[k] = np.array([float(r.get(k) or 0) for r in rows], dtype=np.float64)
+        for k in TEXT:
+            self.cols[k] = np.array([str(r.get(k, "")) for r in rows], dtype=object)
+        self._perms: dict[tuple[str, bool], np.ndarray] = {}
+        for k, col in self.cols.items():
+            # Descending sorts on the negated dense rank, so ties keep table
+            # order just like sort(reverse=True).
+            rank = np.unique(col, return_inverse=True)[1].reshape(-1)
+            self._perms[(k, False)] = np.argsort(col, kind="stable")
+            self._perms[(k, True)] = np.argsort(-rank, kind="stable")
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def subset(self, symbols: list[str]) -> np.ndarray:
+        mask = np.zeros(len(self.rows), dtype=bool)
+        idx = [i for i in map(self.index.get, symbols) if i is not None]
+        mask[idx] = True
+        return mask
+
+    def query(
+        self,
+        symbols: list[str] | None,
+        filters: tuple[Predicate, ...],
+        sort: str,
+        desc: bool,
+        offset: int,
+        limit: int,
+    ) -> tuple[list[dict[str, Any]], int]:
+        """One page of matching rows in sort order, and the total match count."""
+        mask = self.subset(symbols) if symbols is not None else np.ones(len(self.rows), dtype=bool)
+        for pred in filters:
+            mask &= pred(self)
+        perm = self._perms.get((sort, desc))
+        if perm is None:
+            perm = np.arange(len(self.rows))  # unknown column: every key ties
+        hits = perm[mask[perm]]
+        return [self.rows[i] for i in hits[offset:offset + limit].tolist()], len(hits)
+
+
+def _everything(t: ScreenerTable) -> np.ndarray:
+    return np.ones(len(t), dtype=bool)
+
+
+def _compile(cond: dict[str, Any]) -> Predicate:
+    f = str(cond.get("f") or "")
+    op = str(cond.get("op") or "=")
+    v = cond.get("v")
+
+    if f in TEXT:
+        vals = np.array([x.strip() for x in str(v or "").split(",") if x.strip()], dtype=object)
+        if op == "in":
+            return lambda t: np.isin(t.cols[f], vals)
+        if op == "not-in":
+            return lambda t: ~np.isin(t.cols[f], vals)
+        if op in ("=", "!="):
+            return lambda t: _OPS[op](t.cols[f], str(v))
+        return _everything
+
+    if f == "mc" and isinstance(v, str) and v.startswith("bucket:"):
+        bounds = MC_BUCKETS.get(v.split(":", 1)[1])
+        if bounds is not None:
+            lo, hi = bounds
+            return lambda t: (t.cols["mc"] >= lo) & (t.cols["mc"] < hi)
+
+    fn = _OPS.get(op)
+    if f not in NUMERIC or fn is None:
+        return _everything
+    try:
+        b = float(v)
+    except (TypeError, ValueError):
+        return _everything
+    return lambda t: fn(t.cols[f], b)
+
+
+@lru_cache(maxsize=256)
+def compile_filters(filters: str | None) -> tuple[Predicate, ...]:
+    """Compile a filter JSON string (malformed input means no filters)."""
+    if not filters:
+        return ()
+    try:
+        conds = json.loads(filters)
+    except ValueError:
+        return ()
+    if not isinstance(conds, list):
+        return ()
+    preds = (_compile(c if isinstance(c, dict) else {}) for c in conds)
+    return tuple(p for p in preds if p is not _everything)
@@ -0,0 +1,249 @@
+"""
+Full-universe symbol catalog and type-ahead search.
+
+The provider's asset list (``BaseProvider.get_assets``) is loaded once a day
+into the ``assets`` table; startup serves from that table straight away and
+only goes upstream when it is older than ``_RELOAD_SEC``. The curated
+entries below supply sector / market cap / logo metadata, which the asset
+list doesn't carry (providers that return ``sector``/``market_cap`` fill it
+in for everything else), and keep search usable before the first load.
+
+Search runs on two prefix indexes built once per load: symbol prefixes and
+name-token prefixes, each mapping to entry ids in rank order (curated
+popular symbols first, then larger market cap, listed exchanges, shorter
+tickers). A query is a couple of dict lookups plus a slice, so ranking
+over ~10k symbols stays well under a millisecond.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import time
+from typing import Any, Awaitable, Callable
+
+import db
+
+log = logging.getLogger(__name__)
+
+_RELOAD_SEC = 86400
+_CHECK_SEC = 3600
+_LOADED_KEY = "assets_loaded_at"
+# Name tokens are indexed up to this many leading characters.
+_TOKEN_PREFIX_MAX = 12
+_LISTED = ("NASDAQ", "NYSE", "ARCA", "AMEX", "BATS")
+
+# Shown for an empty query, in this order.
+POPULAR = [
+    ("SPY","SPDR S&P 500 ETF"),("QQQ","Invesco QQQ Trust"),("IWM","iShares Russell 2000 ETF"),("DIA","SPDR Dow Jones ETF"),
+    ("AAPL","Apple Inc."),("MSFT","Microsoft Corp."),("NVDA","NVIDIA Corp."),("AMZN","Amazon.com Inc."),("GOOGL","Alphabet Class A"),("META","Meta Platforms"),("TSLA","Tesla Inc."),("AMD","Advanced Micro Devices"),("NFLX","Netflix Inc."),
+    ("JPM","JPMorgan Chase"),("BAC","Bank of America"),("GS","Goldman Sachs"),("XOM","Exxon Mobil"),("CVX","Chevron Corp."),("UNH","UnitedHealth Group"),("PFE","Pfizer Inc."),
+    ("PLTR","Palantir Technologies"),("COIN","Coinbase Global"),("MSTR","MicroStrategy"),("HOOD","Robinhood Markets"),("SOFI","SoFi Technologies"),
+    ("BABA","Alibaba Group"),("NIO","NIO Inc."),("DIS","Walt Disney Co."),("KO","Coca-Cola Co."),("WMT","Walmart Inc."),
+]
+
+# Screener metadata: sector, market cap (billions USD), logo domain.
+CURATED = {
+    "SPY": {"sec": "ETF", "mc": 500, "logo": "spdrs.com"},
+    "QQQ": {"sec": "ETF", "mc": 300, "logo": "invesco.com"},
+    "IWM": {"sec": "ETF", "mc": 80, "logo": "ishares.com"},
+    "AAPL": {"sec": "Technology", "mc": 3200, "logo": "apple.com"},
+    "MSFT": {"sec": "Technology", "mc": 3100, "logo": "microsoft.com"},
+    "NVDA": {"sec": "Technology", "mc": 2800, "logo": "nvidia.com"},
+    "AMZN": {"sec": "Consumer", "mc": 1900, "logo": "amazon.com"},
+    "GOOGL": {"sec": "Technology", "mc": 2200, "logo": "abc.xyz"},
+    "META": {"sec": "Technology", "mc": 1600, "logo": "meta.com"},
+    "TSLA": {"sec": "Consumer", "mc": 900, "logo": "tesla.com"},
+    "AMD": {"sec": "Technology", "mc": 350, "logo": "amd.com"},
+    "NFLX": {"sec": "Communication", "mc": 250, "logo": "netflix.com"},
+    "JPM": {"sec": "Financials", "mc": 600, "logo": "jpmorganchase.com"},
+    "BAC": {"sec": "Financials", "mc": 350, "logo": "bankofamerica.com"},
+    "GS": {"sec": "Financials", "mc": 150, "logo": "goldmansachs.com"},
+    "XOM": {"sec": "Energy", "mc": 450, "logo": "exxonmobil.com"},
+    "CVX": {"sec": "Energy", "mc": 300, "logo": "chevron.com"},
+    "UNH": {"sec": "Healthcare", "mc": 450, "logo": "unitedhealthgroup.com"},
+    "PFE": {"sec": "Healthcare", "mc": 160, "logo": "pfizer.com"},
+    "PLTR": {"sec": "Technology", "mc": 70, "logo": "palantir.com"},
+    "COIN": {"sec": "Financials", "mc": 60, "logo": "coinbase.com"},
+    "MSTR": {"sec": "Technology", "mc": 40, "logo": "microstrategy.com"},
+}
+
+# Screened by default alongside CURATED, without metadata of their own.
+EXTRA_SCREENER = [
+    "DIA","SMH","XLF","XLK","XLE","XLI","XLV","XLY","XLP","XLC",
+    "AVGO","ORCL","ADBE","CRM","INTC","CSCO","QCOM","MU","AMAT","LRCX",
+    "WMT","COST","HD","LOW","NKE","SBUX","MCD","DIS","UBER","ABNB",
+    "V","MA","AXP","PYPL","SCHW","MS","C","WFC","BLK","SPGI",
+    "JNJ","LLY","MRK","TMO","ISRG","ABT","DHR","BMY","VRTX","MDT",
+    "GE","CAT","DE","BA","HON","ETN","UPS","FDX","RTX","LMT",
+]
+
+_stats = {"loads": 0, "upstream_loads": 0, "errors": 0, "searches": 0, "build_ms": 0.0}
+_task: asyncio.Task | None = None
+_built = False
+
+
+def _tokens(text: str) -> list[str]:
+    return re.findall(r"[A-Z0-9]+", text.upper())
+
+
+class _Catalog:
+    def __init__(self, assets: list[dict[str, Any]]):
+        popular = {s: i for i, (s, _) in enumerate(POPULAR)}
+        by_sym: dict[str, dict[str, Any]] = {s: {"symbol": s, "name": n} for s, n in POPULAR}
+        for a in assets:
+            sym = str(a.get("symbol") or "").upper()
+            if sym:
+                by_sym[sym] = {**by_sym.get(sym, {}), **{k: v for k, v in a.items() if v not in (None, "")}, "symbol": sym}
+        for sym, meta in CURATED.items():
+            e = by_sym.setdefault(sym, {"symbol": sym, "name": ""})
+            e.setdefault("sector", meta["sec"])
+            e.setdefault("market_cap", meta["mc"])
+            e["logo"] = meta["logo"]
+
+        def rank(e: dict[str, Any]) -> tuple:
+            sym = e["symbol"]
+            return (
+                popular.get(sym, len(popular)),
+                -float(e.get("market_cap") or 0),
+                (e.get("exchange") or "") not in _LISTED,
+                len(sym),
+                sym,
+            )
+
+        self.entries = sorted(by_sym.values(), key=rank)
+        self.index = {e["symbol"]: i for i, e in enumerate(self.entries)}
+        self.screener = list(dict.fromkeys(
+            list(CURATED) + EXTRA_SCREENER + [e["symbol"] for e in self.entries if e.get("sector")]
+        ))
+        # prefix -> entry ids in rank order (entries are visited in rank order).
+        self.symbol_prefix: dict[str, list[int]] = {}
+        self.name_prefix: dict[str, list[int]] = {}
+        for i, e in enumerate(self.entries):
+            sym = e["symbol"]
+            for n in range(1, len(sym) + 1):
+                self.symbol_prefix.setdefault(sym[:n], []).append(i)
+            for tok in _tokens(e.get("name") or ""):
+                for n in range(1, min(len(tok), _TOKEN_PREFIX_MAX) + 1):
+                    ids = self.name_prefix.setdefault(tok[:n], [])
+                    if not ids or ids[-1] != i:
+                        ids.append(i)
+
+    def _name_matches(self, words: list[str]) -> list[int]:
+        lists = [self.name_prefix.get(w[:_TOKEN_PREFIX_MAX], []) for w in words]
+        if len(lists) == 1:
+            return lists[0]
+        lists.sort(key=len)
+        others = [set(x) for x in lists[1:]]
+        return [i for i in lists[0] if all(i in s for s in others)]
+
+    def search(self, query: str, limit: int) -> list[dict[str, Any]]:
+        q = query.strip().upper()
+        if not q:
+            return self.entries[:limit]
+        out: list[int] = []
+        seen: set[int] = set()
+
+        def take(ids: list[int]) -> bool:
+            for i in ids:
+                if i not in seen:
+                    seen.add(i)
+                    out.append(i)
+                    if len(out) >= limit:
+                        return True
+            return False
+
+        words = _tokens(q)
+        # Name matches are only worked out when symbol matches don't fill the page.
+        exact = [self.index[q]] if q in self.index else []
+        if not take(exact) and not take(self.symbol_prefix.get(q, [])) and words:
+            take(self._name_matches(words))
+        return [self.entries[j] for j in out]
+
+
+_catalog = _Catalog([])
+
+
+def search(query: str, limit: int = 20) -> list[dict[str, Any]]:
+    """Ranked type-ahead matches: exact symbol, symbol prefix, then name-word prefixes."""
+    _stats["searches"] += 1
+    return _catalog.search(query, limit)
+
+
+def metadata(symbols: list[str]) -> dict[str, dict[str, Any]]:
+    """Screener metadata (``sec``, ``mc``, ``logo``) for the symbols that have any."""
+    out = {}
+    cat = _catalog
+    for sym in symbols:
+        i = cat.index.get(sym)
+        if i is None:
+            continue
+        e = cat.entries[i]
+        if e.get("sector") or e.get("market_cap"):
+            out[sym] = {"sec": e.get("sector") or "Unknown", "mc": float(e.get("market_cap") or 0), "logo": e.get("logo", "")}
+    return out
+
+
+def screener_universe() -> list[str]:
+    """Default screener symbols: the curated list plus every asset with sector data."""
+    return _catalog.screener
+
+
+async def load(provider: Any | None = None):
+    """Refresh the stored asset list upstream when due; rebuild the indexes if it changed."""
+    global _catalog, _built
+    fresh: list[dict[str, Any]] = []
+    loaded_at = float(await db.get_setting(_LOADED_KEY) or 0)
+    if provider is not None and time.time() - loaded_at >= _RELOAD_SEC:
+        try:
+            fresh = await provider.get_assets()
+        except Exception:
+            _stats["errors"] += 1
+            log.exception("asset list load failed")
+        if fresh:
+            await db.replace_assets(fresh)
+            await db.set_setting(_LOADED_KEY, str(time.time()))
+            _stats["upstream_loads"] += 1
+    if fresh or not _built:
+        assets = fresh or await db.get_assets()
+        started = time.perf_counter()
+        _catalog = await asyncio.to_thread(_Catalog, assets)
+        _built = True
+        _stats["loads"] += 1
+        _stats["build_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+
+async def _loop(get_provider: Callable[[], Awaitable[Any]]):
+    while True:
+        try:
+            await load(await get_provider())
+        except Exception:
+            _stats["errors"] += 1
+            log.exception("symbol catalog refresh failed")
+        await asyncio.sleep(_CHECK_SEC)
+
+
+def start(get_provider: Callable[[], Awaitable[Any]]):
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(_loop(get_provider))
+
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+
+
+def stats() -> dict[str, Any]:
+    return {
+        **_stats,
+        "symbols": len(_catalog.entries),
+        "symbol_prefixes": len(_catalog.symbol_prefix),
+        "name_prefixes": len(_catalog.name_prefix),
+    }
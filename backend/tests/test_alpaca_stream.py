@@ -0,0 +1,178 @@
+"""AlpacaQuoteStream against the local stub server in scripts/alpaca_stream_stub.py."""
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import json
+import time
+from pathlib import Path
+
+import websockets
+
+from providers.alpaca_stream import AlpacaQuoteStream
+
+_STUB = Path(__file__).resolve().parents[2] / "scripts" / "alpaca_stream_stub.py"
+_spec = importlib.util.spec_from_file_location("alpaca_stream_stub", _STUB)
+stub = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(stub)
+
+
+class _Recorder:
+    """Wraps the server side of a connection, recording what the client sends."""
+
+    def __init__(self, ws, received: list[dict]):
+        self._ws = ws
+        self._received = received
+
+    async def send(self, msg):
+        await self._ws.send(msg)
+
+    async def __aiter__(self):
+        async for raw in self._ws:
+            self._received.append(json.loads(raw))
+            yield raw
+
+
+class _Server:
+    def __init__(self):
+        self.connections: list[list[dict]] = []  # client messages, one list per connection
+        self.sockets: list = []
+        self._server = None
+
+    async def __aenter__(self):
+        async def handler(ws, *_args):
+            received: list[dict] = []
+            self.connections.append(received)
+            self.sockets.append(ws)
+            await stub._serve_client(_Recorder(ws, received), rate=50)
+
+        self._server = await websockets.serve(handler, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._server.close()
+        await self._server.wait_closed()
+
+    @property
+    def url(self) -> str:
+        port = next(iter(self._server.sockets)).getsockname()[1]
+        return f"ws://127.0.0.1:{port}/v2/sip"
+
+    def actions(self, conn: int = -1) -> list[tuple]:
+        return [
+            (m["action"], tuple(m.get("quotes") or ()))
+            for m in self.connections[conn]
+            if m.get("action") != "auth"
+        ]
+
+
+async def _until(pred, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not pred():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def _run(scenario):
+    async def main():
+        async with _Server() as server:
+            stream = AlpacaQuoteStream(server.url, "key", "secret")
+            try:
+                await scenario(server, stream)
+            finally:
+                await stream.aclose()
+
+    asyncio.run(main())
+
+
+def test_auth_handshake_then_quotes():
+    async def scenario(server, stream):
+        ticks = []
+        stream.subscribe("aapl", lambda sym, snap: ticks.append(sym))
+        await _until(lambda: stream.connected and server.actions())
+        assert server.connections[0][0] == {"action": "auth", "key": "key", "secret": "secret"}
+        assert server.actions() == [("subscribe", ("AAPL",))]
+
+        await _until(lambda: ticks)
+        snap = stream.latest("AAPL")
+        assert snap["symbol"] == "AAPL"
+        assert snap["bid_price"] < snap["ask_price"]
+        assert snap["last_price"] is not None
+
+    _run(scenario)
+
+
+def test_rejected_auth_never_subscribes():
+    async def main():
+        async with _Server() as server:
+            stream = AlpacaQuoteStream(server.url, "key", "")
+            try:
+                stream.subscribe("AAPL")
+                await _until(lambda: server.connections)
+                await asyncio.sleep(0.3)
+                assert not stream.connected
+                assert stream.latest("AAPL") is None
+                assert server.actions(0) == []
+            finally:
+                await stream.aclose()
+
+    asyncio.run(main())
+
+
+def test_refcounted_subscriptions():
+    async def scenario(server, stream):
+        first, second = (lambda *_: None), (lambda *_: None)
+        stream.subscribe("AAPL", first)
+        stream.subscribe("AAPL", second)
+        await _until(lambda: stream.connected and server.actions())
+
+        stream.subscribe("AAPL")
+        stream.subscribe("MSFT")
+        await _until(lambda: len(server.actions()) == 2)
+
+        stream.unsubscribe("AAPL", first)
+        stream.unsubscribe("AAPL")
+        await asyncio.sleep(0.1)
+        assert len(server.actions()) == 2
+        assert stream.latest("AAPL") is not None
+
+        stream.unsubscribe("AAPL", second)
+        await _until(lambda: len(server.actions()) == 3)
+        assert stream.latest("AAPL") is None
+        assert stream.symbols == ["MSFT"]
+
+        # Unmatched unsubscribes don't reach upstream either.
+        stream.unsubscribe("AAPL")
+        await asyncio.sleep(0.1)
+        assert server.actions() == [
+            ("subscribe", ("AAPL",)),
+            ("subscribe", ("MSFT",)),
+            ("unsubscribe", ("AAPL",)),
+        ]
+
+    _run(scenario)
+
+
+def test_resubscribes_after_drop():
+    async def scenario(server, stream):
+        stream.subscribe("AAPL")
+        stream.subscribe("MSFT")
+        await _until(lambda: stream.connected and server.actions())
+        assert server.actions() == [("subscribe", ("AAPL", "MSFT"))]
+
+        await server.sockets[0].close()
+        await _until(lambda: not stream.connected)
+        # Changes while disconnected are folded into the resubscribe.
+        stream.unsubscribe("MSFT")
+        stream.subscribe("TSLA")
+
+        await _until(lambda: len(server.connections) == 2 and stream.connected and server.actions())
+        assert server.connections[1][0]["action"] == "auth"
+        assert server.actions() == [("subscribe", ("AAPL", "TSLA"))]
+
+        ticks = []
+        stream.subscribe("TSLA", lambda sym, snap: ticks.append(sym))
+        await _until(lambda: ticks)
+        assert stream.latest("TSLA")["bid_price"] is not None
+
+    _run(scenario)
@@ -0,0 +1,164 @@
+"""Parity of the vectorized Black-Scholes engine with the scalar formulas it replaced, and the IV solver."""
+from __future__ import annotations
+
+import math
+
+import numpy as np
+import pytest
+
+from services.bs import _price_and_vega, bs_greeks, bs_greeks_batch, bs_price_batch, implied_vol_batch, iv_from_price
+from services.normal import norm_cdf
+
+R = 0.053
+
+
+def _norm_pdf(x: float) -> float:
+    return math.exp(-0.5 * x * x) / math.sqrt(2 * math.pi)
+
+
+def _norm_cdf(x: float) -> float:
+    return 0.5 * (1.0 + math.erf(x / math.sqrt(2)))
+
+
+def scalar_greeks(S: float, K: float, T: float, sigma: float, option_type: str, r: float = R) -> dict:
+    """The pre-vectorization ``bs_greeks``, without rounding."""
+    if T <= 0 or S <= 0 or K <= 0 or sigma <= 0:
+        return {"delta": 0.0, "gamma": 0.0, "theta": 0.0, "vega": 0.0}
+    d1 = (math.log(S / K) + (r + 0.5 * sigma**2) * T) / (sigma * math.sqrt(T))
+    d2 = d1 - sigma * math.sqrt(T)
+    pdf_d1 = _norm_pdf(d1)
+    gamma = pdf_d1 / (S * sigma * math.sqrt(T))
+    vega = S * pdf_d1 * math.sqrt(T) / 100
+    if option_type == "call":
+        delta = _norm_cdf(d1)
+        theta = (-(S * pdf_d1 * sigma) / (2 * math.sqrt(T))
+                 - r * K * math.exp(-r * T) * _norm_cdf(d2)) / 365
+    else:
+        delta = _norm_cdf(d1) - 1.0
+        theta = (-(S * pdf_d1 * sigma) / (2 * math.sqrt(T))
+                 + r * K * math.exp(-r * T) * _norm_cdf(-d2)) / 365
+    return {"delta": delta, "gamma": gamma, "theta": theta, "vega": vega}
+
+
+def _assert_parity(S, K, T, sigma, types):
+    got = bs_greeks_batch(S, K, T, sigma, np.array(types) == "call", r=R)
+    for i, args in enumerate(zip(S, K, T, sigma, types)):
+        want = scalar_greeks(*args)
+        for greek, value in want.items():
+            assert got[greek][i] == pytest.approx(value, rel=1e-9, abs=1e-12), (greek, args)
+
+
+def _chain(n: int, seed: int, T_range: tuple[float, float], sigma_range: tuple[float, float]):
+    rng = np.random.default_rng(seed)
+    S = rng.uniform(5, 800, n)
+    K = S * rng.uniform(0.5, 1.5, n)
+    T = rng.uniform(*T_range, n)
+    sigma = rng.uniform(*sigma_range, n)
+    types = np.where(rng.random(n) < 0.5, "call", "put")
+    return S, K, T, sigma, types
+
+
+@pytest.mark.parametrize("option_type", ["call", "put"])
+def test_matches_scalar(option_type):
+    S, K, T, sigma, _ = _chain(2000, 1, (1 / 365, 2.0), (0.05, 2.0))
+    _assert_parity(S, K, T, sigma, [option_type] * len(S))
+
+
+def test_mixed_chain():
+    _assert_parity(*_chain(2000, 2, (1 / 365, 2.0), (0.05, 2.0)))
+
+
+def test_near_expiry():
+    _assert_parity(*_chain(1000, 3, (1e-9, 1e-4), (0.05, 1.0)))
+
+
+def test_near_zero_vol():
+    _assert_parity(*_chain(1000, 4, (1 / 365, 1.0), (1e-6, 1e-3)))
+
+
+def test_degenerate_inputs_are_zero():
+    S = [100.0, 100.0, 0.0, 100.0, 100.0, -1.0]
+    K = [100.0, 100.0, 100.0, 0.0, 100.0, 100.0]
+    T = [0.0, 0.5, 0.5, 0.5, -0.1, 0.5]
+    sigma = [0.2, 0.0, 0.2, 0.2, 0.2, 0.2]
+    for types in (["call"] * 6, ["put"] * 6):
+        _assert_parity(S, K, T, sigma, types)
+
+
+def test_scalar_wrapper_rounds_like_before():
+    S, K, T, sigma, types = _chain(500, 5, (1 / 365, 2.0), (0.05, 2.0))
+    for args in zip(S.tolist(), K.tolist(), T.tolist(), sigma.tolist(), types.tolist()):
+        s, k, t, v, kind = args
+        want = scalar_greeks(s, k, t, v, kind)
+        got = bs_greeks(s, k, t, sigma=v, option_type=kind)
+        for greek, digits in (("delta", 4), ("gamma", 6), ("theta", 4), ("vega", 4)):
+            assert got[greek] == pytest.approx(round(want[greek], digits), abs=10 ** -digits), (greek, args)
+
+
+def test_norm_cdf_matches_erf():
+    x = np.concatenate([np.linspace(-40, 40, 200001), [0.0, -0.0, np.inf, -np.inf]])
+    want = np.array([0.5 * math.erfc(-v / math.sqrt(2)) for v in x])
+    np.testing.assert_allclose(norm_cdf(x), want, rtol=1e-14, atol=1e-16)
+    assert np.isnan(norm_cdf(np.nan))
+
+
+def test_iv_round_trip():
+    m, T, sigma, call = (a.ravel() for a in np.meshgrid(
+        np.linspace(0.7, 1.3, 13), [7 / 365, 30 / 365, 0.25, 1.0, 2.0],
+        [0.1, 0.3, 0.6, 1.0, 1.5], [True, False], indexing="ij",
+    ))
+    S = np.full(m.size, 100.0)
+    K = S * m
+    price = bs_price_batch(S, K, T, sigma, call, R)
+    _, vega = _price_and_vega(S, K, T, sigma, call, R)
+    # At the price tolerance sigma is only pinned down where the price moves with it.
+    keep = vega > 1e-2
+    S, K, T, sigma, call, price, vega = (a[keep] for a in (S, K, T, sigma, call, price, vega))
+    assert keep.sum() > 500
+
+    tol = 1e-5
+    res = implied_vol_batch(price, S, K, T, call, r=R, tol=tol)
+    assert res["in_bounds"].all()
+    assert res["converged"].all()
+    np.testing.assert_array_less(np.abs(res["iv"] - sigma), 2 * tol / vega)
+    np.testing.assert_array_less(np.abs(bs_price_batch(S, K, T, res["iv"], call, R) - price), 2 * tol)
+
+
+def test_iv_out_of_bounds_is_not_solved():
+    S = np.full(6, 100.0)
+    K = np.array([100.0, 80.0, 120.0, 100.0, 100.0, 100.0])
+    T = np.array([0.5, 0.5, 0.5, 0.5, 0.0, 0.5])
+    # Above the spot, below intrinsic (call, put), zero, expired, negative.
+    price = np.array([100.5, 19.0, 16.0, 0.0, 5.0, -1.0])
+    call = np.array([True, True, False, True, True, True])
+    res = implied_vol_batch(price, S, K, T, call, r=R)
+    assert not res["in_bounds"].any()
+    assert not res["converged"].any()
+    assert np.isnan(res["iv"]).all()
+    assert (res["iterations"] == 0).all()
+
+
+def test_iv_low_vega_falls_back_to_bisection():
+    # Deep OTM at high vol: the starting guess is so low that vega there is
+    # nil, so Newton hands these to bisection after its first step.
+    S = np.full(4, 100.0)
+    K = np.array([200.0, 300.0, 40.0, 20.0])
+    T = np.array([0.25, 1.0, 0.25, 1.0])
+    sigma = np.array([1.0, 0.8, 1.2, 1.5])
+    call = np.array([True, True, False, False])
+    price = bs_price_batch(S, K, T, sigma, call, R)
+
+    res = implied_vol_batch(price, S, K, T, call, r=R)
+    bisect_only = implied_vol_batch(price, S, K, T, call, r=R, newton_iter=0)
+    assert res["converged"].all()
+    np.testing.assert_array_equal(res["iv"], bisect_only["iv"])
+    np.testing.assert_array_equal(res["iterations"], bisect_only["iterations"] + 1)
+    np.testing.assert_allclose(res["iv"], sigma, atol=1e-4)
+
+
+def test_iv_from_price_defaults_when_unsolved():
+    # Out of bounds, and in bounds but beyond sigma_hi.
+    assert iv_from_price(120.0, 100.0, 100.0, 0.5) == 0.20
+    assert iv_from_price(99.0, 100.0, 100.0, 0.1) == 0.20
+    price = float(bs_price_batch(100.0, 105.0, 0.5, 0.37, True, 0.053))
+    assert iv_from_price(price, 100.0, 105.0, 0.5) == 0.37
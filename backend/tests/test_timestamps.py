@@ -0,0 +1,60 @@
+"""The batch parser must agree with the scalar one, including on what it rejects."""
+from __future__ import annotations
+
+import random
+from datetime import datetime, timedelta, timezone
+
+import timestamps
+
+STAMPS = [
+    "2024-01-02T14:30:00Z",
+    "2024-01-02T14:30:00.123Z",
+    "2024-01-02T14:30:00.123456789Z",
+    "2024-01-02T09:30:00-05:00",
+    "2024-01-02T20:00:00.5+05:30",
+    "2024-02-29T00:00:00Z",
+    "2000-02-29T23:59:59Z",
+    "1970-01-01T00:00:00Z",
+    # Out-of-range fields.
+    "2024-02-30T00:00:00Z",
+    "2024-02-31T00:00:00Z",
+    "2023-02-29T00:00:00Z",
+    "1900-02-29T00:00:00Z",
+    "2024-04-31T00:00:00Z",
+    "2024-13-01T00:00:00Z",
+    "2024-00-10T00:00:00Z",
+    "2024-01-00T00:00:00Z",
+    "0000-01-01T00:00:00Z",
+    "2024-01-02T25:00:00Z",
+    "2024-01-02T24:00:00Z",
+    "2024-01-02T12:60:00Z",
+    "2024-01-02T12:00:60Z",
+    # Layout problems and non-strings.
+    "2024-01-02T14:30:00",
+    "2024-01-02T14:30:00.Z",
+    "2024-01-02 14:30:00Z",
+    "garbage",
+    "",
+    None,
+    1704205800,
+    1704205800.25,
+]
+
+
+def test_batch_matches_scalar():
+    got = timestamps.parse_many_ns(STAMPS).tolist()
+    want = [timestamps.parse_ns(v) for v in STAMPS]
+    assert got == [timestamps.INVALID if w is None else w for w in want]
+
+
+def test_random_valid_stamps():
+    rng = random.Random(0)
+    base = datetime(1990, 1, 1, tzinfo=timezone.utc)
+    values = []
+    for _ in range(2000):
+        t = base + timedelta(seconds=rng.randrange(60 * 365 * 86400))
+        stamp = t.strftime("%Y-%m-%dT%H:%M:%S")
+        if rng.random() < 0.5:
+            stamp += "." + str(rng.randrange(10**9)).zfill(9)[: rng.randint(1, 9)]
+        values.append(stamp + rng.choice(["Z", "+00:00", "-04:00", "+09:30"]))
+    assert timestamps.parse_many_ns(values).tolist() == [timestamps.parse_ns(v) for v in values]
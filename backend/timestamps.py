@@ -0,0 +1,180 @@
+"""
+Fast parsing of provider timestamps.
+
+Providers send RFC 3339 stamps in a fixed layout: ``2024-01-02T14:30:00Z``,
+optionally with up to nine fraction digits and/or a ``+HH:MM`` offset
+instead of ``Z``. ``parse_ns``/``parse`` read one value at fixed
+positions; the date part goes through a small cache, since a batch of bars
+or trades shares only a handful of dates. ``parse_many_ns``/``parse_many``
+parse a whole batch into an int64 array with NumPy. Anything outside the
+fixed layout falls back to ``datetime.fromisoformat``.
+
+Numbers (and numeric strings) are taken as epoch seconds.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import Any, Sequence
+
+import numpy as np
+
+# Marks unparseable values in int64 results.
+INVALID = np.iinfo(np.int64).min
+
+_NS = 1_000_000_000
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_DAY_CACHE_MAX = 4096
+_days: dict[str, int] = {}
+
+# Longest fixed-layout stamp: 19 + "." + 9 digits + "+HH:MM".
+_WIDTH = 35
+_DATE_DIGITS = np.array([0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18])
+_FRAC_SCALE = 10 ** np.arange(8, -1, -1, dtype=np.int64)
+_MONTH_DAYS = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+def _day_sec(prefix: str) -> int:
+    """Epoch seconds at 00:00 UTC of a ``YYYY-MM-DD`` prefix."""
+    sec = _days.get(prefix)
+    if sec is None:
+        if len(_days) >= _DAY_CACHE_MAX:
+            _days.clear()
+        sec = _days[prefix] = (date.fromisoformat(prefix).toordinal() - _EPOCH_ORDINAL) * 86400
+    return sec
+
+
+def _fixed_ns(s: str) -> int | None:
+    if len(s) < 20 or s[10] != "T":
+        return None
+    t = datetime.fromisoformat(s[:19])  # C parser; validates the layout
+    sec = _day_sec(s[:10]) + t.hour * 3600 + t.minute * 60 + t.second
+    rest = s[19:]
+    off = 0
+    if rest[-1] == "Z":
+        rest = rest[:-1]
+    elif len(rest) >= 6 and rest[-6] in "+-" and rest[-3] == ":":
+        off = int(rest[-5:-3]) * 3600 + int(rest[-2:]) * 60
+        if rest[-6] == "-":
+            off = -off
+        rest = rest[:-6]
+    else:
+        return None
+    frac = 0
+    if rest:
+        if rest[0] != "." or not rest[1:].isdigit():
+            return None
+        frac = int(rest[1:10].ljust(9, "0"))
+    return (sec - off) * _NS + frac
+
+
+def _slow_ns(s: str) -> int | None:
+    # fromisoformat before 3.11 takes neither "Z" nor more than 6 fraction digits.
+    if s.endswith("Z"):
+        s = s[:-1] + "+00:00"
+    frac_ns = 0
+    if "." in s:
+        head, rest = s.split(".", 1)
+        i = next((i for i, ch in enumerate(rest) if not ch.isdigit()), len(rest))
+        digits, tz_part = rest[:i], rest[i:]
+        frac_ns = int(digits[:9].ljust(9, "0")) if digits else 0
+        s = head + tz_part
+    return int(datetime.fromisoformat(s).timestamp()) * _NS + frac_ns
+
+
+def parse_ns(value: Any) -> int | None:
+    """Epoch nanoseconds of a timestamp (or epoch-seconds number), None if unparseable."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value * _NS) if isinstance(value, float) else value * _NS
+    s = str(value).strip()
+    if not s:
+        return None
+    try:
+        if s[4:5] == "-":
+            ns = _fixed_ns(s)
+            return ns if ns is not None else _slow_ns(s)
+        return int(float(s) * _NS)
+    except (ValueError, IndexError, OverflowError):
+        return None
+
+
+def parse(value: Any) -> int | None:
+    """Epoch seconds of a timestamp (or epoch-seconds number), None if unparseable."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    ns = parse_ns(value)
+    return None if ns is None else ns // _NS
+
+
+def _days_from_civil(y: np.ndarray, m: np.ndarray, d: np.ndarray) -> np.ndarray:
+    # Howard Hinnant's algorithm, proleptic Gregorian.
+    y = y - (m <= 2)
+    era = np.floor_divide(y, 400)
+    yoe = y - era * 400
+    doy = (153 * (m + np.where(m > 2, -3, 9)) + 2) // 5 + d - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def parse_many_ns(values: Sequence[Any]) -> np.ndarray:
+    """Epoch nanoseconds for a batch; unparseable entries are ``INVALID``."""
+    n = len(values)
+    out = np.full(n, INVALID, dtype=np.int64)
+    if not n:
+        return out
+    strs = [v if type(v) is str else "" for v in values]
+    lens = np.fromiter(map(len, strs), dtype=np.int64, count=n)
+    # One row of UCS-4 code points per value (longer values are truncated and rejected).
+    c = np.array(strs, dtype=f"U{_WIDTH}").view(np.uint32).reshape(n, _WIDTH).astype(np.int64)
+    d = c - 48
+    digit = (d >= 0) & (d <= 9)
+    ok = (
+        (lens >= 20) & (lens <= _WIDTH)
+        & (c[:, 4] == 45) & (c[:, 7] == 45) & (c[:, 10] == 84) & (c[:, 13] == 58) & (c[:, 16] == 58)
+        & digit[:, _DATE_DIGITS].all(axis=1)
+    )
+    if ok.any():
+        rows = np.arange(n)
+        year = d[:, 0] * 1000 + d[:, 1] * 100 + d[:, 2] * 10 + d[:, 3]
+        month = d[:, 5] * 10 + d[:, 6]
+        day = d[:, 8] * 10 + d[:, 9]
+        hour = d[:, 11] * 10 + d[:, 12]
+        minute = d[:, 14] * 10 + d[:, 15]
+        second = d[:, 17] * 10 + d[:, 18]
+        sec = _days_from_civil(year, month, day) * 86400 + hour * 3600 + minute * 60 + second
+        # Same ranges the scalar path's fromisoformat enforces.
+        leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+        month_days = _MONTH_DAYS[np.clip(month, 0, 12)] + ((month == 2) & leap)
+        valid = (
+            (year >= 1) & (month >= 1) & (month <= 12) & (day >= 1) & (day <= month_days)
+            & (hour <= 23) & (minute <= 59) & (second <= 59)
+        )
+        dot = c[:, 19] == 46
+        run = np.cumprod(digit[:, 20:29], axis=1).astype(bool) & dot[:, None]
+        nfrac = run.sum(axis=1)
+        frac = (np.where(run, d[:, 20:29], 0) * _FRAC_SCALE).sum(axis=1)
+        tz = np.where(dot, 20 + nfrac, 19)
+        tz_c = c[rows, np.minimum(tz, _WIDTH - 1)]
+        zulu = (tz_c == 90) & (lens == tz + 1)
+        hh = np.minimum(tz + 1, _WIDTH - 5)
+        offset = (
+            ((tz_c == 43) | (tz_c == 45)) & (lens == tz + 6)
+            & (c[rows, hh + 2] == 58)
+            & digit[rows, hh] & digit[rows, hh + 1] & digit[rows, hh + 3] & digit[rows, hh + 4]
+        )
+        off = ((d[rows, hh] * 10 + d[rows, hh + 1]) * 3600 + (d[rows, hh + 3] * 10 + d[rows, hh + 4]) * 60)
+        off = np.where(tz_c == 45, -off, off) * offset
+        ok &= (zulu | offset) & valid & (~dot | (nfrac > 0))
+        out[ok] = (sec[ok] - off[ok]) * _NS + frac[ok]
+    for i in np.flatnonzero(~ok).tolist():
+        ns = parse_ns(values[i])
+        if ns is not None:
+            out[i] = ns
+    return out
+
+
+def parse_many(values: Sequence[Any]) -> np.ndarray:
+    """Epoch seconds for a batch; unparseable entries are ``INVALID``."""
+    ns = parse_many_ns(values)
+    return np.where(ns == INVALID, INVALID, ns // _NS)
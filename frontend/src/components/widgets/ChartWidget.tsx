@@ -5,6 +5,7 @@ import { SlidersHorizontal, Settings2, CircleHelp, X, GripHorizontal, Clock3 } f
 import { useDashboardStore } from "@/lib/store/dashboardStore";
 import { AppColorPicker } from "@/components/ui/AppColorPicker";
 import { AppDropdown } from "@/components/ui/AppDropdown";
+import { subscribeStream } from "@/lib/stream";
 
 const API = process.env.NEXT_PUBLIC_API_URL || "";
 
@@ -156,7 +157,6 @@ export function ChartWidget({
   const symRef = useRef<HTMLDivElement>(null);
   const tfRef = useRef<HTMLDivElement>(null);
   const pollRef      = useRef<ReturnType<typeof setInterval> | null>(null);
-  const wsRef        = useRef<WebSocket | null>(null);
   const loadFullRef  = useRef<any>(null);
   const pollUpdateRef = useRef<any>(null);
 
@@ -777,70 +777,42 @@ export function ChartWidget({
   // WebSocket — live price overlay (updates lastPrice + last bar close in real time)
   useEffect(() => {
     if (typeof window === "undefined") return;
-    const wsBase = (API && API.trim())
-      ? API.replace(/^http/, "ws")
-      : window.location.origin.replace(/^http/, "ws");
-    let ws: WebSocket;
-    let closed = false;
-
-    const connect = () => {
-      if (closed) return;
-      ws = new WebSocket(`${wsBase}/api/ws/quotes/${symbol}`);
-      wsRef.current = ws;
-
-      ws.onmessage = (ev) => {
-        try {
-          const data = JSON.parse(ev.data);
-          if (data.ping || !data.price) return;
-          const price = parseFloat(data.price);
-          if (!isFinite(price)) return;
-
-          setLastPrice(price);
-          setIsLive(true);
-
-          // Update latest bar; if stale, start a new current-time bucket so chart stays current.
-          if (seriesRef.current && cacheRef.current.size > 0) {
-            const times = Array.from(cacheRef.current.keys()).sort((a, b) => a - b);
-            const lastTime = times[times.length - 1];
-            const lastBar = cacheRef.current.get(lastTime)!;
-
-            const updated: Bar = {
-              ...lastBar,
-              close: price,
-              high: Math.max(lastBar.high, price),
-              low: Math.min(lastBar.low, price),
-            };
-
-            cacheRef.current.set(lastTime, updated);
-            seriesRef.current.update(updated);
-            const bull = theme.bull || getComputedStyle(document.documentElement).getPropertyValue("--bull").trim();
-            const bear = theme.bear || getComputedStyle(document.documentElement).getPropertyValue("--bear").trim();
-            volumeRef.current?.update({
-              time: updated.time,
-              value: updated.volume || 0,
-              color: updated.close >= updated.open ? toRgba(bull, 0.5) : toRgba(bear, 0.5),
-            });
-            setBarStatus(`O ${updated.open.toFixed(2)} H ${updated.high.toFixed(2)} L ${updated.low.toFixed(2)} C ${updated.close.toFixed(2)} V ${Math.round(updated.volume || 0).toLocaleString()}`);
-          }
-        } catch { /* ignore parse errors */ }
-      };
-
-      ws.onclose = () => {
-        wsRef.current = null;
-        // Reconnect after 3s unless component unmounted
-        if (!closed) setTimeout(connect, 3000);
-      };
-
-      ws.onerror = () => ws.close();
-    };
-
-    connect();
 
-    return () => {
-      closed = true;
-      wsRef.current?.close();
-      wsRef.current = null;
-    };
+    return subscribeStream({ channel: "quote", symbol }, (data) => {
+      try {
+        if (!data?.price) return;
+        const price = parseFloat(data.price);
+        if (!isFinite(price)) return;
+
+        setLastPrice(price);
+        setIsLive(true);
+
+        // Update latest bar; if stale, start a new current-time bucket so chart stays current.
+        if (seriesRef.current && cacheRef.current.size > 0) {
+          const times = Array.from(cacheRef.current.keys()).sort((a, b) => a - b);
+          const lastTime = times[times.length - 1];
+          const lastBar = cacheRef.current.get(lastTime)!;
+
+          const updated: Bar = {
+            ...lastBar,
+            close: price,
+            high: Math.max(lastBar.high, price),
+            low: Math.min(lastBar.low, price),
+          };
+
+          cacheRef.current.set(lastTime, updated);
+          seriesRef.current.update(updated);
+          const bull = theme.bull || getComputedStyle(document.documentElement).getPropertyValue("--bull").trim();
+          const bear = theme.bear || getComputedStyle(document.documentElement).getPropertyValue("--bear").trim();
+          volumeRef.current?.update({
+            time: updated.time,
+            value: updated.volume || 0,
+            color: updated.close >= updated.open ? toRgba(bull, 0.5) : toRgba(bear, 0.5),
+          });
+          setBarStatus(`O ${updated.open.toFixed(2)} H ${updated.high.toFixed(2)} L ${updated.low.toFixed(2)} C ${updated.close.toFixed(2)} V ${Math.round(updated.volume || 0).toLocaleString()}`);
+        }
+      } catch { /* ignore malformed updates */ }
+    });
   }, [symbol, theme.bull, theme.bear, drawIndicators]);
 
   const submitSymbol = (e: React.FormEvent) => {
@@ -1,12 +1,12 @@
 "use client";
 
-import React, { useEffect, useMemo, useRef, useState } from "react";
+import React, { useEffect, useMemo, useState } from "react";
 import { ResponsiveContainer, ScatterChart, Scatter, XAxis, YAxis, ZAxis, Tooltip, BarChart, Bar, Cell } from "recharts";
 import { SymbolBar } from "./SymbolBar";
 import { SkeletonBars, SkeletonBubbles } from "./WidgetSkeletons";
 import { useDashboardStore } from "@/lib/store/dashboardStore";
+import { subscribeStream } from "@/lib/stream";
 
-const API = process.env.NEXT_PUBLIC_API_URL || "";
 const WINDOW_SEC = 300;
 
 type StreamBucket = {
@@ -45,62 +45,49 @@ export function OrderFlowWidget({ symbol = "SPY", isGlobalOverride, onConfigChan
   const [points, setPoints] = useState<BubblePoint[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(false);
-  const wsRef = useRef<WebSocket | null>(null);
 
   useEffect(() => {
-    let closed = false;
     setLoading(true);
     setError(false);
     setSeries([]);
     setPoints([]);
 
-    const wsBase = (API && API.trim()) ? API.replace(/^http/, "ws") : window.location.origin.replace(/^http/, "ws");
-    const connect = () => {
-      if (closed) return;
-      const ws = new WebSocket(`${wsBase}/api/ws/orderflow/${symbol}`);
-      wsRef.current = ws;
+    // Snapshots replace the bucket set; deltas upsert buckets and drop evicted seconds.
+    const buckets = new Map<number, any>();
+    const unsubscribe = subscribeStream({ channel: "orderflow", symbol }, (d) => {
+      try {
+        if (d?.type !== "orderflow" || !Array.isArray(d?.buckets)) return;
 
-      ws.onmessage = (ev) => {
-        try {
-          const d = JSON.parse(ev.data);
-          if (d?.ping) return;
-          if (d?.type !== "orderflow" || !Array.isArray(d?.buckets)) return;
-
-          const next = (d.buckets as any[])
-            .map((b) => ({
-              sec: Number(b?.sec || 0),
-              buy: Number(b?.buy || 0),
-              sell: Number(b?.sell || 0),
-              vol: Number(b?.vol || (Number(b?.buy || 0) + Number(b?.sell || 0))),
-              price: Number(b?.price || 0),
-              imbalance: Number(b?.imbalance || 0),
-            }))
-            .filter((b) => b.sec > 0 && b.vol > 0 && b.price > 0)
-            .sort((a, b) => a.sec - b.sec)
-            .slice(-WINDOW_SEC);
-
-          setSeries(next);
-          setLoading(false);
-          setError(false);
-        } catch {
-          setError(true);
-          setLoading(false);
+        if (d.kind !== "delta") buckets.clear();
+        for (const sec of (d.evicted || []) as number[]) buckets.delete(Number(sec));
+        for (const b of d.buckets as any[]) {
+          const sec = Number(b?.sec || 0);
+          if (sec > 0) buckets.set(sec, b);
         }
-      };
 
-      ws.onclose = () => {
-        wsRef.current = null;
-        if (!closed) setTimeout(connect, 1000);
-      };
-      ws.onerror = () => ws.close();
-    };
+        const next = Array.from(buckets.values())
+          .map((b: any) => ({
+            sec: Number(b?.sec || 0),
+            buy: Number(b?.buy || 0),
+            sell: Number(b?.sell || 0),
+            vol: Number(b?.vol || (Number(b?.buy || 0) + Number(b?.sell || 0))),
+            price: Number(b?.price || 0),
+            imbalance: Number(b?.imbalance || 0),
+          }))
+          .filter((b) => b.sec > 0 && b.vol > 0 && b.price > 0)
+          .sort((a, b) => a.sec - b.sec)
+          .slice(-WINDOW_SEC);
 
-    connect();
-    return () => {
-      closed = true;
-      wsRef.current?.close();
-      wsRef.current = null;
-    };
+        setSeries(next);
+        setLoading(false);
+        setError(false);
+      } catch {
+        setError(true);
+        setLoading(false);
+      }
+    });
+
+    return unsubscribe;
   }, [symbol]);
 
   // Retarget points whenever new stream data arrives.
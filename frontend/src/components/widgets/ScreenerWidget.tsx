@@ -5,6 +5,7 @@ import { Plus, X } from "lucide-react";
 import { useDashboardStore } from "@/lib/store/dashboardStore";
 import { AppDropdown } from "@/components/ui/AppDropdown";
 import { SkeletonTable } from "./WidgetSkeletons";
+import { subscribeStream } from "@/lib/stream";
 
 const API = process.env.NEXT_PUBLIC_API_URL || "";
 
@@ -183,24 +184,15 @@ export function ScreenerWidget() {
 
   useEffect(() => {
     if (!rows.length || typeof window === "undefined") return;
-    const wsBase = (API && API.trim()) ? API.replace(/^http/, "ws") : window.location.origin.replace(/^http/, "ws");
-    const ws = new WebSocket(`${wsBase}/api/ws/screener`);
-    ws.onopen = () => {
-      ws.send(JSON.stringify({ symbols: rows.map(r => r.symbol) }));
-    };
-    ws.onmessage = (ev) => {
-      try {
-        const d = JSON.parse(ev.data);
-        if (d?.type !== "screener" || !Array.isArray(d?.items)) return;
-        const map = new Map<string, any>((d.items || []).map((x: any) => [String(x.s), x]));
-        setRows(prev => prev.map(r => {
-          const x = map.get(r.symbol);
-          if (!x) return r;
-          return { ...r, price: Number(x.p || r.price), relVol: Number(x.rv || r.relVol), c1d: Number(x.c1d || r.c1d) };
-        }));
-      } catch {}
-    };
-    return () => ws.close();
+    return subscribeStream({ channel: "screener", symbols: rows.map(r => r.symbol) }, (d) => {
+      if (d?.type !== "screener" || !Array.isArray(d?.items)) return;
+      const map = new Map<string, any>((d.items || []).map((x: any) => [String(x.s), x]));
+      setRows(prev => prev.map(r => {
+        const x = map.get(r.symbol);
+        if (!x) return r;
+        return { ...r, price: Number(x.p || r.price), relVol: Number(x.rv || r.relVol), c1d: Number(x.c1d || r.c1d) };
+      }));
+    });
   }, [rows.map(r => r.symbol).join(",")]);
 
   const sectors = useMemo(() => Array.from(new Set(rows.map((r) => r.sector))).sort(), [rows]);
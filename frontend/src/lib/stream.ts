@@ -0,0 +1,139 @@
+/**
+ * Shared client for the multiplexed `/api/ws/stream` socket.
+ *
+ * Every widget subscribes through here, so a tab holds one socket no matter
+ * how many widgets are open. Subscriptions are reference-counted by their
+ * parameters and replayed after a reconnect.
+ *
+ * Delta-encoded topics (messages with `kind: "snapshot" | "delta"` and a
+ * `seq`) are sequence-checked here: listeners only see a delta that follows
+ * the previous message, and a gap triggers a snapshot re-request. A listener
+ * joining a topic that is already live also triggers one, so it starts from
+ * the full state; the other listeners on that topic see it too.
+ */
+
+const BASE = process.env.NEXT_PUBLIC_API_URL || "";
+
+export type StreamChannel = "quote" | "orderflow" | "screener" | "exposure";
+
+export interface StreamParams {
+  channel: StreamChannel;
+  symbol?: string;
+  symbols?: string[];
+  expirations?: string[];
+}
+
+type Listener = (msg: any) => void;
+
+interface Entry {
+  params: StreamParams;
+  topic: string | null;
+  seq: number | null; // last applied sequence number for delta topics
+  resyncing: boolean;
+  listeners: Set<Listener>;
+}
+
+const entries = new Map<string, Entry>();
+const pending = new Map<number, string>(); // request id -> entry key
+let ws: WebSocket | null = null;
+let nextId = 1;
+let reconnectTimer: ReturnType<typeof setTimeout> | null = null;
+
+const keyOf = (p: StreamParams) => JSON.stringify([p.channel, p.symbol?.toUpperCase() ?? "", p.symbols ?? [], p.expirations ?? []]);
+
+function wsUrl() {
+  const base = (BASE && BASE.trim()) ? BASE : window.location.origin;
+  return `${base.replace(/^http/, "ws")}/api/ws/stream`;
+}
+
+function send(msg: object) {
+  if (ws && ws.readyState === WebSocket.OPEN) ws.send(JSON.stringify(msg));
+}
+
+function sendSubscribe(key: string, entry: Entry) {
+  const id = nextId++;
+  pending.set(id, key);
+  send({ op: "subscribe", id, ...entry.params });
+}
+
+function connect() {
+  if (ws || typeof window === "undefined" || entries.size === 0) return;
+  const sock = new WebSocket(wsUrl());
+  ws = sock;
+
+  sock.onopen = () => {
+    pending.clear();
+    entries.forEach((entry, key) => sendSubscribe(key, entry));
+  };
+
+  sock.onmessage = (ev) => {
+    let msg: any;
+    try { msg = JSON.parse(ev.data); } catch { return; }
+    if (!msg || msg.ping) return;
+    if (msg.type === "subscribed") {
+      const key = pending.get(msg.id);
+      pending.delete(msg.id);
+      const entry = key ? entries.get(key) : undefined;
+      if (entry) entry.topic = msg.topic;
+      else send({ op: "unsubscribe", topic: msg.topic }); // released while in flight
+      return;
+    }
+    if (msg.type === "unsubscribed" || msg.type === "error") return;
+    entries.forEach((entry) => {
+      if (!entry.topic || entry.topic !== msg.topic) return;
+      if (msg.kind === "snapshot") {
+        entry.seq = msg.seq;
+        entry.resyncing = false;
+      } else if (msg.kind === "delta") {
+        if (entry.seq !== null && msg.seq <= entry.seq) return; // already covered by a snapshot
+        if (entry.seq === null || msg.seq !== entry.seq + 1) {
+          entry.seq = null;
+          if (!entry.resyncing) send({ op: "snapshot", topic: entry.topic });
+          entry.resyncing = true;
+          return;
+        }
+        entry.seq = msg.seq;
+      }
+      entry.listeners.forEach((fn) => fn(msg));
+    });
+  };
+
+  sock.onclose = () => {
+    if (ws === sock) ws = null;
+    entries.forEach((entry) => { entry.topic = null; entry.seq = null; entry.resyncing = false; });
+    if (entries.size && !reconnectTimer) {
+      reconnectTimer = setTimeout(() => { reconnectTimer = null; connect(); }, 1000);
+    }
+  };
+  sock.onerror = () => sock.close();
+}
+
+/** Subscribe to a stream; returns the unsubscribe function. */
+export function subscribeStream(params: StreamParams, listener: Listener): () => void {
+  const key = keyOf(params);
+  let entry = entries.get(key);
+  if (!entry) {
+    entry = { params, topic: null, seq: null, resyncing: false, listeners: new Set() };
+    entries.set(key, entry);
+    if (ws) sendSubscribe(key, entry);
+    else connect();
+  } else if (entry.topic) {
+    // The server only sends state on subscribe; ask again so this listener
+    // doesn't start from deltas (or, for quotes, from nothing until a change).
+    send({ op: "snapshot", topic: entry.topic });
+  }
+  entry.listeners.add(listener);
+
+  return () => {
+    const e = entries.get(key);
+    if (!e) return;
+    e.listeners.delete(listener);
+    if (e.listeners.size) return;
+    entries.delete(key);
+    if (e.topic) send({ op: "unsubscribe", topic: e.topic });
+    if (!entries.size && ws) {
+      ws.close();
+      ws = null;
+    }
+  };
+}
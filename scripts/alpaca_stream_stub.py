@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for Alpaca's market-data WebSocket.
+
+Speaks the same auth/subscribe protocol and emits random-walk quotes and
+trades for every subscribed symbol, so the streaming ingest can be
+exercised without credentials or market hours:
+
+    python scripts/alpaca_stream_stub.py --port 8765
+    ALPACA_STREAM_URL=ws://127.0.0.1:8765/v2 uvicorn main:app
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+from datetime import datetime, timezone
+
+import websockets
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+async def _serve_client(ws, *_args, rate: float):
+    await ws.send(json.dumps([{"T": "success", "msg": "connected"}]))
+    subs: set[str] = set()
+    prices: dict[str, float] = {}
+    authed = False
+
+    async def emit():
+        while True:
+            await asyncio.sleep(1 / rate)
+            out = []
+            for sym in list(subs):
+                px = prices.setdefault(sym, random.uniform(50, 500))
+                px = max(1.0, px * (1 + random.gauss(0, 0.0005)))
+                prices[sym] = px
+                spread = max(0.01, round(px * 0.0001, 2))
+                out.append({"T": "q", "S": sym, "bp": round(px - spread, 2), "ap": round(px + spread, 2),
+                            "bs": random.randint(1, 9), "as": random.randint(1, 9), "t": _now()})
+                out.append({"T": "t", "S": sym, "p": round(px, 2), "s": random.randint(1, 500),
+                            "c": random.choice([["@"], ["@", "T"], ["I"]]), "t": _now()})
+            if out:
+                await ws.send(json.dumps(out))
+
+    emitter = asyncio.create_task(emit())
+    try:
+        async for raw in ws:
+            msg = json.loads(raw)
+            action = msg.get("action")
+            if action == "auth":
+                authed = bool(msg.get("key")) and bool(msg.get("secret"))
+                reply = {"T": "success", "msg": "authenticated"} if authed else {"T": "error", "code": 402, "msg": "auth failed"}
+                await ws.send(json.dumps([reply]))
+            elif not authed:
+                await ws.send(json.dumps([{"T": "error", "code": 401, "msg": "not authenticated"}]))
+            elif action in ("subscribe", "unsubscribe"):
+                syms = {str(s).upper() for s in (msg.get("quotes") or []) + (msg.get("trades") or [])}
+                if action == "subscribe":
+                    subs |= syms
+                else:
+                    subs -= syms
+                await ws.send(json.dumps([{"T": "subscription", "trades": sorted(subs), "quotes": sorted(subs)}]))
+    except websockets.ConnectionClosed:
+        pass
+    finally:
+        emitter.cancel()
+
+
+async def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--rate", type=float, default=10.0, help="ticks per second per symbol")
+    args = ap.parse_args()
+
+    async def handler(ws, *rest):
+        await _serve_client(ws, *rest, rate=args.rate)
+
+    async with websockets.serve(handler, args.host, args.port):
+        print(f"alpaca stream stub on ws://{args.host}:{args.port}/v2/<feed>")
+        await asyncio.Future()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Compare wire encodings on history and options-chain payloads.
+
+By default payloads are pulled from a running backend, so the numbers
+reflect real data:
+
+    python scripts/bench_encoding.py --api http://localhost:8000 --symbol SPY
+
+``--synthetic`` builds payloads of the same shape (5000 one-minute bars and
+a 4000-contract chain) for use without a provider.
+
+Encoders compared:
+  fastapi   jsonable_encoder + stdlib json (FastAPI's default response path)
+  json      stdlib json.dumps only
+  orjson    encoding.dumps (the FastResponse default)
+  msgpack   encoding.packb (Accept: application/msgpack / WS subprotocol)
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import encoding  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+
+def _fetch(api: str, symbol: str) -> dict[str, object]:
+    import httpx
+
+    with httpx.Client(base_url=api, timeout=60.0) as c:
+        history = c.get(f"/api/market/history/{symbol}", params={"timeframe": "1Min", "limit": 5000, "latest": "now"})
+        chain = c.get(f"/api/market/options/{symbol}")
+        history.raise_for_status()
+        chain.raise_for_status()
+        return {"history(5000x1Min)": history.json(), f"chain({len(chain.json())})": chain.json()}
+
+
+def _synthetic(symbol: str) -> dict[str, object]:
+    rnd = random.Random(7)
+    ts, px, bars = 1_700_000_000, 450.0, []
+    for _ in range(5000):
+        o = px
+        px = max(1.0, px + rnd.gauss(0, 0.2))
+        bars.append({"ts": ts, "o": round(o, 2), "h": round(max(o, px) + rnd.random() * 0.1, 2),
+                     "l": round(min(o, px) - rnd.random() * 0.1, 2), "c": round(px, 2), "v": rnd.randint(100, 90_000)})
+        ts += 60
+    chain = []
+    for i in range(4000):
+        strike = 300 + (i // 2) % 300
+        kind = "call" if i % 2 else "put"
+        chain.append({
+            "symbol": f"{symbol}261017{kind[0].upper()}{strike * 1000:08d}", "strike_price": float(strike),
+            "expiration_date": "2026-10-17", "option_type": kind,
+            "bid_price": round(rnd.uniform(0, 20), 2), "ask_price": round(rnd.uniform(0, 20), 2),
+            "mark_price": round(rnd.uniform(0, 20), 2), "delta": round(rnd.uniform(-1, 1), 4),
+            "gamma": round(rnd.random() / 50, 6), "theta": round(-rnd.random(), 4), "vega": round(rnd.random(), 4),
+            "open_interest": float(rnd.randint(0, 20_000)), "implied_volatility": round(rnd.uniform(0.1, 0.9), 4),
+            "volume": float(rnd.randint(0, 5000)),
+        })
+    return {"history(5000x1Min)": {"s": symbol, "tf": "1Min", "b": bars}, "chain(4000)": chain}
+
+
+def _encoders():
+    out = {
+        "fastapi": lambda p: json.dumps(jsonable_encoder(p), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode(),
+        "json": lambda p: json.dumps(p, ensure_ascii=False, separators=(",", ":")).encode(),
+    }
+    if encoding.orjson is not None:
+        out["orjson"] = encoding.dumps
+    if encoding.msgpack_available():
+        out["msgpack"] = encoding.packb
+    return out
+
+
+def _time(fn, payload, rounds: int) -> float:
+    samples = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn(payload)
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--api", default="http://localhost:8000")
+    ap.add_argument("--symbol", default="SPY")
+    ap.add_argument("--synthetic", action="store_true", help="don't contact the backend")
+    ap.add_argument("--rounds", type=int, default=30)
+    args = ap.parse_args()
+
+    payloads = _synthetic(args.symbol) if args.synthetic else _fetch(args.api, args.symbol)
+    encoders = _encoders()
+    print(f"{'payload':<20} {'encoder':<8} {'ms':>8} {'bytes':>10} {'gzip':>9} {'speedup':>8}")
+    for name, payload in payloads.items():
+        base = None
+        for enc, fn in encoders.items():
+            ms = _time(fn, payload, args.rounds)
+            body = fn(payload)
+            base = base or ms
+            print(f"{name:<20} {enc:<8} {ms:>8.2f} {len(body):>10,} {len(gzip.compress(body)):>9,} {base / ms:>7.1f}x")
+        print()
+
+
+if __name__ == "__main__":
+    main()